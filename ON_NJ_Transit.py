@@ -1,5 +1,6 @@
 import streamlit as st
-from PIL import Image
+
+from utils import metrics, startup
 
 # Page configuration
 st.set_page_config(
@@ -7,6 +8,7 @@ st.set_page_config(
     page_icon="🚆",
     layout="wide"
 )
+metrics.count('page_runs', page='home')
 
 # Custom CSS for styling
 st.markdown("""
@@ -48,9 +50,9 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-# Load and display the logo as a banner
+# Load and display the logo as a banner (decoded once per process)
 logo_path = "assets/new_jesry_transit_logo.png"
-logo = Image.open(logo_path)
+logo = startup.load_image(logo_path)
 
 # Banner and Title
 st.markdown('<div class="banner-container">', unsafe_allow_html=True)
@@ -0,0 +1 @@
+"""Task functions for the scenario declared in configuration/config.py."""
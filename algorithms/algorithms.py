@@ -0,0 +1,71 @@
+"""Monthly mechanical cancellation forecasting tasks.
+
+These are the functions wired together by ``configuration/config.py`` (taipy) and
+``configuration/config.toml`` (run by ``utils.pipeline``). The initial dataset
+is ``data/Combined/mechanical_cancellations.csv``: one row per month with
+``YEAR``, ``MONTH`` and ``CANCEL_COUNT``. Forecasts cover ``n_predictions`` months
+starting after ``day``, are capped at ``max_capacity`` cancellations and are
+returned as Series indexed by month so later tasks can align them with actuals.
+"""
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+from utils.ingest import month_start, normalize_months
+
+
+def clean_data(initial_dataset):
+    """Monthly series indexed by first-of-month ``Date`` with a ``Cancellations`` column."""
+    df = normalize_months(initial_dataset.copy())
+    df['Date'] = month_start(df['YEAR'], df['MONTH_NUM'])
+    cleaned = (df.groupby('Date', as_index=False)['CANCEL_COUNT'].sum()
+                 .rename(columns={'CANCEL_COUNT': 'Cancellations'})
+                 .sort_values('Date', ignore_index=True))
+    return cleaned
+
+
+def _forecast_dates(day, n_predictions):
+    first = pd.Timestamp(day).to_period('M').to_timestamp() + pd.DateOffset(months=1)
+    return pd.date_range(first, periods=n_predictions, freq='MS')
+
+
+def predict_baseline(cleaned_dataset, n_predictions, day, max_capacity):
+    """Seasonal naive forecast: each month repeats the last observed value for that month."""
+    history = cleaned_dataset[cleaned_dataset['Date'] <= pd.Timestamp(day)]
+    by_month = history.groupby(history['Date'].dt.month)['Cancellations'].last()
+    dates = _forecast_dates(day, n_predictions)
+    predictions = by_month.reindex(dates.month).fillna(history['Cancellations'].mean()).to_numpy()
+    return pd.Series(np.minimum(predictions, max_capacity), index=dates, name='Baseline')
+
+
+def predict_ml(cleaned_dataset, n_predictions, day, max_capacity):
+    """Random forest on year and month, trained on the history up to ``day``."""
+    history = cleaned_dataset[cleaned_dataset['Date'] <= pd.Timestamp(day)]
+    X = np.column_stack([history['Date'].dt.year, history['Date'].dt.month])
+    model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1)
+    model.fit(X, history['Cancellations'])
+
+    dates = _forecast_dates(day, n_predictions)
+    predictions = model.predict(np.column_stack([dates.year, dates.month]))
+    return pd.Series(np.minimum(predictions, max_capacity), index=dates, name='ML')
+
+
+def compute_metrics(cleaned_dataset, predictions):
+    """RMSE, MAE and MAPE of ``predictions`` over the forecast months that have actuals."""
+    actual = cleaned_dataset.set_index('Date')['Cancellations']
+    both = pd.concat([actual, predictions.rename('Predicted')], axis=1, join='inner')
+    errors = both['Predicted'] - both['Cancellations']
+    n = len(both)
+    return {
+        'rmse': float(np.sqrt(np.mean(errors ** 2))) if n else float('nan'),
+        'mae': float(np.mean(np.abs(errors))) if n else float('nan'),
+        'mape': float(np.mean(np.abs(errors) / np.maximum(both['Cancellations'], 1)) * 100) if n else float('nan'),
+        'months': n,
+    }
+
+
+def create_predictions_dataset(predictions_baseline, predictions_ml, day, n_predictions, cleaned_dataset):
+    """History plus both forecasts, one row per month, ready to plot."""
+    forecasts = pd.concat([predictions_baseline.rename('Baseline'), predictions_ml.rename('ML')], axis=1)
+    forecasts = forecasts.iloc[:n_predictions].rename_axis('Date').reset_index()
+    return cleaned_dataset.merge(forecasts, on='Date', how='outer').sort_values('Date', ignore_index=True)
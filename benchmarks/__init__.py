@@ -0,0 +1 @@
+"""Benchmarks and local stand-ins for the app's external services."""
@@ -0,0 +1,112 @@
+"""Import-time and first-paint profile of every page in a fresh interpreter.
+
+Each page runs in its own ``python -X importtime`` subprocess, the way a new
+replica serves its first request: Streamlit is imported, then the page script
+runs once headlessly through ``AppTest``. The report shows, per page, the
+Streamlit import, the first run of the script ("first paint") and the
+imports that first run pulled in, heaviest first::
+
+    python -m benchmarks.cold_start                      # every page
+    python -m benchmarks.cold_start --repeat 3 --top 8
+    python -m benchmarks.cold_start --json .cache/cold_start.json
+
+It uses the current environment (``NJT_MODELS_DIR``, ``NJT_DATA_DIR``, ...), so
+profile with the same data and models the replicas serve.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+
+HOME_PAGE = "ON_NJ_Transit.py"
+PAGE_MARKER = "-- page run --"
+
+# Runs in the child; prints one JSON line of timings on stdout
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file({path!r}, default_timeout=300)
+sys.stderr.write({marker!r} + "\\n")
+sys.stderr.flush()
+at.run()
+painted = time.perf_counter()
+print(json.dumps({{"streamlit_import_ms": (imported - start) * 1000,
+                  "first_paint_ms": (painted - imported) * 1000,
+                  "exceptions": [e.value for e in at.exception]}}))
+"""
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def pages():
+    return [HOME_PAGE] + sorted(glob.glob(os.path.join("pages", "*.py")))
+
+
+def page_imports(stderr):
+    """``{top-level package: ms}`` imported after the page started, from ``-X importtime`` output."""
+    lines = stderr.split(PAGE_MARKER, 1)[-1].splitlines()
+    packages = {}
+    for line in lines:
+        match = IMPORT_LINE.match(line)
+        # Only the outermost import of each chain; nested ones are in its cumulative time
+        if match and len(match.group(3)) == 1:
+            package = match.group(4).split(".")[0]
+            packages[package] = packages.get(package, 0) + int(match.group(2)) / 1000
+    return dict(sorted(packages.items(), key=lambda item: -item[1]))
+
+
+def profile_page(path):
+    """Cold-start timings of one page in a new interpreter."""
+    code = CHILD.format(path=os.path.abspath(path), marker=PAGE_MARKER)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["imports_ms"] = page_imports(result.stderr)
+    timings["page_imports_ms"] = sum(timings["imports_ms"].values())
+    return timings
+
+
+def profile(paths, repeat=1):
+    """Fastest of ``repeat`` cold starts per page (less noise from the OS and disk cache)."""
+    report = {}
+    for path in paths:
+        runs = [profile_page(path) for _ in range(repeat)]
+        report[path] = min(runs, key=lambda run: run["first_paint_ms"])
+    return report
+
+
+def print_report(report, top=5):
+    print(f"{'page':<40} {'streamlit':>10} {'page imports':>13} {'first paint':>12}")
+    for path, timings in report.items():
+        print(f"{os.path.basename(path):<40} {timings['streamlit_import_ms']:>8.0f}ms "
+              f"{timings['page_imports_ms']:>11.0f}ms {timings['first_paint_ms']:>10.0f}ms")
+        heaviest = list(timings["imports_ms"].items())[:top]
+        if heaviest:
+            print("    " + ", ".join(f"{name} {ms:.0f}ms" for name, ms in heaviest))
+        for message in timings["exceptions"]:
+            print(f"    exception: {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile each page's cold start")
+    parser.add_argument("pages", nargs="*", help="page scripts (default: home page and pages/)")
+    parser.add_argument("--repeat", type=int, default=1, help="cold starts per page, fastest is kept")
+    parser.add_argument("--top", type=int, default=5, help="heaviest imports listed per page")
+    parser.add_argument("--json", default=None, help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = profile(args.pages or pages(), args.repeat)
+    print_report(report, args.top)
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Compare whole-FAQ prompts with retrieved top-k prompts for the support chat.
+
+Measures prompt size, retrieval time and end-to-end completion latency against
+the local mock endpoint (no API key or network needed)::
+
+    python -m benchmarks.faq_prompt --k 5
+"""
+import argparse
+import statistics
+import time
+
+from openai import OpenAI
+
+from benchmarks.mock_openai import approx_tokens, start_server
+from utils.faq_index import FAQIndex, create_context_from_faqs, read_faqs
+
+QUESTIONS = [
+    "How do I purchase tickets using the NJ TRANSIT Mobile App?",
+    "What payment methods are accepted in the app?",
+    "How do I activate my ticket?",
+    "What should I do if my ticket doesn't scan properly?",
+    "How do I create a My Transit account?",
+    "Can I get a refund for an unused monthly pass?",
+    "Does the app work on a jailbroken phone?",
+    "How do I see real-time bus status?",
+]
+
+
+def complete(client, system_prompt, question):
+    start = time.perf_counter()
+    client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=[{"role": "system", "content": system_prompt},
+                  {"role": "user", "content": question}],
+        max_tokens=200,
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=5, help="FAQ entries retrieved per question")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    faqs = read_faqs()
+    start = time.perf_counter()
+    index = FAQIndex(faqs)
+    print(f"Indexed {len(index)} FAQ entries in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    server, base_url = start_server()
+    client = OpenAI(api_key="mock", base_url=base_url)
+    full_context = create_context_from_faqs(faqs)
+
+    retrieval, full_latency, topk_latency, topk_tokens = [], [], [], []
+    for _ in range(args.rounds):
+        for question in QUESTIONS:
+            start = time.perf_counter()
+            hits = index.search(question, k=args.k)
+            retrieval.append(time.perf_counter() - start)
+            context = create_context_from_faqs([faq for faq, _ in hits])
+            topk_tokens.append(approx_tokens(context))
+
+            full_latency.append(complete(client, full_context, question))
+            topk_latency.append(complete(client, context, question))
+    server.shutdown()
+
+    full_tokens = approx_tokens(full_context)
+    mean_topk = statistics.mean(topk_tokens)
+    print(f"System prompt, whole FAQ: {len(full_context):>7,} chars  ~{full_tokens:,} tokens")
+    print(f"System prompt, top-{args.k}:     "
+          f"~{mean_topk:,.0f} tokens on average ({full_tokens / mean_topk:.1f}x smaller)")
+    print(f"Retrieval: median {statistics.median(retrieval) * 1e6:.0f} us, "
+          f"max {max(retrieval) * 1e6:.0f} us")
+    print(f"End-to-end latency, whole FAQ: median {statistics.median(full_latency) * 1e3:.0f} ms")
+    print(f"End-to-end latency, top-{args.k}:     median {statistics.median(topk_latency) * 1e3:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
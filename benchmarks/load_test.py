@@ -0,0 +1,104 @@
+"""Concurrent ``predict_delay`` load: one predict per request vs the micro-batcher.
+
+Each of ``--threads`` workers (standing in for Streamlit sessions) sends
+``--requests`` single-journey predictions, first straight to the model as the
+page used to, then through ``PredictionBatcher``. Reports throughput, request
+latency and the batcher's own metrics. Uses the latest registered delay model,
+or a small stand-in forest with ``--stand-in`` (or when none is registered)::
+
+    python -m benchmarks.load_test --threads 32 --requests 200
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.run import stand_in_model
+from utils import forest_engine, model_registry
+from utils.prediction_service import MAX_BATCH, MAX_WAIT_MS, PredictionBatcher
+from utils.stations import DELAY_FEATURES, STATIONS
+
+MODEL_NAME = "delay_prediction_model"
+
+
+def load_predictor(stand_in=False):
+    """The compiled forest (or the model itself) the Train Delay page predicts with."""
+    model = None
+    if not stand_in:
+        try:
+            model = model_registry.load_model(MODEL_NAME)
+        except LookupError:
+            print(f"No {MODEL_NAME} registered, using a stand-in forest")
+    if model is None:
+        model = stand_in_model()
+    return forest_engine.compile_forest(model) if forest_engine.is_supported(model) else model
+
+
+def journeys(n, seed):
+    rng = np.random.default_rng(seed)
+    ids = np.array(sorted(STATIONS.values()))
+    return list(zip(rng.integers(0, 24, n).tolist(), rng.integers(0, 7, n).tolist(),
+                    rng.choice(ids, n).tolist(), rng.choice(ids, n).tolist()))
+
+
+def run_load(predict, threads, requests):
+    """Run ``threads`` workers calling ``predict(*journey)``; returns (seconds, latencies)."""
+    latencies = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(i):
+        rows = journeys(requests, seed=i)
+        barrier.wait()
+        for row in rows:
+            start = time.perf_counter()
+            predict(*row)
+            latencies[i].append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for w in workers:
+        w.join()
+    return time.perf_counter() - start, np.concatenate(latencies)
+
+
+def report(name, seconds, latencies):
+    ms = latencies * 1000
+    throughput = len(latencies) / seconds
+    print(f"{name:<10} {throughput:10.0f} req/s   p50 {np.percentile(ms, 50):7.2f} ms   "
+          f"p90 {np.percentile(ms, 90):7.2f} ms   p99 {np.percentile(ms, 99):7.2f} ms")
+    return throughput
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test per-request vs micro-batched predictions")
+    parser.add_argument("--threads", type=int, default=32, help="concurrent sessions")
+    parser.add_argument("--requests", type=int, default=200, help="predictions per session")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    parser.add_argument("--stand-in", action="store_true", help="use a stand-in forest, not the registry")
+    args = parser.parse_args()
+
+    predictor = load_predictor(args.stand_in)
+    print(f"{args.threads} sessions x {args.requests} predictions, {type(predictor).__name__}")
+
+    def direct(*row):
+        return predictor.predict(pd.DataFrame([row], columns=DELAY_FEATURES))[0]
+
+    direct_rate = report("direct", *run_load(direct, args.threads, args.requests))
+
+    batcher = PredictionBatcher(predictor, args.max_batch, args.max_wait_ms)
+    batched_rate = report("batched", *run_load(batcher.predict, args.threads, args.requests))
+    batcher.close()
+
+    print(f"speedup    {batched_rate / direct_rate:.1f}x")
+    for name, value in batcher.metrics().items():
+        print(f"  {name:<16} {value:,.2f}" if isinstance(value, float) else f"  {name:<16} {value:,}")
+
+
+if __name__ == "__main__":
+    main()
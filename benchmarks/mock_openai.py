@@ -0,0 +1,132 @@
+"""Local stand-in for the OpenAI chat completions endpoint.
+
+Answers ``POST /v1/chat/completions`` with a canned reply after a delay that
+grows with the prompt size, roughly like a hosted model's prefill cost::
+
+    delay = base_ms + ms_per_1k_tokens * prompt_tokens / 1000
+
+Requests with ``"stream": true`` get the reply as server-sent event chunks, one
+word every ``ms_per_chunk`` milliseconds, ending with ``data: [DONE]``.
+
+Run it standalone and point the app at it::
+
+    python -m benchmarks.mock_openai --port 8900
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=test streamlit run ON_NJ_Transit.py
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = "You can buy tickets in the NJ TRANSIT Mobile App under Buy Tickets."
+
+
+def approx_tokens(text):
+    """Rough token count (~4 characters per token for English text)."""
+    return max(1, len(text) // 4)
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        prompt_tokens = sum(approx_tokens(m.get("content") or "") for m in body.get("messages", []))
+        self.server.requests += 1
+        self.server.prompt_tokens.append(prompt_tokens)
+
+        config = self.server.config
+        time.sleep((config["base_ms"] + config["ms_per_1k_tokens"] * prompt_tokens / 1000) / 1000)
+        if body.get("stream"):
+            self._stream(body, config)
+            return
+
+        payload = json.dumps({
+            "id": f"chatcmpl-mock-{self.server.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": config["reply"]},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": approx_tokens(config["reply"]),
+                "total_tokens": prompt_tokens + approx_tokens(config["reply"]),
+            },
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, body, config):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        created = int(time.time())
+        words = config["reply"].split(" ")
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(config["ms_per_chunk"] / 1000)
+            chunk = {
+                "id": f"chatcmpl-mock-{self.server.requests}",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": body.get("model", "mock"),
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": word if i == 0 else " " + word},
+                    "finish_reason": "stop" if i == len(words) - 1 else None,
+                }],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def start_server(port=0, base_ms=150.0, ms_per_1k_tokens=40.0, reply=REPLY, ms_per_chunk=15.0):
+    """Start the mock in a daemon thread; returns ``(server, base_url)``."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockOpenAIHandler)
+    server.daemon_threads = True
+    server.config = {"base_ms": base_ms, "ms_per_1k_tokens": ms_per_1k_tokens, "reply": reply,
+                     "ms_per_chunk": ms_per_chunk}
+    server.requests = 0
+    server.prompt_tokens = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock of the chat completions API")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--base-ms", type=float, default=150.0)
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=40.0)
+    parser.add_argument("--ms-per-chunk", type=float, default=15.0)
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.port, args.base_ms, args.ms_per_1k_tokens,
+                                    ms_per_chunk=args.ms_per_chunk)
+    print(f"Mock chat completions API on {base_url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+"""Benchmark every page's hot path and compare the results with a saved baseline.
+
+Pages are driven headlessly through Streamlit's ``AppTest``. The delay model
+is a small forest registered in a throwaway models directory, and the chat API
+is the local mock from ``benchmarks.mock_openai``, so no network access or keys
+are needed. Each benchmark reports latency percentiles, throughput and peak
+memory. Memory is the tracemalloc peak of one extra call, or the child's max
+RSS for the subprocess cold start::
+
+    python -m benchmarks.run                                 # everything at 1x
+    python -m benchmarks.run --scale 1 10 100                # one process per scale
+    python -m benchmarks.run --only load_data faq_context --repeat 50
+    python -m benchmarks.run --save-baseline                 # write benchmarks/baselines/x<scale>.json
+    python -m benchmarks.run --compare                       # diff against that baseline
+
+At scales above 1 the datasets come from ``benchmarks.synthetic``. Baselines are
+machine-specific, so compare runs made on the same machine.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+HOME_PAGE = "ON_NJ_Transit.py"
+DELAY_PAGE = os.path.join("pages", "1_🚆Train_Delay.py")
+MECHANICAL_PAGE = os.path.join("pages", "2_🔧 Mechanical_Cancellations.py")
+SUPPORT_PAGE = os.path.join("pages", "3_💬 Train_Support.py")
+
+BENCHMARKS = {}
+
+
+def benchmark(name, repeat=20, memory="tracemalloc"):
+    """Register ``factory(context) -> callable`` as benchmark ``name``."""
+    def register(factory):
+        BENCHMARKS[name] = {"factory": factory, "repeat": repeat, "memory": memory}
+        return factory
+    return register
+
+
+def _app(path):
+    from streamlit.testing.v1 import AppTest
+    return AppTest.from_file(os.path.abspath(path), default_timeout=300)
+
+
+def _check(at):
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return at
+
+
+@benchmark("home_cold_start", repeat=3, memory="rss")
+def home_cold_start(context):
+    """A fresh interpreter importing Streamlit and rendering the home page."""
+    code = ("from streamlit.testing.v1 import AppTest; "
+            f"at = AppTest.from_file({os.path.abspath(HOME_PAGE)!r}, default_timeout=300).run(); "
+            "assert not at.exception, at.exception")
+    return lambda: subprocess.run([sys.executable, "-c", code], check=True)
+
+
+@benchmark("home_page")
+def home_page(context):
+    at = _check(_app(HOME_PAGE).run())
+    return lambda: _check(at.run())
+
+
+@benchmark("load_data")
+def load_data(context):
+    """``catalog.get('mechanical')`` in a new process: memory-mapped from the ingest cache."""
+    from utils import catalog
+    catalog.get('mechanical')  # populate the on-disk cache once
+
+    def run():
+        catalog._frames.clear()
+        return catalog.get('mechanical')
+    return run
+
+
+@benchmark("load_data_parse", repeat=10)
+def load_data_parse(context):
+    """The same frame built from the CSVs, as on the very first start."""
+    from utils import catalog
+    datasets = catalog.DATASETS
+    return lambda: catalog._mechanical(datasets['rail_cancellations'].build(),
+                                       datasets['rail_monthly'].build())
+
+
+@benchmark("mechanical_page_fit", repeat=5)
+def mechanical_page_fit(context):
+    """Mechanical page rerun that has to fit the forest (model cache cleared)."""
+    from utils.cache import get_cache
+    at = _check(_app(MECHANICAL_PAGE).run())
+
+    def run():
+        get_cache('mechanical_models').clear()
+        return _check(at.run())
+    return run
+
+
+@benchmark("mechanical_page", repeat=10)
+def mechanical_page(context):
+    """Mechanical page rerun with the fitted forest cached."""
+    at = _check(_app(MECHANICAL_PAGE).run())
+    return lambda: _check(at.run())
+
+
+@benchmark("predict_delay_page")
+def predict_delay_page(context):
+    """Delay page rerun after clicking Predict Delay (stand-in model, no lookup table)."""
+    at = _check(_app(DELAY_PAGE).run())
+    return lambda: _check(at.button[0].click().run())
+
+
+@benchmark("predict_delay_row", repeat=200)
+def predict_delay_row(context):
+    """One ``predict_delay`` row through the compiled forest."""
+    import pandas as pd
+    from utils import forest_engine, model_registry
+    engine = forest_engine.compile_forest(model_registry.load_model(context["model_name"]))
+    row = pd.DataFrame([{'hour_of_day': 8, 'day_of_week': 1, 'from_id': 105, 'to_id': 107}])
+    return lambda: engine.predict(row)
+
+
+@benchmark("predict_interval_row", repeat=200)
+def predict_interval_row(context):
+    """The same row's mean and 80% tree interval in one pass."""
+    import pandas as pd
+    from utils import forest_engine, model_registry
+    engine = forest_engine.compile_forest(model_registry.load_model(context["model_name"]))
+    row = pd.DataFrame([{'hour_of_day': 8, 'day_of_week': 1, 'from_id': 105, 'to_id': 107}])
+    return lambda: engine.predict_interval(row)
+
+
+@benchmark("predict_delay_batch", repeat=5)
+def predict_delay_batch(context):
+    """50,000 random journeys through the compiled forest (bulk scoring, e.g. the lookup table)."""
+    from utils import forest_engine, model_registry
+    from utils.model_compaction import random_journeys
+    engine = forest_engine.compile_forest(model_registry.load_model(context["model_name"]))
+    rows = random_journeys(50_000)
+    return lambda: engine.predict(rows)
+
+
+@benchmark("sklearn_delay_batch", repeat=5)
+def sklearn_delay_batch(context):
+    """The same batch through ``model.predict``, the bar ``predict_delay_batch`` has to meet."""
+    from utils import model_registry
+    from utils.model_compaction import random_journeys
+    model = model_registry.load_model(context["model_name"])
+    rows = random_journeys(50_000)
+    return lambda: model.predict(rows)
+
+
+@benchmark("faq_context", repeat=200)
+def faq_context(context):
+    """``create_context_from_faqs`` over the whole FAQ file."""
+    from utils.faq_index import create_context_from_faqs, read_faqs
+    return lambda: create_context_from_faqs(read_faqs())
+
+
+@benchmark("faq_search", repeat=200)
+def faq_search(context):
+    from utils.faq_index import FAQIndex, read_faqs
+    index = FAQIndex(read_faqs())
+    return lambda: index.search("How do I activate my ticket on the app?", k=5)
+
+
+@benchmark("chat_turn", repeat=10)
+def chat_turn(context):
+    """A support page turn answered by the mock API (unique question, no cache hit)."""
+    at = _check(_app(SUPPORT_PAGE).run())
+    counter = iter(range(10 ** 9))
+    return lambda: _check(at.chat_input[0].set_value(
+        f"Can I bring a folding bike on a weekend train, case {next(counter)}?").run())
+
+
+@benchmark("trip_scan", repeat=3)
+def trip_scan(context):
+    """Chunked read of the trip-level CSVs into mean delay per station pair."""
+    import pandas as pd
+    trips_dir = os.path.join(context["data_dir"], "trips")
+
+    def run():
+        totals = None
+        for name in sorted(os.listdir(trips_dir)):
+            for chunk in pd.read_csv(os.path.join(trips_dir, name), chunksize=200_000,
+                                     usecols=['from_id', 'to_id', 'delay_minutes']):
+                part = chunk.groupby(['from_id', 'to_id'])['delay_minutes'].agg(['sum', 'count'])
+                totals = part if totals is None else totals.add(part, fill_value=0)
+        return totals['sum'] / totals['count']
+    return run
+
+
+@benchmark("journey_plan", repeat=200)
+def journey_plan(context):
+    """One multi-leg journey search over the graph built from the trip files."""
+    from utils.journey_planner import JourneyGraph
+    trips_dir = os.path.join(context["data_dir"], "trips")
+    graph = JourneyGraph.build([os.path.join(trips_dir, name) for name in sorted(os.listdir(trips_dir))],
+                               log=lambda *args: None)
+    stations = sorted(graph.station_nodes)
+    pairs = itertools.cycle(itertools.product(stations[::7], stations[::11]))
+    return lambda: graph.plan(*next(pairs), 8, 0)
+
+
+def summarize(times, peak_bytes):
+    times_ms = np.array(times) * 1000
+    return {
+        "n": len(times),
+        "mean_ms": float(times_ms.mean()),
+        "p50_ms": float(np.percentile(times_ms, 50)),
+        "p90_ms": float(np.percentile(times_ms, 90)),
+        "p99_ms": float(np.percentile(times_ms, 99)),
+        "min_ms": float(times_ms.min()),
+        "max_ms": float(times_ms.max()),
+        "throughput_per_s": float(len(times) / (times_ms.sum() / 1000)),
+        "peak_mb": peak_bytes / 2 ** 20,
+    }
+
+
+def measure(fn, repeat, memory="tracemalloc", warmup=1):
+    """Time ``repeat`` calls after ``warmup`` calls, then one more for peak memory."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    if memory == "rss":
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+    else:
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return summarize(times, peak)
+
+
+def stand_in_model(n_estimators=50):
+    """A small delay forest fitted on random journeys."""
+    import pandas as pd
+    from sklearn.ensemble import RandomForestRegressor
+    from utils.stations import DELAY_FEATURES, STATIONS
+
+    rng = np.random.default_rng(0)
+    ids = np.array(sorted(STATIONS.values()))
+    n = 20_000
+    X = pd.DataFrame({
+        'hour_of_day': rng.integers(0, 24, n),
+        'day_of_week': rng.integers(0, 7, n),
+        'from_id': rng.choice(ids, n),
+        'to_id': rng.choice(ids, n),
+    })[DELAY_FEATURES]
+    y = (X['hour_of_day'] % 7) * 1.5 + X['day_of_week'] + rng.normal(0, 2, n)
+    return RandomForestRegressor(n_estimators=n_estimators, min_samples_leaf=3, random_state=0).fit(X, y)
+
+
+def _register_stand_in_model(name, n_estimators=50):
+    """Register ``stand_in_model`` as ``name``."""
+    import joblib
+    from utils import model_registry
+
+    model = stand_in_model(n_estimators)
+    path = os.path.join(model_registry.MODELS_DIR, "stand_in.joblib")
+    os.makedirs(model_registry.MODELS_DIR, exist_ok=True)
+    joblib.dump(model, path)
+    model_registry.register_model(name, path, metadata={"stand_in": True})
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(scale=1, only=None, repeat=None, log=print):
+    """Run the benchmarks in this process at ``scale``; returns the results document.
+
+    Must run before anything imports ``utils``: the data, cache and models
+    directories are read from the environment at import time.
+    """
+    from benchmarks import synthetic
+    from benchmarks.mock_openai import start_server
+
+    workdir = tempfile.mkdtemp(prefix="njt-bench-")
+    data_dir = os.path.join(os.getenv("NJT_CACHE_DIR", ".cache"), "synthetic", f"x{scale}")
+    if not os.path.exists(os.path.join(data_dir, "trips")):
+        log(f"Generating x{scale} data in {data_dir}")
+        synthetic.generate(scale, data_dir)
+    os.environ["NJT_DATA_DIR"] = data_dir
+    os.environ["NJT_CACHE_DIR"] = os.path.join(workdir, "cache")
+    os.environ["NJT_MODELS_DIR"] = os.path.join(workdir, "models")
+
+    server, base_url = start_server(base_ms=50, ms_per_chunk=5)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = "benchmark"
+
+    context = {"scale": scale, "data_dir": data_dir, "model_name": "delay_prediction_model"}
+    _register_stand_in_model(context["model_name"])
+
+    results = {}
+    for name, spec in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        fn = spec["factory"](context)
+        results[name] = measure(fn, repeat or spec["repeat"], spec["memory"])
+        r = results[name]
+        log(f"{name:<22} p50 {r['p50_ms']:9.2f} ms  p90 {r['p90_ms']:9.2f} ms  "
+            f"{r['throughput_per_s']:9.1f}/s  peak {r['peak_mb']:8.2f} MB")
+    server.shutdown()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "scale": scale,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=0.2, log=print):
+    """Print p50 and peak memory changes; returns the names that regressed past ``threshold``."""
+    regressions = []
+    log(f"{'benchmark':<22} {'base p50':>10} {'p50':>10} {'ratio':>7} {'base MB':>9} {'MB':>9}")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            log(f"{name:<22} {'-':>10} {result['p50_ms']:10.2f}   (new)")
+            continue
+        ratio = result["p50_ms"] / base["p50_ms"] if base["p50_ms"] else float("inf")
+        grew = result["peak_mb"] > base["peak_mb"] * (1 + threshold) + 1
+        flag = ""
+        if ratio > 1 + threshold or grew:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        log(f"{name:<22} {base['p50_ms']:10.2f} {result['p50_ms']:10.2f} {ratio:7.2f} "
+            f"{base['peak_mb']:9.2f} {result['peak_mb']:9.2f}{flag}")
+    return regressions
+
+
+def baseline_path(scale):
+    return os.path.join(BASELINE_DIR, f"x{scale}.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the app's hot paths")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1], help="data multipliers, e.g. 1 10 100")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--repeat", type=int, default=None, help="override every benchmark's repeat count")
+    parser.add_argument("--output", default=None, help="results JSON (one scale only)")
+    parser.add_argument("--save-baseline", action="store_true", help="write benchmarks/baselines/x<scale>.json")
+    parser.add_argument("--compare", nargs="?", const="", default=None,
+                        help="baseline JSON to compare with (default benchmarks/baselines/x<scale>.json)")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before flagging")
+    args = parser.parse_args()
+
+    if len(args.scale) > 1:
+        # One clean process per scale: data and cache paths are fixed at import time
+        failed = False
+        for scale in args.scale:
+            argv = [sys.executable, "-m", "benchmarks.run", "--scale", str(scale)]
+            argv += ["--only", *args.only] if args.only else []
+            argv += ["--repeat", str(args.repeat)] if args.repeat else []
+            argv += ["--save-baseline"] if args.save_baseline else []
+            argv += ["--compare", args.compare] if args.compare is not None else []
+            argv += ["--threshold", str(args.threshold)]
+            print(f"== x{scale}")
+            failed |= subprocess.run(argv).returncode != 0
+        sys.exit(1 if failed else 0)
+
+    scale = args.scale[0]
+    document = run_benchmarks(scale, args.only, args.repeat)
+
+    outputs = [args.output] if args.output else []
+    if args.save_baseline:
+        outputs.append(baseline_path(scale))
+    for path in outputs:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(document, f, indent=2)
+        print(f"Wrote {path}")
+
+    if args.compare is not None:
+        with open(args.compare or baseline_path(scale)) as f:
+            baseline = json.load(f)
+        regressions = compare(document, baseline, args.threshold)
+        if regressions:
+            print(f"Regressed: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Scaled copies of the app's datasets for load testing.
+
+``generate(scale, out_dir)`` copies ``data/`` into ``out_dir`` and then rewrites:
+
+* the cancellation files (``RAIL_CANCELLATIONS_DATA.csv`` and
+  ``Combined/mechanical_cancellations.csv``): each row is repeated ``scale``
+  times with jittered counts, so every month has ``scale`` observations;
+* ``trips/<YYYY>_<MM>.csv``: trip-level stop records (``date``, ``train_id``,
+  ``stop_sequence``, ``from``, ``from_id``, ``to``, ``to_id``,
+  ``scheduled_time``, ``actual_time``, ``delay_minutes``, ``status``, ``line``,
+  ``type``) totalling ``TRIPS_PER_SCALE * scale`` rows.
+
+Point the app or the benchmarks at the copy with ``NJT_DATA_DIR``::
+
+    python -m benchmarks.synthetic --scale 100 --out .cache/synthetic/x100
+    NJT_DATA_DIR=.cache/synthetic/x100 streamlit run ON_NJ_Transit.py
+"""
+import argparse
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from utils.stations import STATIONS
+
+SOURCE_DIR = "data"
+TRIPS_PER_SCALE = 5000
+TRIP_COLUMNS = ['date', 'train_id', 'stop_sequence', 'from', 'from_id', 'to', 'to_id',
+                'scheduled_time', 'actual_time', 'delay_minutes', 'status', 'line', 'type']
+LINES = ['Northeast Corrdr', 'No Jersey Coast', 'Morristown Line', 'Gladstone Branch',
+         'Montclair-Boonton', 'Main Line', 'Raritan Valley', 'Bergen Co. Line',
+         'Pascack Valley', 'Atl. City Line']
+CHUNK_ROWS = 200_000
+
+
+def scale_rows(path, scale, count_columns, seed=0):
+    """Repeat every row ``scale`` times, jittering ``count_columns`` by up to ±20%."""
+    df = pd.read_csv(path)
+    if scale == 1:
+        return df
+    scaled = df.loc[df.index.repeat(scale)].reset_index(drop=True)
+    rng = np.random.default_rng(seed)
+    for column in count_columns:
+        column = next(c for c in scaled.columns if c.strip() == column)
+        jitter = rng.uniform(0.8, 1.2, len(scaled))
+        scaled[column] = np.maximum(0, np.rint(scaled[column] * jitter)).astype(int)
+    return scaled
+
+
+def _line_stations(n_lines=len(LINES)):
+    """Split the station list into ``n_lines`` routes, each ending at New York Penn."""
+    names = [name for name in STATIONS if name != 'New York Penn Station']
+    routes = np.array_split(np.array(names), n_lines)
+    return [list(route) + ['New York Penn Station'] for route in routes]
+
+
+def trip_chunks(n_rows, year=2020, month=1, seed=0, chunk_rows=CHUNK_ROWS):
+    """Yield DataFrames of synthetic stop records for one month, ``chunk_rows`` at a time."""
+    rng = np.random.default_rng(seed)
+    routes = _line_stations()
+    width = max(len(route) for route in routes)
+    route_names = np.array([route + [''] * (width - len(route)) for route in routes])
+    route_ids = np.array([[STATIONS.get(name, 0) for name in row] for row in route_names])
+    route_stops = np.array([len(route) - 1 for route in routes])
+    days_in_month = pd.Period(year=year, month=month, freq='M').days_in_month
+    month_start = np.datetime64(f"{year:04d}-{month:02d}-01T00:00", 's')
+    lines = np.array(LINES)
+    first_train = 1000
+
+    produced = 0
+    while produced < n_rows:
+        rows = min(chunk_rows, n_rows - produced)
+        n_trains = rows // route_stops.min() + 1
+        line = rng.integers(len(routes), size=n_trains)
+        stops = route_stops[line]
+        n_trains = int(np.searchsorted(np.cumsum(stops), rows)) + 1
+        line, stops = line[:n_trains], stops[:n_trains]
+
+        # One row per (train, stop): position along the route and the train it belongs to
+        train = np.repeat(np.arange(n_trains), stops)
+        starts = np.cumsum(stops) - stops
+        position = np.arange(len(train)) - np.repeat(starts, stops)
+        row_line = line[train]
+
+        departure = (month_start
+                     + rng.integers(days_in_month, size=n_trains) * np.timedelta64(1, 'D')
+                     + rng.integers(5 * 60, 24 * 60, size=n_trains) * np.timedelta64(1, 'm'))
+        minutes = np.cumsum(rng.integers(3, 9, size=len(train)))
+        minutes -= np.repeat(minutes[starts] - rng.integers(3, 9, size=n_trains), stops)
+        scheduled = departure[train] + minutes * np.timedelta64(1, 'm')
+        hour = scheduled.astype('datetime64[h]').astype(np.int64) % 24
+        rush = ((hour >= 7) & (hour <= 9)) | ((hour >= 16) & (hour <= 19))
+        delay = np.round(rng.gamma(1.2, 1.5 + 2.0 * rush + 0.4 * row_line), 2)
+        cancelled = (rng.random(n_trains) < 0.01)[train]
+
+        chunk = pd.DataFrame({
+            'date': departure[train].astype('datetime64[D]'),
+            'train_id': (first_train + train).astype(str),
+            'stop_sequence': position + 1,
+            'from': route_names[row_line, position],
+            'from_id': route_ids[row_line, position],
+            'to': route_names[row_line, position + 1],
+            'to_id': route_ids[row_line, position + 1],
+            'scheduled_time': scheduled,
+            'actual_time': scheduled + np.rint(delay * 60).astype('timedelta64[s]'),
+            'delay_minutes': delay,
+            'status': np.where(cancelled, 'cancelled', 'departed'),
+            'line': lines[row_line],
+            'type': 'NJ Transit',
+        }).iloc[:rows]
+        first_train += n_trains
+        produced += len(chunk)
+        yield chunk[TRIP_COLUMNS]
+
+
+def write_trips(out_dir, n_rows, months=((2020, 1), (2020, 2), (2020, 3)), seed=0):
+    """Write ``n_rows`` stop records split evenly over ``months`` into ``out_dir/trips``."""
+    trips_dir = os.path.join(out_dir, 'trips')
+    os.makedirs(trips_dir, exist_ok=True)
+    paths = []
+    for i, (year, month) in enumerate(months):
+        path = os.path.join(trips_dir, f"{year:04d}_{month:02d}.csv")
+        rows = n_rows // len(months) + (i < n_rows % len(months))
+        for j, chunk in enumerate(trip_chunks(rows, year, month, seed=seed + i)):
+            chunk.to_csv(path, mode='w' if j == 0 else 'a', header=j == 0, index=False)
+        paths.append(path)
+    return paths
+
+
+def generate(scale, out_dir, source_dir=SOURCE_DIR, trips=True, seed=0):
+    """Write a ``scale``-times copy of ``source_dir`` to ``out_dir``; returns ``out_dir``."""
+    shutil.copytree(source_dir, out_dir, dirs_exist_ok=True)
+    cancellations = os.path.join(out_dir, 'RAIL_CANCELLATIONS_DATA.csv')
+    scale_rows(cancellations, scale, ['CANCEL_COUNT'], seed).to_csv(cancellations, index=False)
+    mechanical = os.path.join(out_dir, 'Combined', 'mechanical_cancellations.csv')
+    scale_rows(mechanical, scale, ['CANCEL_COUNT'], seed).to_csv(mechanical, index=False)
+    if trips:
+        write_trips(out_dir, TRIPS_PER_SCALE * scale, seed=seed)
+    return out_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a scaled copy of data/")
+    parser.add_argument("--scale", type=int, default=10, help="multiplier, e.g. 10, 100 or 1000")
+    parser.add_argument("--out", default=None, help="output directory (default .cache/synthetic/x<scale>)")
+    parser.add_argument("--no-trips", action="store_true", help="skip the trip-level files")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from utils.cache import CACHE_DIR
+    out_dir = args.out or os.path.join(CACHE_DIR, 'synthetic', f'x{args.scale}')
+    generate(args.scale, out_dir, trips=not args.no_trips, seed=args.seed)
+    print(f"Wrote x{args.scale} data to {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,9 @@ from taipy import Config, Scope, Frequency
 
 from algorithms.algorithms import *
 
-path_to_csv = "data/dataset.csv"
+# Monthly mechanical cancellation counts (YEAR, MONTH, CANCEL_COUNT), the series the
+# forecasting functions expect; the original data/dataset.csv was never in the repo
+path_to_csv = "data/Combined/mechanical_cancellations.csv"
 
 # Datanodes (3.1)
 ## Input Data Nodes
@@ -37,6 +39,8 @@ metrics_ml_cfg = Config.configure_data_node(id="metrics_ml")
 # Functions (3.2)
 
 # Tasks (3.3)
+# Tasks that only reshape or score their inputs are skippable. The random forest in
+# predict_ml sums its trees across threads in no fixed order, so it is always rerun.
 clean_data_task_cfg = Config.configure_task(id="task_clean_data",
                                             function=clean_data,
                                             input=initial_dataset_cfg,
@@ -48,7 +52,8 @@ predict_baseline_task_cfg = Config.configure_task(id="predict_baseline",
                                                   function=predict_baseline,
                                                   input=[cleaned_dataset_cfg, n_predictions_cfg, day_cfg,
                                                          max_capacity_cfg],
-                                                  output=predictions_baseline_cfg)
+                                                  output=predictions_baseline_cfg,
+                                                  skippable=True)
 
 predict_ml_task_cfg = Config.configure_task(id="task_predict_ml",
                                             function=predict_ml,
@@ -62,13 +67,15 @@ metrics_baseline_task_cfg = Config.configure_task(id="task_metrics_baseline",
                                             function=compute_metrics,
                                             input=[cleaned_dataset_cfg,
                                                    predictions_baseline_cfg],
-                                            output=metrics_baseline_cfg)
+                                            output=metrics_baseline_cfg,
+                                            skippable=True)
 
 metrics_ml_task_cfg = Config.configure_task(id="task_metrics_ml",
                                             function=compute_metrics,
                                             input=[cleaned_dataset_cfg,
                                                    predictions_ml_cfg],
-                                            output=metrics_ml_cfg)
+                                            output=metrics_ml_cfg,
+                                            skippable=True)
 
 
 full_predictions_task_cfg = Config.configure_task(id="task_full_predictions",
@@ -78,7 +85,8 @@ full_predictions_task_cfg = Config.configure_task(id="task_full_predictions",
                                                   day_cfg,
                                                   n_predictions_cfg,
                                                   cleaned_dataset_cfg],
-                                            output=full_predictions_cfg)
+                                            output=full_predictions_cfg,
+                                            skippable=True)
 
 
 # Configure our scenario which is our business problem.
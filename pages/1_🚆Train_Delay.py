@@ -1,10 +1,10 @@
 import streamlit as st
-from PIL import Image
 import pandas as pd
-import numpy as np
-from sklearn.ensemble import RandomForestRegressor
-import joblib
-from huggingface_hub import hf_hub_download
+from utils import delay_index, delay_table, forest_engine, journey_planner, metrics, model_compaction, model_registry, prediction_service, startup
+from utils.stations import DAYS, STATIONS
+
+# Only needed for the heatmap
+px = startup.lazy_import("plotly.express")
 
 # Page configuration
 st.set_page_config(
@@ -12,6 +12,7 @@ st.set_page_config(
     page_icon="🚆",
     layout="wide"
 )
+metrics.count('page_runs', page='train_delay')
 
 # Custom CSS to make the title responsive
 st.markdown("""
@@ -27,7 +28,7 @@ st.markdown("""
 
 # Load and display the logo with title beside it
 logo_path = "assets/new_jesry_transit_logo.png"
-logo = Image.open(logo_path)
+logo = startup.load_image(logo_path)
 
 col1, col2 = st.columns([1, 3])  # Adjust the ratio as needed
 
@@ -39,7 +40,7 @@ with col2:
 
 
 # Station dictionary
-stations = {'Newark Penn Station': 107, 'Union': 38105, 'Roselle Park': 31, 'Cranford': 32, 'Westfield': 155, 'Fanwood': 44, 'Netherwood': 102, 'Plainfield': 120, 'Dunellen': 36, 'Bound Brook': 21, 'Bridgewater': 24, 'Somerville': 138, 'New York Penn Station': 105, 'Secaucus Upper Lvl': 38187, 'Newark Airport': 37953, 'Elizabeth': 41, 'Linden': 70, 'Rahway': 127, 'Metropark': 83, 'Metuchen': 84, 'Edison': 38, 'New Brunswick': 103, 'Princeton Junction': 125, 'Hamilton': 32905, 'Philadelphia': 1, 'Trenton': 148, 'Princeton': 124, 'North Elizabeth': 109, 'Avenel': 11, 'Woodbridge': 158, 'Perth Amboy': 119, 'South Amboy': 139, 'Aberdeen-Matawan': 37169, 'Hazlet': 59, 'Middletown NJ': 85, 'Red Bank': 130, 'Little Silver': 73, 'Hoboken': 63, 'Secaucus Lower Lvl': 38174, 'Wood Ridge': 160, 'Teterboro': 146, 'Essex Street': 43, 'Anderson Street': 5, 'New Bridge Landing': 110, 'River Edge': 132, 'Oradell': 111, 'Emerson': 42, 'Westwood': 156, 'Hillsdale': 62, 'Woodcliff Lake': 159, 'Park Ridge': 114, 'Montvale': 90, 'Pearl River': 118, 'Nanuet': 100, 'Peapack': 117, 'Far Hills': 45, 'Bernardsville': 18, 'Basking Ridge': 12, 'Lyons': 76, 'Millington': 88, 'Stirling': 143, 'Gillette': 48, 'Berkeley Heights': 17, 'Murray Hill': 99, 'New Providence': 104, 'Summit': 145, 'Short Hills': 136, 'Millburn': 87, 'Maplewood': 81, 'South Orange': 140, 'Highland Avenue': 61, 'Orange': 112, 'Brick Church': 23, 'Newark Broad Street': 106, 'Dover': 35, 'Denville': 34, 'Mount Tabor': 94, 'Morris Plains': 91, 'Morristown': 92, 'Convent Station': 30, 'Madison': 77, 'Chatham': 27, 'East Orange': 37, 'Mountain Station': 97, 'Pennsauken': 43298, 'Cherry Hill': 28, 'Lindenwold': 71, 'Atco': 9, 'Hammonton': 55, 'Egg Harbor City': 39, 'Absecon': 2, 'Kingsland': 66, 'Lyndhurst': 75, 'Delawanna': 33, 'Passaic': 115, 'Clifton': 29, 'Paterson': 116, 'Hawthorne': 58, 'Glen Rock Main Line': 52, 'Ridgewood': 131, 'Waldwick': 151, 'Allendale': 3, 'Ramsey Main St': 128, 'Ramsey Route 17': 38417, 'Mahwah': 78, 'Long Branch': 74, 'Raritan': 129, 'Garwood': 47, 'Suffern': 144, 'Atlantic City Rail Terminal': 10, 'Bay Street': 14, 'Glen Ridge': 50, 'Bloomfield': 19, 'Watsessing Avenue': 154, 'Spring Valley': 142, 'Elberon': 40, 'Allenhurst': 4, 'Asbury Park': 8, 'Bradley Beach': 22, 'Belmar': 15, 'Spring Lake': 141, 'Manasquan': 79, 'Point Pleasant Beach': 122, 'Bay Head': 13, 'Gladstone': 49, 'Rutherford': 134, 'Wesmont': 43599, 'Garfield': 46, 'Plauderville': 121, 'Broadway Fair Lawn': 25, 'Radburn Fair Lawn': 126, 'Glen Rock Boro Hall': 51, 'Lake Hopatcong': 67, 'Mount Arlington': 39472, 'Mountain Lakes': 96, 'Boonton': 20, 'Towaco': 147, 'Lincoln Park': 69, 'Mountain View': 98, 'Wayne-Route 23': 39635, 'Little Falls': 72, 'Montclair State U': 38081, 'Montclair Heights': 89, 'Mountain Avenue': 95, 'Upper Montclair': 150, 'Watchung Avenue': 153, 'Walnut Street': 152, 'Hackettstown': 54, 'Mount Olive': 93, 'Netcong': 101, 'High Bridge': 60, 'Annandale': 6, 'Lebanon': 68, 'White House': 157, 'North Branch': 108, 'Port Jervis': 123, 'Otisville': 113, 'Middletown NY': 86, 'Campbell Hall': 26, 'Salisbury Mills-Cornwall': 135, 'Harriman': 57, 'Tuxedo': 149, 'Sloatsburg': 137, 'Jersey Avenue': 32906}
+stations = STATIONS
 
 # User Input Form
 st.write("## Input Delay Prediction Parameters")
@@ -68,69 +69,208 @@ to_id = stations.get(to_station)
 day_of_week = st.selectbox("Day of the Week", 
                            options=["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"])
 
-# Load the trained model
-# Replace the model loading line:
-# model = joblib.load('models/delay_prediction_model.joblib')
-# with:
+# Load the trained model from the local registry (models/), which keeps one
+# memory-mapped copy per process. The hub is only contacted the first time,
+# when no version has been registered on this machine yet; the compact copy
+# (utils.model_compaction) is preferred when the repo publishes one.
+MODEL_NAME = "delay_prediction_model"
+HF_REPO_ID = "vsaladi/nj_transit_delay"
+HF_FILENAMES = [model_compaction.COMPACT_FILENAME, f"{MODEL_NAME}.joblib"]
 
+@metrics.timed()
 def load_model():
     try:
-        model_path = hf_hub_download(
-            repo_id="vsaladi/nj_transit_delay",  # Your actual Hugging Face repo
-            filename="delay_prediction_model.joblib",
-            token=st.secrets["HF_TOKEN"]
-        )
-        return joblib.load(model_path)
+        try:
+            return model_registry.load_model(MODEL_NAME)
+        except LookupError:
+            pass
+        from huggingface_hub import hf_hub_download
+        from huggingface_hub.utils import EntryNotFoundError
+
+        with metrics.span('model_download', model=MODEL_NAME):
+            for filename in HF_FILENAMES:
+                try:
+                    model_path = hf_hub_download(
+                        repo_id=HF_REPO_ID,  # Your actual Hugging Face repo
+                        filename=filename,
+                        token=st.secrets["HF_TOKEN"]
+                    )
+                    break
+                except EntryNotFoundError:
+                    if filename == HF_FILENAMES[-1]:
+                        raise
+        model_registry.register_model(MODEL_NAME, model_path, metadata={"repo_id": HF_REPO_ID})
+        return model_registry.load_model(MODEL_NAME)
     except Exception as e:
         st.error(f"Error loading model: {e}")
         return None
 
-# Load the model once when the app starts
-model = load_model()
+model_version = model_registry.latest_version(MODEL_NAME)
+
+# Flattened copy of the forest for fast single-row predictions, compiled once per
+# host and stored next to the model version, so every worker process maps the
+# same arrays from disk
+@st.cache_resource(max_entries=2)
+def compile_model(_model, version):
+    if isinstance(_model, forest_engine.CompiledForest):  # already compact, memory-mapped
+        return _model
+    if _model is None or not forest_engine.is_supported(_model):
+        return None
+    return model_registry.load_derived(MODEL_NAME, version, 'compiled', forest_engine.compile_forest)
+
+# Predictions from every session go through one batcher per process, which scores
+# the rows that arrive within a few milliseconds of each other in a single call.
+# A new model version swaps its predictor instead of starting another worker.
+@st.cache_resource
+def prediction_batcher(_predictor):
+    batcher = prediction_service.PredictionBatcher(_predictor)
+    metrics.register_collector('prediction_batcher', batcher.metrics)
+    return batcher
+
+# The model (and sklearn with it) is loaded on the first prediction that needs it,
+# not on every page load; the index and the table answer without it. Subsequent
+# calls hit the registry cache.
+def get_batcher():
+    model = load_model()
+    if model is None:
+        return None
+    version = model_registry.latest_version(MODEL_NAME)
+    engine = compile_model(model, version)
+    predictor = engine if engine is not None else model
+    batcher = prediction_batcher(predictor)
+    batcher.set_predictor(predictor)  # no-op unless a new version was registered
+    return batcher
+
+# Precomputed predictions for every station pair, hour and weekday
+# (built with `python -m utils.delay_table`); None until it has been built
+table = delay_table.load_delay_table(delay_table.table_path(model_version)) if model_version else None
+
+# Observed delay percentiles per journey (built with `python -m utils.delay_index`);
+# None until it has been built
+index = delay_index.load_delay_index()
+
+# Station/line graph for journeys with transfers (built with `python -m utils.journey_planner`);
+# None until it has been built
+graph = journey_planner.load_journey_graph()
 
 # Function to map day of week to number
 def day_to_number(day):
-    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    return days.index(day)
+    return DAYS.index(day)
 
-# Prediction function
+# Prediction function: {'delay': minutes, 'interval': (lower, upper) minutes or None,
+# 'observed': percentiles or None}, or None when the model could not be loaded.
+# The interval is the range holding 80% of the forest's per-tree predictions,
+# from the same pass as the mean.
+@metrics.timed()
 def predict_delay(hour_of_day, day_of_week, from_id, to_id):
-    # Create a feature vector
-    input_data = pd.DataFrame([{
-        'hour_of_day': hour_of_day,
-        'day_of_week': day_of_week,
-        'from_id': from_id,
-        'to_id': to_id
-    }])
-    
-    # Predict delay
-    predicted_delay = model.predict(input_data)[0]
-    return predicted_delay
+    # Well-travelled journeys are answered from the observed history
+    if index is not None:
+        observed = index.lookup(from_id, to_id, hour_of_day, day_of_week)
+        if observed is not None and observed['samples'] >= delay_index.MIN_SAMPLES:
+            metrics.count('delay_predictions', source='index')
+            return {'delay': observed['mean'], 'interval': None, 'observed': observed}
+
+    # Serve from the precomputed table when it covers this journey
+    if table is not None:
+        try:
+            delay = table.lookup(from_id, to_id, hour_of_day, day_of_week)
+            interval = table.lookup_interval(from_id, to_id, hour_of_day, day_of_week)
+            metrics.count('delay_predictions', source='table')
+            return {'delay': delay, 'interval': interval, 'observed': None}
+        except KeyError:
+            pass
+
+    # Predict delay (batched with other sessions' requests)
+    batcher = get_batcher()
+    if batcher is None:  # load_model already showed why
+        return None
+    predicted_delay, lower, upper = batcher.predict_interval(hour_of_day, day_of_week, from_id, to_id)
+    metrics.count('delay_predictions', source='model')
+    return {'delay': predicted_delay, 'interval': (lower, upper) if lower is not None else None, 'observed': None}
 
 # Convert day of week to number
 day_number = day_to_number(day_of_week)
 
 # Make prediction
 if st.button('Predict Delay'):
-    predicted_delay = predict_delay(hour_of_day, day_number, from_id, to_id)
-
-    # Display prediction with larger font and color
-    st.write("## Predicted Delay")
-    st.markdown(f"<h1 style='text-align: center; color: #1E90FF;'>{predicted_delay:.2f} minutes</h1>", unsafe_allow_html=True)
-
-    # Use columns for a more structured layout
-    col1, col2, col3 = st.columns([1,3,1])
-    with col2:
-        # Provide some context
-        if predicted_delay < 5:
-            st.success("Your train is likely to be on time or only slightly delayed.")
-        elif predicted_delay < 15:
-            st.warning("There might be a minor delay. Consider allowing a little extra time for your journey.")
-        else:
-            st.error("There could be a significant delay. Please plan accordingly and check for any service updates.")
+    prediction = predict_delay(hour_of_day, day_number, from_id, to_id)
+    if prediction is None:
+        st.error("The delay model is unavailable, so this journey cannot be predicted right now.")
+    else:
+        predicted_delay = prediction['delay']
+
+        # Display prediction with larger font and color
+        st.write("## Predicted Delay")
+        st.markdown(f"<h1 style='text-align: center; color: #1E90FF;'>{predicted_delay:.2f} minutes</h1>", unsafe_allow_html=True)
+
+        # Range of the model's trees, when the prediction came from the forest
+        interval = prediction['interval']
+        if interval is not None:
+            st.markdown(f"<p style='text-align: center;'>Likely range: {interval[0]:.1f} – {interval[1]:.1f} minutes</p>",
+                        unsafe_allow_html=True)
+
+        # Percentiles from the observed history, when it has enough trips for this journey
+        observed = prediction['observed']
+        if observed is not None:
+            p50, p90, p99 = st.columns(3)
+            p50.metric("Typical (p50)", f"{observed['p50']:.1f} min")
+            p90.metric("Bad day (p90)", f"{observed['p90']:.1f} min")
+            p99.metric("Worst case (p99)", f"{observed['p99']:.1f} min")
+            st.caption(f"Based on {observed['samples']:,} observed trips at this hour and weekday.")
+
+        # Use columns for a more structured layout
+        col1, col2, col3 = st.columns([1,3,1])
+        with col2:
+            # Provide some context
+            if predicted_delay < 5:
+                st.success("Your train is likely to be on time or only slightly delayed.")
+            elif predicted_delay < 15:
+                st.warning("There might be a minor delay. Consider allowing a little extra time for your journey.")
+            else:
+                st.error("There could be a significant delay. Please plan accordingly and check for any service updates.")
 # Display collected inputs
 st.write("### Input Summary")
 st.write(f"**Hour of the Day:** {time_input}")
 st.write(f"**From Station:** {from_station} (ID: {from_id})")
 st.write(f"**To Station:** {to_station} (ID: {to_id})")
 st.write(f"**Day of the Week:** {day_of_week}")
+
+# Journeys with transfers, only available once the journey graph has been built
+if graph is not None:
+    st.write("### Journey Planner")
+    if st.button('Plan Journey'):
+        journey = graph.plan(from_id, to_id, hour_of_day, day_number)
+        if journey is None:
+            st.warning(f"No connection from {from_station} to {to_station} was found in the trip history.")
+        else:
+            id_to_name = {station_id: name for name, station_id in stations.items()}
+            total, delay, transfers = st.columns(3)
+            total.metric("Expected journey time", f"{journey['minutes']:.0f} min")
+            delay.metric("Expected delay on arrival", f"{journey['delay']:.1f} min")
+            transfers.metric("Transfers", journey['transfers'])
+            st.dataframe(pd.DataFrame([{
+                'Line': leg['line'],
+                'From': id_to_name.get(leg['from_id'], leg['from_id']),
+                'To': id_to_name.get(leg['to_id'], leg['to_id']),
+                'Stops': leg['stops'],
+                'Minutes': round(leg['minutes'], 1),
+                'Delay on arrival (min)': round(leg['delay'], 1),
+            } for leg in journey['legs']]), hide_index=True, use_container_width=True)
+            if journey['transfers']:
+                st.caption(f"Includes {journey_planner.TRANSFER_MINUTES:.0f} minutes per transfer.")
+
+# Whole-network view, only available once the lookup table has been built
+if table is not None:
+    with st.expander("Network Delay Heatmap"):
+        id_to_name = {station_id: name for name, station_id in stations.items()}
+        names = [id_to_name.get(int(station_id), str(station_id)) for station_id in table.station_ids]
+        fig = px.imshow(
+            table.network(hour_of_day, day_number),
+            x=names,
+            y=names,
+            color_continuous_scale='RdYlBu_r',
+            labels=dict(x='To Station', y='From Station', color='Delay (min)'),
+            title=f'Predicted Delays at {time_input.strftime("%H:%M")} on {day_of_week}',
+        )
+        fig.update_layout(height=800)
+        st.plotly_chart(fig, use_container_width=True)
@@ -1,95 +1,111 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime
-from sklearn.ensemble import RandomForestRegressor
 import calendar
 
+from utils import cancellation_cube, catalog, forest_engine, metrics, startup
+from utils.cache import fingerprint, get_cache
+from utils.figure_cache import cached_figure
+
+# Imported on first use: plotly when the charts are drawn, sklearn only when a
+# forest has to be fitted (not on reruns that hit the model cache)
+px = startup.lazy_import("plotly.express")
+go = startup.lazy_import("plotly.graph_objects")
+
 # Set page config
 st.set_page_config(layout="wide", page_title="NJ Transit Mechanical Cancellations Analysis")
+metrics.count('page_runs', page='mechanical_cancellations')
 
-@st.cache_data
+@metrics.timed()
 def load_data():
-    # Load both datasets
-    mechanical_df = pd.read_csv('data/RAIL_CANCELLATIONS_DATA.csv')
-    train_df = pd.read_csv('data/Combined/cleaned_train_data.csv')
-    
-    # Clean mechanical data
-    mechanical_df['MONTH'] = mechanical_df['MONTH'].str.strip()
-    mechanical_df = mechanical_df[mechanical_df['CATEGORY'].str.contains('Mechanical', na=False)]
-    
-    # Convert month names to numbers in mechanical data
-    month_map = {
-        'JANUARY': 1, 'FEBRUARY': 2, 'MARCH': 3, 'APRIL': 4,
-        'MAY': 5, 'JUNE': 6, 'JULY': 7, 'AUGUST': 8,
-        'SEPTEMBER': 9, 'OCTOBER': 10, 'NOVEMBER': 11, 'DECEMBER': 12
-    }
-    mechanical_df['MONTH_NUM'] = mechanical_df['MONTH'].map(month_map)
-    
-    # Merge with train data
-    train_df['MONTH_NUM'] = train_df['MONTH'].map(month_map)
-    merged_df = pd.merge(
-        mechanical_df,
-        train_df[['YEAR', 'MONTH_NUM', 'MEAN_DISTANCE_BEFORE_FAILURE', 'ON_TIME_PERCENTAGE']],
-        on=['YEAR', 'MONTH_NUM'],
-        how='left'
-    )
+    # Loaded once per process by the dataset catalog and shared read-only by
+    # every session (mechanical cancellations joined with monthly train data)
+    return catalog.get('mechanical')
+
+FEATURES = ['YEAR', 'MONTH_NUM', 'MEAN_DISTANCE_BEFORE_FAILURE', 'ON_TIME_PERCENTAGE']
+TARGET = 'CANCEL_PERCENTAGE'
+MODEL_PARAMS = {'n_estimators': 100, 'random_state': 42, 'n_jobs': -1}
+# Prediction bands hold this share of the forest's per-tree predictions
+INTERVAL_COVERAGE = forest_engine.INTERVAL_COVERAGE
+
+# Trained forests shared by every session and every worker process on the host,
+# keyed by data fingerprint + hyperparameters
+model_cache = get_cache('mechanical_models', max_entries=4, shared=True)
+
+def get_trained_model(data):
+    """Fit the forest once per dataset and precompute every prediction the page shows"""
+    key = fingerprint(data[FEATURES + [TARGET]], MODEL_PARAMS, INTERVAL_COVERAGE)
+    return model_cache.get_or_compute(key, lambda: fit_model(data))
+
+@metrics.timed('forest_fit')
+def fit_model(data):
+    from sklearn.ensemble import RandomForestRegressor
+
+    X = data[FEATURES].values
+    y = data[TARGET].values
     
-    # Create date column
-    merged_df['DATE'] = pd.to_datetime(merged_df.apply(lambda x: f"{x['YEAR']}-{x['MONTH_NUM']:02d}-01", axis=1))
+    model = RandomForestRegressor(**MODEL_PARAMS)
+    model.fit(X, y)
     
-    return merged_df
+    # Use average values for other features
+    avg_distance = data['MEAN_DISTANCE_BEFORE_FAILURE'].mean()
+    avg_ontime = data['ON_TIME_PERCENTAGE'].mean()
+    
+    # Every target month across years, plus the next 6 months, in one batch
+    years = np.arange(data['YEAR'].min(), data['YEAR'].max() + 2)
+    month_grid = [[year, month, avg_distance, avg_ontime] for month in range(1, 13) for year in years]
+    
+    current_year = data['YEAR'].max()
+    current_month = data['MONTH_NUM'].max()
+    next_months = []
+    for i in range(1, 7):
+        month = (current_month + i) % 12
+        if month == 0:
+            month = 12
+        year = current_year + (current_month + i - 1) // 12
+        next_months.append([year, month, avg_distance, avg_ontime])
+    
+    # Mean and band from one pass over the per-tree predictions (the mean is
+    # exactly model.predict)
+    engine = forest_engine.compile_forest(model)
+    predictions, lower, upper = engine.predict_interval(np.array(month_grid + next_months), INTERVAL_COVERAGE)
+    n_grid = len(month_grid)
+    
+    # Only what the page renders: the forest itself is not needed after this and
+    # would be pickled on every shared-cache write and read
+    return {
+        'importances': model.feature_importances_,
+        'month_dates': {m: month_grid[(m - 1) * len(years):m * len(years)] for m in range(1, 13)},
+        'month_predictions': predictions[:n_grid].reshape(12, len(years)),
+        'month_lower': lower[:n_grid].reshape(12, len(years)),
+        'month_upper': upper[:n_grid].reshape(12, len(years)),
+        'next_dates': next_months,
+        'next_predictions': predictions[n_grid:],
+        'next_lower': lower[n_grid:],
+        'next_upper': upper[n_grid:],
+    }
 
+@metrics.timed()
 def predict_mechanical_failures(data, target_month=None):
-    # Prepare features
-    X = data[['YEAR', 'MONTH_NUM', 'MEAN_DISTANCE_BEFORE_FAILURE', 'ON_TIME_PERCENTAGE']].values
-    y = data['CANCEL_PERCENTAGE'].values
-    
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X, y)
+    trained = get_trained_model(data)
     
+    # Dates, predicted rates and the lower/upper bounds of their bands
     if target_month:
         # Predict for specific month across years
-        years = range(data['YEAR'].min(), data['YEAR'].max() + 2)
-        
-        # Use average values for other features
-        avg_distance = data['MEAN_DISTANCE_BEFORE_FAILURE'].mean()
-        avg_ontime = data['ON_TIME_PERCENTAGE'].mean()
-        
-        future_dates = [[year, target_month, avg_distance, avg_ontime] for year in years]
-        predictions = model.predict(np.array(future_dates))
-        return future_dates, predictions
+        i = target_month - 1
+        return (trained['month_dates'][target_month], trained['month_predictions'][i],
+                trained['month_lower'][i], trained['month_upper'][i])
     else:
         # Predict next 6 months
-        current_year = data['YEAR'].max()
-        current_month = data['MONTH_NUM'].max()
-        
-        avg_distance = data['MEAN_DISTANCE_BEFORE_FAILURE'].mean()
-        avg_ontime = data['ON_TIME_PERCENTAGE'].mean()
-        
-        future_dates = []
-        for i in range(1, 7):
-            month = (current_month + i) % 12
-            if month == 0:
-                month = 12
-            year = current_year + (current_month + i - 1) // 12
-            future_dates.append([year, month, avg_distance, avg_ontime])
-        
-        predictions = model.predict(np.array(future_dates))
-        return future_dates, predictions
+        return trained['next_dates'], trained['next_predictions'], trained['next_lower'], trained['next_upper']
 
+@metrics.timed()
 def show_feature_importance(data):
-    X = data[['YEAR', 'MONTH_NUM', 'MEAN_DISTANCE_BEFORE_FAILURE', 'ON_TIME_PERCENTAGE']]
-    y = data['CANCEL_PERCENTAGE']
-    
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X, y)
+    trained = get_trained_model(data)
     
     importance_df = pd.DataFrame({
-        'Feature': X.columns,
-        'Importance': model.feature_importances_
+        'Feature': FEATURES,
+        'Importance': trained['importances']
     }).sort_values('Importance', ascending=False)
     
     fig = px.bar(importance_df, 
@@ -98,73 +114,31 @@ def show_feature_importance(data):
                  title='Feature Importance for Prediction Model')
     return fig
 
-def create_monthly_heatmap(df):
-    # Pivot data for heatmap
-    heatmap_data = df.pivot_table(
-        values='CANCEL_PERCENTAGE',
-        index='YEAR',
-        columns='MONTH_NUM',
-        aggfunc='mean'
-    ).round(1)
+def create_monthly_heatmap(cube, category):
+    # Year x month rates of one category, sliced from the pre-aggregated cube
+    heatmap_data = np.round(cube.heatmap(category), 1)
     
     # Create heatmap
     fig = go.Figure(data=go.Heatmap(
-        z=heatmap_data.values,
+        z=heatmap_data,
         x=[calendar.month_abbr[i] for i in range(1, 13)],
-        y=heatmap_data.index,
+        y=cube.years,
         colorscale='RdYlBu_r',
-        text=np.round(heatmap_data.values, 1),
+        text=heatmap_data,
         texttemplate='%{text}%',
         textfont={"size": 10},
         colorbar=dict(title='Cancellation Rate (%)')
     ))
     
     fig.update_layout(
-        title='Monthly Mechanical Cancellation Rates Heatmap',
+        title=f'Monthly {category} Cancellation Rates Heatmap',
         xaxis_title='Month',
         yaxis_title='Year'
     )
     
     return fig
 
-def main():
-    st.title("🚂 NJ Transit Rail Mechanical Cancellations Analysis")
-    
-    # Display explanation image
-    st.image('assets/output.png',
-             caption='Distribution of Cancellation Categories',
-             use_column_width=True)
-    
-    # Load data
-    df = load_data()
-    
-    # Main metrics
-    st.header("Key Metrics")
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        avg_mechanical_rate = df['CANCEL_PERCENTAGE'].mean()
-        st.metric("Average Mechanical Cancellation Rate", f"{avg_mechanical_rate:.1f}%")
-    
-    with col2:
-        recent_rate = df[df['YEAR'] == df['YEAR'].max()]['CANCEL_PERCENTAGE'].mean()
-        st.metric("Recent Year Average", f"{recent_rate:.1f}%", 
-                 f"{recent_rate - avg_mechanical_rate:.1f}%")
-    
-    with col3:
-        max_month = df.loc[df['CANCEL_PERCENTAGE'].idxmax()]
-        st.metric("Highest Cancellation Month", 
-                 f"{max_month['MONTH']} {max_month['YEAR']}", 
-                 f"{max_month['CANCEL_PERCENTAGE']:.1f}%")
-
-    # Monthly Pattern Analysis
-    st.header("Monthly Cancellation Patterns")
-    
-    # Heatmap
-    heatmap_fig = create_monthly_heatmap(df)
-    st.plotly_chart(heatmap_fig, use_container_width=True)
-    
-    # Historical trend with trend line
+def create_trend_chart(df):
     fig_trend = px.scatter(df, 
                           x='DATE', 
                           y='CANCEL_PERCENTAGE',
@@ -174,51 +148,43 @@ def main():
                                  'DATE': 'Date'})
     
     fig_trend.update_traces(marker=dict(size=8))
-    st.plotly_chart(fig_trend, use_container_width=True)
-    
-    # Monthly box plot
-    fig_box = px.box(df, 
-                     x='MONTH', 
-                     y='CANCEL_PERCENTAGE',
-                     title='Monthly Distribution of Mechanical Cancellations',
-                     labels={'CANCEL_PERCENTAGE': 'Cancellation Rate (%)',
-                            'MONTH': 'Month'})
-    st.plotly_chart(fig_box, use_container_width=True)
+    return fig_trend
 
-    # Feature Importance
-    st.header("Prediction Model Insights")
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.plotly_chart(show_feature_importance(df), use_container_width=True)
-    
-    with col2:
-        st.write("""
-        ### Model Features:
-        - Mean Distance Before Failure: Average distance traveled before a mechanical issue occurs
-        - On-Time Percentage: Overall performance metric
-        - Month: Seasonal patterns
-        - Year: Long-term trends
-        
-        This enhanced model considers multiple factors to provide more accurate predictions.
-        """)
+def create_box_plot(df):
+    return px.box(df, 
+                  x='MONTH', 
+                  y='CANCEL_PERCENTAGE',
+                  title='Monthly Distribution of Mechanical Cancellations',
+                  labels={'CANCEL_PERCENTAGE': 'Cancellation Rate (%)',
+                         'MONTH': 'Month'})
 
-    # Prediction Section
-    st.header("Mechanical Failure Predictions")
-    
-    # Month selector for predictions
-    months = list(calendar.month_name)[1:]
-    selected_month = st.selectbox("Select month for prediction", months)
-    selected_month_num = months.index(selected_month) + 1
-    
-    # Get predictions for selected month
-    future_dates, predictions = predict_mechanical_failures(df, selected_month_num)
-    
-    # Create prediction chart
+def create_share_chart(cube, category):
+    # Share of all cancellations per year for the selected category, from the cube's marginals
+    return px.bar(
+        x=cube.years,
+        y=np.round(cube.rollup(category, by='year'), 1),
+        labels={'x': 'Year', 'y': 'Share of All Cancellations (%)'},
+        title=f'{category} Share of All Rail Cancellations by Year',
+    )
+
+@st.fragment
+def category_section(cube):
+    category = st.selectbox(
+        "Cancellation category",
+        cube.categories,
+        index=cube.categories.index('Mechanical') if 'Mechanical' in cube.categories else 0,
+    )
+    # Keyed by the category's counts, so months appended to the cube redraw it
+    counts = cube.counts[:, :, cube.category_index[category]]
+    parts = (category, cube.years.tolist(), counts.tolist(), cube.totals.tolist())
+    st.plotly_chart(cached_figure('heatmap', lambda: create_monthly_heatmap(cube, category), *parts),
+                    use_container_width=True)
+    st.plotly_chart(cached_figure('share', lambda: create_share_chart(cube, category), *parts),
+                    use_container_width=True)
+
+def create_prediction_chart(historical_data, future_dates, predictions, lower, upper, selected_month):
     fig_predict = go.Figure()
     
-    # Historical data for selected month
-    historical_data = df[df['MONTH_NUM'] == selected_month_num]
     fig_predict.add_trace(go.Scatter(
         x=historical_data['YEAR'],
         y=historical_data['CANCEL_PERCENTAGE'],
@@ -228,8 +194,28 @@ def main():
     ))
     
     # Predictions
+    # Prediction band: upper edge, then the lower edge filled up to it
+    years = [date[0] for date in future_dates]
     fig_predict.add_trace(go.Scatter(
-        x=[date[0] for date in future_dates],
+        x=years,
+        y=upper,
+        mode='lines',
+        line=dict(width=0),
+        showlegend=False,
+        hoverinfo='skip'
+    ))
+    fig_predict.add_trace(go.Scatter(
+        x=years,
+        y=lower,
+        name=f'{INTERVAL_COVERAGE:.0%} Prediction Band',
+        mode='lines',
+        line=dict(width=0),
+        fill='tonexty',
+        fillcolor='rgba(255, 0, 0, 0.15)'
+    ))
+    
+    fig_predict.add_trace(go.Scatter(
+        x=years,
         y=predictions,
         name='Prediction Trend',
         mode='lines',
@@ -242,6 +228,27 @@ def main():
         yaxis_title='Cancellation Rate (%)',
         hovermode='x unified'
     )
+    return fig_predict
+
+@st.fragment
+def prediction_section(df, data_key, avg_mechanical_rate):
+    # Prediction Section
+    st.header("Mechanical Failure Predictions")
+    
+    # Month selector for predictions
+    months = list(calendar.month_name)[1:]
+    selected_month = st.selectbox("Select month for prediction", months)
+    selected_month_num = months.index(selected_month) + 1
+    
+    # Get predictions for selected month
+    future_dates, predictions, lower, upper = predict_mechanical_failures(df, selected_month_num)
+    
+    # Historical data for selected month
+    historical_data = df[df['MONTH_NUM'] == selected_month_num]
+    fig_predict = cached_figure(
+        'prediction',
+        lambda: create_prediction_chart(historical_data, future_dates, predictions, lower, upper, selected_month),
+        data_key, MODEL_PARAMS, INTERVAL_COVERAGE, selected_month_num)
     st.plotly_chart(fig_predict, use_container_width=True)
 
     # Cost Impact Analysis
@@ -257,6 +264,10 @@ def main():
             f"${predicted_cost:,.2f}",
             f"Based on {predicted_rate:.1f}% cancellation rate"
         )
+        # Risk band from the forest's per-tree predictions
+        st.caption(f"{INTERVAL_COVERAGE:.0%} band: ${lower[-1] * avg_cost_per_cancellation:,.2f} – "
+                   f"${upper[-1] * avg_cost_per_cancellation:,.2f} "
+                   f"({lower[-1]:.1f}% – {upper[-1]:.1f}% cancellation rate)")
     
     with col2:
         potential_savings = predicted_cost * 0.15
@@ -271,7 +282,7 @@ def main():
     st.write(f"""
     ### Monthly Analysis for {selected_month}:
     - Historical average cancellation rate: {historical_data['CANCEL_PERCENTAGE'].mean():.1f}%
-    - Predicted cancellation rate: {predicted_rate:.1f}%
+    - Predicted cancellation rate: {predicted_rate:.1f}% ({INTERVAL_COVERAGE:.0%} band {lower[-1]:.1f}% – {upper[-1]:.1f}%)
     - Risk level: {'High' if predicted_rate > avg_mechanical_rate else 'Moderate' if predicted_rate > avg_mechanical_rate/2 else 'Low'}
     
     ### Recommendations:
@@ -280,5 +291,74 @@ def main():
     - Focus on preventive maintenance during {'winter months' if selected_month_num in [12,1,2] else 'summer months' if selected_month_num in [6,7,8] else 'transition months'}
     """)
 
+def main():
+    st.title("🚂 NJ Transit Rail Mechanical Cancellations Analysis")
+    
+    # Display explanation image
+    st.image('assets/output.png',
+             caption='Distribution of Cancellation Categories',
+             use_column_width=True)
+    
+    # Load data
+    df = load_data()
+    
+    # Main metrics
+    st.header("Key Metrics")
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        avg_mechanical_rate = df['CANCEL_PERCENTAGE'].mean()
+        st.metric("Average Mechanical Cancellation Rate", f"{avg_mechanical_rate:.1f}%")
+    
+    with col2:
+        recent_rate = df[df['YEAR'] == df['YEAR'].max()]['CANCEL_PERCENTAGE'].mean()
+        st.metric("Recent Year Average", f"{recent_rate:.1f}%", 
+                 f"{recent_rate - avg_mechanical_rate:.1f}%")
+    
+    with col3:
+        max_month = df.loc[df['CANCEL_PERCENTAGE'].idxmax()]
+        st.metric("Highest Cancellation Month", 
+                 f"{max_month['MONTH']} {max_month['YEAR']}", 
+                 f"{max_month['CANCEL_PERCENTAGE']:.1f}%")
+
+    # Monthly Pattern Analysis
+    st.header("Monthly Cancellation Patterns")
+    
+    # Heatmap for any cancellation category (every category in the source data);
+    # changing the category reruns only this section
+    category_section(cancellation_cube.get_cube())
+    
+    # Historical trend with trend line (a LOWESS fit), built once per dataset
+    data_key = fingerprint(df)
+    st.plotly_chart(cached_figure('trend', lambda: create_trend_chart(df), data_key),
+                    use_container_width=True)
+    
+    # Monthly box plot
+    st.plotly_chart(cached_figure('box', lambda: create_box_plot(df), data_key),
+                    use_container_width=True)
+
+    # Feature Importance
+    st.header("Prediction Model Insights")
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.plotly_chart(cached_figure('importance', lambda: show_feature_importance(df), data_key, MODEL_PARAMS),
+                        use_container_width=True)
+    
+    with col2:
+        st.write("""
+        ### Model Features:
+        - Mean Distance Before Failure: Average distance traveled before a mechanical issue occurs
+        - On-Time Percentage: Overall performance metric
+        - Month: Seasonal patterns
+        - Year: Long-term trends
+        
+        This enhanced model considers multiple factors to provide more accurate predictions.
+        """)
+
+    # Predictions, costs and insights for the selected month; picking another
+    # month reruns only this section
+    prediction_section(df, data_key, avg_mechanical_rate)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
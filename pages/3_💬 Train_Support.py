@@ -1,10 +1,12 @@
 import streamlit as st
-from PIL import Image
 import json
 from datetime import datetime
-import os
-from dotenv import load_dotenv
-from openai import OpenAI
+
+from utils import metrics, startup
+from utils.answer_cache import AnswerCache, faq_version
+from utils.conversation_memory import ConversationMemory
+from utils.faq_index import FAQIndex, create_context_from_faqs, read_faqs
+from utils.llm_client import StreamStats, stream_chat
 
 # Page configuration
 st.set_page_config(
@@ -12,12 +14,7 @@ st.set_page_config(
     page_icon="🚂",
     layout="wide"
 )
-
-# Load environment variables
-load_dotenv()
-
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+metrics.count('page_runs', page='train_support')
 
 # Custom CSS for responsive design
 st.markdown("""
@@ -62,7 +59,7 @@ st.markdown("""
 
 # Load and display the logo with title beside it
 logo_path = "assets/new_jesry_transit_logo.png"
-logo = Image.open(logo_path)
+logo = startup.load_image(logo_path)
 
 col1, col2 = st.columns([1, 3])
 
@@ -79,21 +76,8 @@ st.markdown("<hr>", unsafe_allow_html=True)
 
 # Load FAQs data
 def load_faqs():
-    file_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'FAQs_-_01042022.json')
     try:
-        with open(file_path, 'r') as file:
-            data = json.load(file)
-        
-        faqs = []
-        for section in data['iOSfaqs']['sections']:
-            section_name = section['sec_name']
-            for qa in section['sec_data']:
-                faqs.append({
-                    'section': section_name,
-                    'question': qa['q'],
-                    'answer': qa['a']
-                })
-        return faqs
+        return read_faqs()
     except FileNotFoundError:
         st.error("FAQ file not found. Please check the file path.")
         return []
@@ -101,56 +85,67 @@ def load_faqs():
         st.error("Error reading FAQ file. Please check the file format.")
         return []
 
-def create_context_from_faqs(faqs):
-    context = "You are an NJ Transit support assistant. Here are the official FAQs you should base your answers on:\n\n"
-    for faq in faqs:
-        context += f"Section: {faq['section']}\n"
-        context += f"Q: {faq['question']}\n"
-        context += f"A: {faq['answer']}\n\n"
-    context += "\nPlease use this information to answer questions. If a question isn't covered in the FAQs, you can provide general help but mention that the information is not from the official FAQs."
-    return context
-
-def get_chatbot_response(prompt, conversation_history, faqs_context):
-    """Get response from GPT model with FAQs context"""
+# Number of FAQ entries retrieved into the prompt for each question
+TOP_K_FAQS = 5
+# System prompt when no FAQs could be loaded
+FALLBACK_CONTEXT = "You are an NJ Transit support assistant. Please provide general help."
+
+@st.cache_resource
+def load_faq_index():
+    """BM25 index over the FAQ entries, built once per process"""
+    return FAQIndex(load_faqs())
+
+@st.cache_resource
+def load_answer_cache():
+    """Answers shared by all sessions and persisted across restarts"""
+    return AnswerCache(faq_version())
+
+def answer_locally(prompt, memory):
+    """Answer exact FAQ questions and previously answered questions without the API"""
+    faq = faq_index.match_question(prompt) if len(faq_index) else None
+    if faq is not None:
+        metrics.count('chat_answers', source='faq')
+        return faq['answer']
+    # Cached answers were generated without history, so they only fit a new conversation
+    answer = answer_cache.get(prompt) if not memory.has_history else None
+    metrics.count('chat_answers', source='cache' if answer is not None else 'openai')
+    return answer
+
+@metrics.timed('get_chatbot_response')
+def stream_chatbot_response(prompt, memory, faqs_context, stats):
+    """Stream the GPT model's response with FAQs context, token by token"""
     try:
-        messages = [
-            {"role": "system", "content": faqs_context}
-        ]
-        
-        # Limit conversation history to last 5 messages
-        recent_history = conversation_history[-5:] if len(conversation_history) > 5 else conversation_history
-        
-        # Add conversation history
-        for msg in recent_history:
-            if isinstance(msg, dict) and "role" in msg and "content" in msg:
-                messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
+        # Recent turns that fit the token budget, older ones as a rolling summary
+        messages = memory.build_messages(faqs_context, prompt)
         
-        # Add user's new prompt
-        messages.append({"role": "user", "content": prompt})
-        
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages,
+        yield from stream_chat(
+            messages,
+            stats,
             max_tokens=200,
             temperature=0.7,
             top_p=1.0,
         )
-        return response.choices[0].message.content.strip()
+        # Share only complete answers that did not depend on earlier turns
+        if stats.completed and stats.text.strip() and not memory.has_history:
+            answer_cache.put(prompt, stats.text.strip())
     except Exception as e:
-        return f"I apologize, but I'm having trouble responding right now. Please try again later. Error: {str(e)}"
+        yield f"I apologize, but I'm having trouble responding right now. Please try again later. Error: {str(e)}"
+
+def format_timing(message):
+    """Timestamp line, with latency for streamed answers"""
+    parts = [message["timestamp"]]
+    if message.get("first_token_seconds") is not None:
+        parts.append(f"first token {message['first_token_seconds']:.2f}s")
+    if message.get("total_seconds") is not None:
+        parts.append(f"total {message['total_seconds']:.2f}s")
+    return " · ".join(parts)
+
 # Initialize session states
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-
-if "faqs" not in st.session_state:
-    st.session_state.faqs = load_faqs()
-    if st.session_state.faqs:
-        st.session_state.faqs_context = create_context_from_faqs(st.session_state.faqs)
-    else:
-        st.session_state.faqs_context = "You are an NJ Transit support assistant. Please provide general help."
+if "memory" not in st.session_state:
+    st.session_state.memory = ConversationMemory()
+
+faq_index = load_faq_index()
+answer_cache = load_answer_cache()
 # ... (previous imports and config remain the same)
 
 # After the title and before the chat container, add example questions
@@ -175,37 +170,52 @@ st.markdown("<hr>", unsafe_allow_html=True)
 container = st.container()
 with container:
     # Display chat messages
-    for message in st.session_state.messages:
+    for message in st.session_state.memory.messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
             if "timestamp" in message:
-                st.markdown(f'<div class="timestamp">{message["timestamp"]}</div>', 
+                st.markdown(f'<div class="timestamp">{format_timing(message)}</div>', 
                           unsafe_allow_html=True)
 
     # Chat input
     if prompt := st.chat_input("How can I help you with NJ Transit today?"):
         current_time = datetime.now().strftime("%I:%M %p")
         
-        # Add user message
-        st.session_state.messages.append({
-            "role": "user",
-            "content": prompt,
-            "timestamp": current_time
-        })
+        with st.chat_message("user"):
+            st.markdown(prompt)
         
-        # Get chatbot response
-        response = get_chatbot_response(
-            prompt, 
-            st.session_state.messages, 
-            st.session_state.faqs_context
-        )
+        stats = None
+        with st.chat_message("assistant"):
+            response = answer_locally(prompt, st.session_state.memory)
+            if response is not None:
+                st.markdown(response)
+            else:
+                # Only the FAQ entries relevant to this question go into the prompt
+                if len(faq_index):
+                    faqs_context = create_context_from_faqs(
+                        [faq for faq, _ in faq_index.search(prompt, k=TOP_K_FAQS)]
+                    )
+                else:
+                    faqs_context = FALLBACK_CONTEXT
+                
+                # Render tokens as they arrive
+                stats = StreamStats()
+                response = st.write_stream(stream_chatbot_response(
+                    prompt, 
+                    st.session_state.memory, 
+                    faqs_context,
+                    stats
+                ))
         
-        # Add assistant response
-        st.session_state.messages.append({
-            "role": "assistant",
-            "content": response,
-            "timestamp": current_time
-        })
+        # Add the exchange to the conversation memory
+        st.session_state.memory.add("user", prompt, timestamp=current_time)
+        st.session_state.memory.add(
+            "assistant",
+            response,
+            timestamp=current_time,
+            first_token_seconds=stats.first_token_seconds if stats else None,
+            total_seconds=stats.total_seconds if stats else None,
+        )
         
         st.rerun()
 
@@ -213,5 +223,5 @@ with container:
 col1, col2, col3 = st.columns([6, 1, 1])
 with col3:
     if st.button("🗑️ Clear Chat", help="Clear chat history"):
-        st.session_state.messages = []
+        st.session_state.memory.clear()
         st.rerun()
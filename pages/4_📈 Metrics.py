@@ -0,0 +1,82 @@
+import streamlit as st
+import pandas as pd
+
+from utils import metrics
+
+# Page configuration
+st.set_page_config(
+    page_title="NJ Transit App Metrics",
+    page_icon="📈",
+    layout="wide"
+)
+
+st.title("📈 App Metrics")
+
+# Everything below comes from the process serving this page; each app process
+# keeps (and exports) its own numbers
+snapshot = metrics.snapshot()
+
+if not snapshot["enabled"]:
+    st.info("Instrumentation is off. Start the app with `NJT_METRICS=1` to record spans and counters; "
+            "cache statistics and import times are shown either way.")
+elif metrics.PORT:
+    st.caption(f"Prometheus endpoint: `http://{metrics.HOST}:{metrics.PORT}/metrics` · span log: `{metrics.LOG_PATH}`")
+
+st.button("Refresh")  # a click reruns the page with fresh numbers
+
+# Timing spans
+st.header("Spans")
+if snapshot["spans"]:
+    spans = pd.DataFrame(snapshot["spans"])
+    st.dataframe(spans.round(2), use_container_width=True, hide_index=True)
+else:
+    st.write("No spans recorded yet.")
+
+# Counters (page runs, prediction sources, chat answers, ...)
+st.header("Counters")
+if snapshot["counters"]:
+    st.dataframe(pd.DataFrame(snapshot["counters"]), use_container_width=True, hide_index=True)
+else:
+    st.write("No counters recorded yet.")
+
+# Process-wide caches
+st.header("Caches")
+if snapshot["caches"]:
+    caches = pd.DataFrame.from_dict(snapshot["caches"], orient="index")
+    lookups = caches["hits"] + caches["misses"]
+    caches["hit_rate"] = (caches["hits"] / lookups.where(lookups > 0)).round(3)
+    st.dataframe(caches, use_container_width=True)
+else:
+    st.write("No caches created yet.")
+
+col1, col2 = st.columns(2)
+
+# Deferred imports and their first-use cost
+with col1:
+    st.header("Deferred Imports")
+    if snapshot["imports"]:
+        imports = pd.DataFrame({"module": list(snapshot["imports"]),
+                                "ms": [seconds * 1000 for seconds in snapshot["imports"].values()]})
+        st.dataframe(imports.round(1), use_container_width=True, hide_index=True)
+    else:
+        st.write("No deferred imports yet.")
+
+# Registered collectors, e.g. the prediction batcher
+with col2:
+    st.header("Services")
+    if snapshot["collectors"]:
+        for name, values in snapshot["collectors"].items():
+            st.subheader(name)
+            st.dataframe(pd.Series(values, name="value"), use_container_width=True)
+    else:
+        st.write("No services registered yet.")
+
+with st.expander("Prometheus text"):
+    text = metrics.prometheus_text()
+    st.code(text, language="text")
+    st.download_button("Download", text, file_name="metrics.prom", mime="text/plain")
+
+# Anyone who can open the page could wipe the numbers, so resetting is opt-in
+if metrics.ADMIN and st.button("Reset spans and counters"):
+    metrics.reset()
+    st.rerun()
@@ -0,0 +1,83 @@
+import multiprocessing
+import time
+
+from utils.answer_cache import AnswerCache, faq_version
+
+
+def cache(tmp_path, **kwargs):
+    return AnswerCache("v1", path=str(tmp_path / "answers.json"), **kwargs)
+
+
+def test_normalized_questions_share_an_answer(tmp_path):
+    answers = cache(tmp_path)
+    answers.put("When does the train leave?", "At 8.")
+    assert answers.get("when does the train leave") == "At 8."
+    assert answers.get("Where is the station?") is None
+
+
+def test_answers_survive_a_restart_for_the_same_faq_version(tmp_path):
+    cache(tmp_path).put("Is there wifi?", "Yes.")
+    assert cache(tmp_path).get("Is there wifi?") == "Yes."
+    assert AnswerCache("v2", path=str(tmp_path / "answers.json")).get("Is there wifi?") is None
+
+
+def test_expired_answers_are_dropped(tmp_path, monkeypatch):
+    answers = cache(tmp_path, ttl_seconds=60)
+    answers.put("Is there wifi?", "Yes.")
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert answers.get("Is there wifi?") is None
+    assert len(cache(tmp_path, ttl_seconds=60)) == 0
+
+
+def test_least_recently_used_answer_is_evicted(tmp_path):
+    answers = cache(tmp_path, max_entries=2)
+    answers.put("a", "1")
+    answers.put("b", "2")
+    assert answers.get("a") == "1"  # b is now the least recently used
+    answers.put("c", "3")
+    assert answers.get("b") is None
+    assert (answers.get("a"), answers.get("c")) == ("1", "3")
+    assert len(cache(tmp_path, max_entries=2)) == 2
+
+
+def test_saves_merge_with_other_processes_answers(tmp_path):
+    first, second = cache(tmp_path), cache(tmp_path)
+    first.put("a", "from first")
+    second.put("b", "from second")  # second never loaded "a"
+    first.put("c", "from first")
+    reloaded = cache(tmp_path)
+    assert [reloaded.get(q) for q in "abc"] == ["from first", "from second", "from first"]
+
+
+def test_newer_answer_wins_a_key(tmp_path):
+    first, second = cache(tmp_path), cache(tmp_path)
+    first.put("a", "old")
+    second.put("a", "new")
+    first.put("b", "other")  # first still holds "old" in memory
+    assert cache(tmp_path).get("a") == "new"
+    assert first.get("a") == "new"
+
+
+def _put_many(path, worker):
+    answers = AnswerCache("v1", path=path)
+    for i in range(20):
+        answers.put(f"question {worker} {i}", f"answer {worker} {i}")
+
+
+def test_concurrent_processes_lose_no_answers(tmp_path):
+    path = str(tmp_path / "answers.json")
+    workers = [multiprocessing.Process(target=_put_many, args=(path, worker)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert len(AnswerCache("v1", path=path)) == 80
+
+
+def test_faq_version_is_a_content_hash(tmp_path):
+    path = tmp_path / "faqs.json"
+    path.write_text("[]")
+    before = faq_version(str(path))
+    path.write_text("[{}]")
+    assert faq_version(str(path)) != before and len(before) == 12
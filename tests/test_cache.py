@@ -0,0 +1,58 @@
+import pandas as pd
+
+from utils import cache as cache_module
+from utils.cache import LRUCache, fingerprint, get_cache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache and cache.get("a") == 1 and cache.get("c") == 3
+    assert (cache.hits, cache.misses) == (3, 0)
+    assert cache.get("b") is None and cache.misses == 1
+
+
+def test_max_bytes_evicts_but_keeps_the_newest():
+    cache = LRUCache(max_entries=10, max_bytes=100)
+    cache.put("a", "x", 60)
+    cache.put("b", "y", 60)
+    assert "a" not in cache and cache.nbytes == 60
+    cache.put("c", "z", 500)  # over the bound on its own
+    assert len(cache) == 1 and "c" in cache
+    cache.put("c", "z", 10)  # replacing an entry updates its size
+    assert cache.nbytes == 10
+
+
+def test_get_or_compute_computes_once():
+    cache = LRUCache()
+    calls = []
+    for _ in range(3):
+        assert cache.get_or_compute("k", lambda: calls.append(1) or "value") == "value"
+    assert len(calls) == 1
+
+
+def test_fingerprint_follows_the_content():
+    df = pd.DataFrame({'a': [1, 2], 'b': [3.0, 4.0]})
+    assert fingerprint(df, {'n_estimators': 100}) == fingerprint(df.copy(), {'n_estimators': 100})
+    assert fingerprint(df, {'n_estimators': 100}) != fingerprint(df, {'n_estimators': 200})
+    assert fingerprint(df) != fingerprint(df.assign(b=[3.0, 5.0]))
+    assert fingerprint(df) != fingerprint(df.rename(columns={'b': 'c'}))
+    assert fingerprint("a", "b") != fingerprint("ab")
+
+
+def test_get_cache_returns_one_cache_per_name(monkeypatch):
+    monkeypatch.setattr(cache_module, "_caches", {})
+    models = get_cache("models", max_entries=4)
+    assert get_cache("models") is models and models.max_entries == 4
+    models.put("k", 1)
+    models.get("k")
+    assert cache_module.cache_stats()["models"] == {"entries": 1, "hits": 1, "misses": 0}
+
+
+def test_memory_backend_keeps_shared_caches_per_process(monkeypatch):
+    monkeypatch.setattr(cache_module, "_caches", {})
+    monkeypatch.setattr(cache_module, "CACHE_BACKEND", "memory")
+    assert type(get_cache("figures", shared=True)) is LRUCache
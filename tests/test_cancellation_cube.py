@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from utils.cancellation_cube import CancellationCube
+
+
+def month_rows(year, month, counts, total):
+    return pd.DataFrame({
+        'YEAR': year,
+        'MONTH_NUM': month,
+        'CATEGORY': list(counts),
+        'CANCEL_COUNT': list(counts.values()),
+        'CANCEL_TOTAL': total,
+    })
+
+
+def sample():
+    return pd.concat([
+        month_rows(2020, 1, {'AMTRAK': 30, 'Mechanical': 10}, 40),
+        month_rows(2020, 2, {'AMTRAK': 5, 'Mechanical': 15}, 20),
+    ], ignore_index=True)
+
+
+def test_percentages_are_shares_of_the_month():
+    cube = CancellationCube.from_frame(sample())
+    assert cube.heatmap('Mechanical')[0, :2].tolist() == [25.0, 75.0]
+    assert np.isnan(cube.heatmap('Mechanical')[0, 2])
+    assert cube.total == 60
+
+
+def test_repeated_month_in_one_batch_stays_within_100_percent():
+    # benchmarks.synthetic.scale_rows repeats every row: each copy is another observation
+    cube = CancellationCube.from_frame(pd.concat([sample()] * 3, ignore_index=True))
+    single = CancellationCube.from_frame(sample())
+    np.testing.assert_array_equal(cube.percentages, single.percentages)
+    np.testing.assert_array_equal(cube.totals, single.totals * 3)
+    assert np.nansum(cube.percentages, axis=2).max() <= 100
+    assert cube.shares().sum() <= 100
+
+
+def test_reappended_month_is_not_counted_twice():
+    cube = CancellationCube.from_frame(sample())
+    assert cube.append(sample()) == 0
+    assert cube.total == 60
+
+    changed = month_rows(2020, 1, {'AMTRAK': 20, 'Mechanical': 20}, 40)
+    assert cube.append(changed, replace=True) == 1
+    assert cube.heatmap('Mechanical')[0, 0] == 50.0
+    assert cube.total == 60
+    assert cube.shares().sum() == 100
+
+
+def test_append_matches_a_full_build():
+    later = month_rows(2021, 3, {'Weather': 7, 'AMTRAK': 3}, 10)
+    cube = CancellationCube.from_frame(sample())
+    assert cube.append(later) == 1
+    full = CancellationCube.from_frame(pd.concat([sample(), later], ignore_index=True))
+    assert cube.categories == full.categories
+    np.testing.assert_array_equal(cube.counts, full.counts)
+    np.testing.assert_array_equal(cube.totals, full.totals)
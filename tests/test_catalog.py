@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from utils import catalog, ingest
+
+
+@pytest.fixture(autouse=True)
+def fresh_catalog(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "INGEST_DIR", str(tmp_path / "ingest"))
+    monkeypatch.setattr(catalog, "_frames", {})
+
+
+def test_every_dataset_loads_normalized():
+    for name in catalog.DATASETS:
+        df = catalog.get(name)
+        assert len(df) > 0, name
+        if 'MONTH' in df.columns:
+            assert df['MONTH'].dtype == ingest.MONTH_DTYPE
+            assert df['MONTH_NUM'].between(1, 12).all()
+            assert (df['DATE'].dt.day == 1).all()
+
+
+def test_strings_and_headers_are_stripped():
+    df = catalog.get('bus_otp')  # OTP_YEAR/OTP_MONTH columns in the CSV
+    assert {'YEAR', 'MONTH'} <= set(df.columns)
+    categories = catalog.get('rail_cancellations')['CATEGORY'].cat.categories
+    assert all(category == category.strip() for category in categories)
+
+
+def test_callers_share_one_read_only_frame():
+    first, second = catalog.get('rail_cancellations'), catalog.get('rail_cancellations')
+    assert first is not second
+    assert not first['CANCEL_COUNT'].to_numpy().flags.writeable
+    first['EXTRA'] = 1  # a caller's new column stays on its own copy
+    assert 'EXTRA' not in catalog.get('rail_cancellations').columns
+
+
+def test_mechanical_joins_the_monthly_performance():
+    df = catalog.get('mechanical')
+    assert set(df['CATEGORY'].astype(str)) == {'Mechanical'}
+    assert {'MEAN_DISTANCE_BEFORE_FAILURE', 'ON_TIME_PERCENTAGE', 'DATE'} <= set(df.columns)
+
+
+def test_describe_lists_every_dataset():
+    described = catalog.describe()
+    assert described['name'].tolist() == list(catalog.DATASETS)
+    assert (described['rows'] > 0).all() and pd.api.types.is_integer_dtype(described['bytes'])
@@ -0,0 +1,68 @@
+from utils.conversation_memory import ConversationMemory, count_tokens, truncate_to_tokens
+
+
+def turn(i, words=40):
+    return f"Message {i}. " + " ".join(f"word{i}" for _ in range(words))
+
+
+def history_tokens(messages):
+    return sum(count_tokens(m["content"]) for m in messages[1:-1])
+
+
+def test_history_stays_within_budget_and_keeps_the_newest():
+    memory = ConversationMemory(history_budget=200)
+    for i in range(20):
+        memory.add("user" if i % 2 == 0 else "assistant", turn(i))
+    messages = memory.build_messages("You are helpful.", "Next question?")
+    assert history_tokens(messages) <= 200
+    assert messages[-2]["content"] == turn(19)
+    assert messages[-1] == {"role": "user", "content": "Next question?"}
+
+
+def test_dropped_messages_are_summarized_once_in_order():
+    memory = ConversationMemory(history_budget=200, summary_budget=10_000)
+    for i in range(10):
+        memory.add("user", turn(i))
+    memory.build_messages("system", "q")
+    folded = len(memory.summary_lines)
+    assert folded > 0
+    assert memory.summary_lines[0].startswith("User: Message 0.")
+    memory.build_messages("system", "q")
+    assert len(memory.summary_lines) == folded  # nothing folded twice
+    system = memory.build_messages("system", "q")[0]["content"]
+    assert "Summary of the earlier conversation:" in system
+
+
+def test_summary_drops_its_oldest_lines_over_budget():
+    memory = ConversationMemory(history_budget=50, summary_budget=30)
+    for i in range(30):
+        memory.add("user", turn(i))
+    memory.build_messages("system", "q")
+    assert sum(count_tokens(line) for line in memory.summary_lines) <= 30
+    assert "Message 0." not in memory.summary
+
+
+def test_message_count_is_capped():
+    memory = ConversationMemory(max_messages=5, summary_budget=10_000)
+    for i in range(12):
+        memory.add("user", turn(i, words=2))
+    assert len(memory.messages) == 5
+    assert memory.messages[0]["content"] == turn(7, words=2)
+    assert memory.summary_lines[0].startswith("User: Message 0.")
+
+
+def test_long_prompts_are_truncated_at_both_ends():
+    prompt = "start " + "x" * 10_000 + " end"
+    cut = truncate_to_tokens(prompt, 100)
+    assert cut.startswith("start") and cut.endswith("end") and "[...]" in cut
+    assert count_tokens(cut) <= 110
+    assert truncate_to_tokens("short", 100) == "short"
+
+
+def test_clear_forgets_everything():
+    memory = ConversationMemory()
+    assert not memory.has_history
+    memory.add("user", "hello", timestamp="10:00")
+    assert memory.has_history and memory.messages[0]["timestamp"] == "10:00"
+    memory.clear()
+    assert not memory.has_history and memory.summary == ""
@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import write_trips
+from utils import delay_index
+from utils.delay_index import BIN_EDGES, DelayIndex, N_BINS
+from utils.stations import DELAY_FEATURES
+
+
+@pytest.fixture(scope="module")
+def trips(tmp_path_factory):
+    return write_trips(str(tmp_path_factory.mktemp("data")), 6000)
+
+
+def one_cell(delays, hour=8, day=1, from_id=105, to_id=107):
+    n = len(delays)
+    features = pd.DataFrame({'hour_of_day': [hour] * n, 'day_of_week': [day] * n,
+                             'from_id': [from_id] * n, 'to_id': [to_id] * n})[DELAY_FEATURES]
+    return features, np.asarray(delays, dtype=np.float64)
+
+
+def test_quantiles_are_within_a_bin_of_numpy():
+    rng = np.random.default_rng(0)
+    delays = rng.exponential(6, 5000)
+    index = DelayIndex()
+    index.add(*one_cell(delays))
+    stats = index.lookup(105, 107, 8, 1)
+    assert stats['samples'] == 5000
+    assert stats['mean'] == pytest.approx(delays.mean())
+    for name, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+        exact = np.quantile(delays, q)
+        bin_width = np.diff(BIN_EDGES)[np.searchsorted(BIN_EDGES, exact, side='right') - 1]
+        assert abs(stats[name] - exact) <= bin_width
+
+
+def test_unobserved_journeys_are_none():
+    index = DelayIndex()
+    index.add(*one_cell([1.0, 2.0]))
+    assert index.lookup(105, 107, 9, 1) is None
+    assert DelayIndex().lookup(105, 107, 8, 1) is None
+
+
+def test_merge_adds_histograms():
+    first, second, both = DelayIndex(), DelayIndex(), DelayIndex()
+    first.add(*one_cell([1.0, 2.0, 50.0]))
+    second.add(*one_cell([3.0, 4.0], hour=9))
+    second.add(*one_cell([5.0]))
+    both.add(*one_cell([1.0, 2.0, 50.0, 5.0]))
+    both.add(*one_cell([3.0, 4.0], hour=9))
+    first.merge(second)
+    np.testing.assert_array_equal(first.keys, both.keys)
+    np.testing.assert_array_equal(first.histograms, both.histograms)
+    assert first.lookup(105, 107, 8, 1) == both.lookup(105, 107, 8, 1)
+
+
+def test_out_of_range_delays_land_in_the_end_bins():
+    index = DelayIndex()
+    index.add(*one_cell([-5.0, 5000.0]))
+    assert index.histograms[0, 0] == 1 and index.histograms[0, N_BINS - 1] == 1
+
+
+def test_update_index_adds_only_new_files(trips, tmp_path):
+    path = str(tmp_path / "index.npz")
+    quiet = lambda message: None
+    index = delay_index.update_index(trips[:2], path, chunk_rows=500, log=quiet)
+    assert set(index.sources) == {os.path.basename(p) for p in trips[:2]}
+    index = delay_index.update_index(trips, path, log=quiet)
+    full = DelayIndex()
+    for trip_path in trips:
+        full.ingest(trip_path)
+    np.testing.assert_array_equal(index.histograms, full.histograms)
+    np.testing.assert_allclose(index.totals, full.totals)
+    assert int(index.counts.sum()) == sum(full.sources.values())
+
+    loaded = delay_index.load_delay_index(path)
+    assert loaded is delay_index.load_delay_index(path)  # once per process
+    np.testing.assert_allclose(loaded.percentiles, full.percentiles)
+    assert len(loaded.cells()) == len(full)
+
+
+def test_load_rejects_other_bin_edges(tmp_path, monkeypatch):
+    path = str(tmp_path / "index.npz")
+    index = DelayIndex()
+    index.add(*one_cell([1.0]))
+    index.save(path)
+    monkeypatch.setattr(delay_index, "BIN_EDGES", BIN_EDGES * 2)
+    with pytest.raises(ValueError, match="different bin edges"):
+        DelayIndex.load(path)
+    assert delay_index.load_delay_index(str(tmp_path / "missing.npz")) is None
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+
+from utils import delay_table, forest_engine
+from utils.stations import DELAY_FEATURES
+
+STATION_IDS = [3, 8, 21, 40]
+
+
+@pytest.fixture(scope="module")
+def model():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({
+        'hour_of_day': rng.integers(0, 24, 500),
+        'day_of_week': rng.integers(0, 7, 500),
+        'from_id': rng.choice(STATION_IDS, 500),
+        'to_id': rng.choice(STATION_IDS, 500),
+    })[DELAY_FEATURES]
+    y = X['hour_of_day'] * 0.5 + X['from_id'] % 5 + rng.normal(0, 1, len(X))
+    return RandomForestRegressor(n_estimators=5, max_depth=6, random_state=0).fit(X, y)
+
+
+@pytest.fixture(scope="module")
+def table(model, tmp_path_factory):
+    # ".npy" inside a directory name must not confuse the sidecar paths
+    path = str(tmp_path_factory.mktemp("tables.npy") / "v1.npy")
+    delay_table.build_delay_table(model, path, station_ids=STATION_IDS, chunk_stations=3, model_version="v1")
+    return delay_table.load_delay_table(path)
+
+
+def journey(from_id, to_id, hour, day):
+    return pd.DataFrame([[hour, day, from_id, to_id]], columns=['hour_of_day', 'day_of_week', 'from_id', 'to_id'])[DELAY_FEATURES]
+
+
+def test_lookup_matches_the_model(model, table):
+    for from_id, to_id, hour, day in [(3, 40, 8, 1), (21, 8, 17, 4), (40, 3, 0, 6)]:
+        expected = model.predict(journey(from_id, to_id, hour, day))[0]
+        assert table.lookup(from_id, to_id, hour, day) == pytest.approx(expected, rel=1e-6)
+    assert table.meta["model_version"] == "v1"
+
+
+def test_lookup_many_matches_lookup(table):
+    from_ids, to_ids, hours, days = [3, 21, 40], [40, 8, 3], [8, 17, 0], [1, 4, 6]
+    expected = [table.lookup(*args) for args in zip(from_ids, to_ids, hours, days)]
+    assert np.allclose(table.lookup_many(from_ids, to_ids, hours, days), expected)
+
+
+@pytest.mark.parametrize("unknown", [1, 9, 99])  # before, between and after the known ids
+def test_unknown_stations_raise_key_error(table, unknown):
+    with pytest.raises(KeyError):
+        table.lookup(unknown, 8, 0, 0)
+    with pytest.raises(KeyError, match=str(unknown)):
+        table.lookup_many([3, unknown], [8, 8], [0, 0], [0, 0])
+    with pytest.raises(KeyError):
+        table.lookup_many([3], [unknown], [0], [0])
+
+
+def test_forest_tables_have_intervals(model, table):
+    _, lower, upper = forest_engine.forest_interval(model, journey(3, 40, 8, 1))
+    assert table.lookup_interval(3, 40, 8, 1) == pytest.approx((lower[0], upper[0]), rel=1e-6)
+
+
+def test_models_without_trees_have_no_intervals(tmp_path):
+    X = journey(3, 40, 8, 1)
+    linear = LinearRegression().fit(pd.concat([X, journey(21, 8, 17, 4)]), [1.0, 2.0])
+    path = str(tmp_path / "linear.npy")
+    meta = delay_table.build_delay_table(linear, path, station_ids=STATION_IDS)
+    assert meta["interval_coverage"] is None
+    loaded = delay_table.load_delay_table(path)
+    assert loaded.lookup_interval(3, 40, 8, 1) is None
+    assert loaded.lookup(3, 40, 8, 1) == pytest.approx(linear.predict(X)[0], rel=1e-6)
+
+
+def test_sidecars_sit_next_to_the_table(tmp_path):
+    path = str(tmp_path / "a.npy.d" / "v2.npy")
+    assert delay_table.interval_path(path) == str(tmp_path / "a.npy.d" / "v2.interval.npy")
+    assert delay_table.meta_path(path) == str(tmp_path / "a.npy.d" / "v2.json")
+
+
+def test_missing_table_loads_as_none(tmp_path):
+    assert delay_table.load_delay_table(str(tmp_path / "missing.npy")) is None
+
+
+def test_copy_table_serves_a_new_version(model, tmp_path):
+    table_dir = str(tmp_path)
+    assert delay_table.copy_table("v1", "v2", table_dir) is None  # nothing built yet
+    delay_table.build_delay_table(model, delay_table.table_path("v1", table_dir),
+                                  station_ids=STATION_IDS, model_version="v1")
+    meta = delay_table.copy_table("v1", "v2", table_dir, compacted_from="v1")
+    assert meta["model_version"] == "v2" and meta["compacted_from"] == "v1"
+    original = delay_table.load_delay_table(delay_table.table_path("v1", table_dir))
+    copied = delay_table.load_delay_table(delay_table.table_path("v2", table_dir))
+    np.testing.assert_array_equal(copied.values, original.values)
+    np.testing.assert_array_equal(copied.intervals, original.intervals)
+    assert copied.meta["model_version"] == "v2"
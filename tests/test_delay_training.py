@@ -0,0 +1,119 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import write_trips
+from utils import delay_training, model_registry
+from utils.delay_training import TripAggregates
+
+
+@pytest.fixture(scope="module")
+def trips(tmp_path_factory):
+    return write_trips(str(tmp_path_factory.mktemp("data")), 6000)
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    # refresh() reads the default registry and training directory
+    monkeypatch.setattr(model_registry, "MODELS_DIR", str(tmp_path / "models"))
+    monkeypatch.setattr(model_registry, "_registry_cache", {"mtime": None, "data": None})
+    monkeypatch.setattr(delay_training, "TRAINING_DIR", str(tmp_path / "models" / "delay_training"))
+
+
+def cell_stats(paths):
+    frames = [features.assign(delay=delay) for path in paths for features, delay in delay_training.read_trip_chunks(path)]
+    return pd.concat(frames).groupby(delay_training.DELAY_FEATURES)['delay'].agg(['count', 'sum'])
+
+
+def test_cells_match_a_full_groupby_at_any_chunk_size(trips):
+    expected = cell_stats(trips)
+    for chunk_rows in (333, 100_000):
+        aggregates = TripAggregates()
+        for path in trips:
+            aggregates.ingest(path, chunk_rows)
+        actual = aggregates.features().assign(count=aggregates.count, sum=aggregates.total)
+        actual = actual.set_index(delay_training.DELAY_FEATURES).sort_index()
+        np.testing.assert_array_equal(actual['count'], expected['count'])
+        np.testing.assert_allclose(actual['sum'], expected['sum'])
+        assert aggregates.rows == expected['count'].sum()
+
+
+def test_merge_equals_ingesting_everything(trips, tmp_path):
+    everything = TripAggregates()
+    for path in trips:
+        everything.ingest(path)
+    first, rest = TripAggregates(), TripAggregates()
+    first.ingest(trips[0])
+    for path in trips[1:]:
+        rest.ingest(path)
+    first.merge(rest)
+    np.testing.assert_array_equal(first.keys, everything.keys)
+    np.testing.assert_allclose(first.total_sq, everything.total_sq)
+    assert first.sources == everything.sources
+
+    path = str(tmp_path / "aggregates.npz")
+    first.save(path)
+    loaded = TripAggregates.load(path)
+    np.testing.assert_array_equal(loaded.count, first.count)
+    assert loaded.sources == first.sources
+
+
+def test_cell_keys_round_trip():
+    features = pd.DataFrame({'hour_of_day': [0, 23], 'day_of_week': [6, 0],
+                             'from_id': [1, 43599], 'to_id': [38081, 2]})[delay_training.DELAY_FEATURES]
+    keys = delay_training.pack_cells(*(features[name].to_numpy(np.int64) for name in delay_training.DELAY_FEATURES))
+    pd.testing.assert_frame_equal(delay_training.unpack_cells(keys), features)
+
+
+def test_unseen_stations_encode_as_missing():
+    encoder = delay_training.StationEncoder([40, 3, 21])
+    assert encoder.encode([3, 40, 7]).tolist()[:2] == [1.0, 0.0]
+    assert np.isnan(encoder.encode([7])[0])
+    extended = encoder.extend([7, 3])
+    assert extended.encode([40, 3, 21, 7]).tolist() == [0.0, 1.0, 2.0, 3.0]  # old codes unchanged
+
+
+def test_evaluate_is_bounded_by_the_noise_floor(trips):
+    model, aggregates, report = delay_training.train(trips, log=lambda message: None, max_iter=20)
+    assert report['noise_floor_rmse'] <= report['rmse']
+    assert report['rows'] == aggregates.rows and report['files'] == 3
+
+
+def register(model, aggregates):
+    model_registry.register_model(delay_training.MODEL_NAME, model,
+                                  metadata={"aggregate_sources": sorted(aggregates.sources)})
+    aggregates.save(delay_training.aggregates_path())
+
+
+def test_refresh_adds_trees_for_a_new_month(trips, registry):
+    quiet = lambda message: None
+    model, aggregates, _ = delay_training.train(trips[:2], log=quiet, max_iter=20)
+    register(model, aggregates)
+
+    refreshed, merged, report = delay_training.refresh(trips, extra_iter=5, log=quiet)
+    assert report['mode'] == "warm_start"
+    assert report['new_files'] == [os.path.basename(trips[2])]
+    assert report['iterations'] == model.regressor.n_iter_ + 5
+    full = TripAggregates()
+    for path in trips:
+        full.ingest(path)
+    np.testing.assert_array_equal(merged.count, full.count)
+    # The registry's shared instance is left alone
+    assert model_registry.load_model(delay_training.MODEL_NAME).regressor.n_iter_ == 20
+
+    register(refreshed, merged)
+    assert delay_training.refresh(trips, log=quiet)[0] is None  # nothing new
+
+
+def test_refresh_refits_when_the_aggregates_do_not_match_the_model(trips, registry):
+    quiet = lambda message: None
+    model, aggregates, _ = delay_training.train(trips[:1], log=quiet, max_iter=20)
+    model_registry.register_model(delay_training.MODEL_NAME, model,
+                                  metadata={"aggregate_sources": sorted(aggregates.sources)})
+    _, other, _ = delay_training.train(trips[1:2], log=quiet, max_iter=5)
+    other.save(delay_training.aggregates_path())
+
+    _, _, report = delay_training.refresh(trips[2:], log=quiet)
+    assert report['mode'] == "refit"
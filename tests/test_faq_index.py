@@ -0,0 +1,63 @@
+import pytest
+
+from utils.faq_index import FAQIndex, create_context_from_faqs, normalize_question, read_faqs, tokenize
+
+FAQS = [
+    {'section': 'Tickets', 'question': 'How do I refund a rail ticket?',
+     'answer': 'Unused rail tickets can be refunded within 30 days.'},
+    {'section': 'Tickets', 'question': 'How do I refund a light rail ticket?',
+     'answer': 'Light rail tickets are refunded at ticket vending machines.'},
+    {'section': 'App', 'question': 'Which mobile devices can run the app?',
+     'answer': 'The app runs on iPhone and Android devices.'},
+    {'section': 'Parking', 'question': 'Where can I park?',
+     'answer': 'Parking is available at most stations; see the parking page.'},
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return FAQIndex(FAQS)
+
+
+def test_tokens_drop_stopwords_and_punctuation():
+    assert tokenize("How do I refund a Rail-ticket?") == ['refund', 'rail', 'ticket']
+    assert normalize_question("  Where can I PARK?? ") == "where can i park"
+
+
+def test_best_match_comes_first(index):
+    [(faq, score), *rest] = index.search("my phone is an android device, can it run the app")
+    assert faq['section'] == 'App' and score > 0
+    assert all(other_score <= score for _, other_score in rest)
+
+
+def test_only_positive_scores_are_returned(index):
+    assert index.search("parking")[0][0]['section'] == 'Parking'
+    assert index.search("zeppelin timetable") == []
+    assert len(index.search("refund ticket", k=1)) == 1
+
+
+def test_question_words_weigh_more_than_answer_words():
+    index = FAQIndex([{'section': 's', 'question': 'Bikes on trains?', 'answer': 'Folding ones only.'},
+                      {'section': 's', 'question': 'Folding seats?', 'answer': 'Bikes go in the vestibule.'}])
+    first, second = index.scores("bikes")
+    assert first > second > 0
+
+
+def test_exact_question_match(index):
+    assert index.match_question("how do i refund a rail ticket")['question'] == FAQS[0]['question']
+    assert index.match_question("How do I refund a light rail ticket") is FAQS[1]
+    assert index.match_question("Can I refund a ticket bought yesterday?") is None
+
+
+def test_empty_index():
+    empty = FAQIndex([])
+    assert len(empty) == 0 and empty.search("refund") == []
+
+
+def test_bundled_faqs_load_and_build_a_prompt():
+    faqs = read_faqs()
+    assert faqs and {'section', 'question', 'answer'} <= set(faqs[0])
+    index = FAQIndex(faqs)
+    assert index.match_question(faqs[0]['question']) is faqs[0]
+    context = create_context_from_faqs(faqs[:2])
+    assert f"Q: {faqs[1]['question']}" in context
@@ -0,0 +1,180 @@
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.tree import DecisionTreeRegressor
+
+from utils import forest_engine
+from utils.forest_engine import compile_forest
+from utils.stations import DELAY_FEATURES
+
+
+@pytest.fixture(scope="module")
+def data():
+    # Journey-like features: hour, weekday and two station ids
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({
+        'hour_of_day': rng.integers(0, 24, 2000),
+        'day_of_week': rng.integers(0, 7, 2000),
+        'from_id': rng.integers(1, 200, 2000),
+        'to_id': rng.integers(1, 200, 2000),
+    })[DELAY_FEATURES]
+    y = X['hour_of_day'] * 0.5 + (X['from_id'] % 7) + rng.normal(0, 2, len(X))
+    return X, y
+
+
+@pytest.fixture(scope="module")
+def model(data):
+    X, y = data
+    return RandomForestRegressor(n_estimators=12, max_depth=10, random_state=0).fit(X, y)
+
+
+def test_compiled_forest_matches_sklearn(model, data):
+    X, _ = data
+    forest = compile_forest(model)
+    assert np.allclose(forest.predict(X), model.predict(X))
+    assert forest_engine.check_against_sklearn(model, forest, X) < 1e-9
+
+
+def test_feature_order_comes_from_the_model(model, data):
+    X, _ = data
+    forest = compile_forest(model)
+    shuffled = X[list(reversed(DELAY_FEATURES))]
+    assert np.allclose(forest.predict(shuffled), model.predict(X))
+
+
+def test_single_row_and_small_batches(model, data):
+    X, _ = data
+    forest = compile_forest(model)
+    for rows in (X.iloc[:1], X.iloc[:7]):
+        assert np.allclose(forest.predict(rows), model.predict(rows))
+    walked = X.iloc[:forest_engine.SKLEARN_BATCH_ROWS - 1]  # below the hand-off to sklearn's trees
+    assert np.allclose(forest.predict(walked, batch_rows=100), model.predict(walked))
+
+
+def test_single_tree(data):
+    X, y = data
+    tree = DecisionTreeRegressor(max_depth=8, random_state=0).fit(X, y)
+    assert np.allclose(compile_forest(tree).predict(X), tree.predict(X))
+
+
+def test_missing_values_follow_sklearn():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(500, 3))
+    X[rng.random(X.shape) < 0.1] = np.nan
+    y = np.nan_to_num(X[:, 0]) + rng.normal(0, 0.1, 500)
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y)
+    assert np.allclose(compile_forest(model).predict(X), model.predict(X))
+
+
+def test_compacted_keeps_predictions_with_smaller_arrays(model, data):
+    X, _ = data
+    forest = compile_forest(model)
+    compact = forest.compacted()
+    assert compact.value.dtype == np.float32
+    assert compact.feature.dtype == np.uint8
+    assert compact.nbytes < forest.nbytes
+    # Only the leaf values are rounded (to float32); the splits are identical
+    np.testing.assert_array_equal(compact._leaves(forest._as_array(X)), forest._leaves(forest._as_array(X)))
+    assert np.allclose(compact.predict(X), model.predict(X), rtol=1e-6, atol=1e-5)
+
+
+def test_pruning_is_opt_in(model, data):
+    X, _ = data
+    pruned = compile_forest(model, min_leaf_samples=20)
+    assert pruned.n_nodes < compile_forest(model).n_nodes
+    assert not np.allclose(pruned.predict(X), model.predict(X))
+
+
+def test_predict_interval_is_a_quantile_of_the_trees(model, data):
+    X, _ = data
+    forest = compile_forest(model)
+    trees = np.stack([estimator.predict(X.to_numpy(np.float32)) for estimator in model.estimators_])
+    mean, lower, upper = forest.predict_interval(X, coverage=0.8)
+    assert np.allclose(mean, model.predict(X))
+    assert np.allclose(lower, np.quantile(trees, 0.1, axis=0))
+    assert np.allclose(upper, np.quantile(trees, 0.9, axis=0))
+    assert np.all(lower <= upper)
+
+
+def test_forest_interval_matches_the_compiled_forest(model, data):
+    X, _ = data
+    expected = compile_forest(model).predict_interval(X)
+    for actual, wanted in zip(forest_engine.forest_interval(model, X, batch_rows=300), expected):
+        assert np.allclose(actual, wanted)
+
+
+def test_tree_quantiles_match_numpy():
+    trees = np.random.default_rng(2).normal(size=(25, 40))
+    quantiles = [0.05, 0.5, 0.95]
+    assert np.allclose(forest_engine.tree_quantiles(trees, quantiles), np.quantile(trees, quantiles, axis=0))
+
+
+def test_rejects_classifiers(data):
+    X, y = data
+    classifier = RandomForestClassifier(n_estimators=2, random_state=0).fit(X, y > y.median())
+    with pytest.raises(TypeError):
+        compile_forest(classifier)
+
+
+def journeys(n, seed=3):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'hour_of_day': rng.integers(0, 24, n),
+        'day_of_week': rng.integers(0, 7, n),
+        'from_id': rng.integers(1, 200, n),
+        'to_id': rng.integers(1, 200, n),
+    })[DELAY_FEATURES]
+
+
+def test_large_batches_match_the_walk(model):
+    X = journeys(3 * forest_engine.SKLEARN_BATCH_ROWS)
+    for forest in (compile_forest(model), compile_forest(model).compacted(),
+                   compile_forest(model, min_leaf_samples=20)):
+        walked = np.concatenate([forest.predict_trees(X.iloc[lo:lo + 500]) for lo in range(0, len(X), 500)],
+                                axis=1)
+        np.testing.assert_array_equal(forest.predict_trees(X), walked)
+    assert np.allclose(compile_forest(model).predict(X), model.predict(X))
+
+
+def test_large_batches_with_missing_values():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(2 * forest_engine.SKLEARN_BATCH_ROWS, 3))
+    X[rng.random(X.shape) < 0.1] = np.nan
+    y = np.nan_to_num(X[:, 0]) + rng.normal(0, 0.1, len(X))
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y)
+    assert np.allclose(compile_forest(model).predict(X), model.predict(X))
+
+
+def test_pickle_keeps_only_the_arrays(model):
+    forest = compile_forest(model)
+    forest.predict(journeys(forest_engine.SKLEARN_BATCH_ROWS))
+    assert forest.sklearn_trees()
+    restored = pickle.loads(pickle.dumps(forest))
+    assert restored._sklearn_trees is None
+    X = journeys(forest_engine.SKLEARN_BATCH_ROWS)
+    np.testing.assert_array_equal(restored.predict(X), forest.predict(X))
+
+
+def test_large_batches_are_at_least_as_fast_as_sklearn():
+    X = journeys(50_000)
+    rng = np.random.default_rng(0)
+    y = X['hour_of_day'] % 7 * 1.5 + X['day_of_week'] + rng.normal(0, 2, len(X))
+    model = RandomForestRegressor(n_estimators=30, min_samples_leaf=3, random_state=0).fit(X, y)
+    forest = compile_forest(model).compacted()
+    forest.predict(X.iloc[:forest_engine.SKLEARN_BATCH_ROWS])  # builds the sklearn trees once
+
+    def best_of(fn, repeat=3):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    sklearn_seconds = best_of(lambda: model.predict(X))
+    compiled_seconds = best_of(lambda: forest.predict(X))
+    assert compiled_seconds <= sklearn_seconds * 1.1, (compiled_seconds, sklearn_seconds)
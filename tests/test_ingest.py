@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import ingest
+
+
+@pytest.fixture
+def ingest_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "INGEST_DIR", str(tmp_path / "ingest"))
+    return tmp_path / "ingest"
+
+
+def test_columns_round_trip_memory_mapped(tmp_path):
+    df = ingest.normalize_months(pd.DataFrame({'YEAR': [2020, 2021], 'MONTH': ['  january', 'MARCH '],
+                                               'CANCEL_COUNT': [3.5, 7.0]}))
+    ingest.write_columns(df, str(tmp_path / "cols"))
+    loaded = ingest.read_columns(str(tmp_path / "cols"))
+    assert not loaded['YEAR'].to_numpy().flags.writeable  # mapped read-only from disk
+    assert loaded.dtypes.equals(df.dtypes)
+    assert loaded.to_dict('list') == df.to_dict('list')
+    assert loaded['MONTH'].cat.ordered and loaded['MONTH_NUM'].tolist() == [1, 3]
+
+
+def test_cached_frame_builds_once_per_source_version(tmp_path, ingest_dir):
+    source = tmp_path / "source.csv"
+    source.write_text("YEAR,MONTH,CANCEL_COUNT\n2020,JANUARY,3\n")
+    builds = []
+
+    def build():
+        builds.append(1)
+        return ingest.normalize_months(pd.read_csv(source))
+
+    first = ingest.cached_frame("cancellations", [str(source)], build)
+    again = ingest.cached_frame("cancellations", [str(source)], build)
+    assert len(builds) == 1
+    assert first.to_dict('list') == again.to_dict('list')
+
+    source.write_text("YEAR,MONTH,CANCEL_COUNT\n2020,JANUARY,3\n2020,FEBRUARY,4\n")
+    changed = ingest.cached_frame("cancellations", [str(source)], build)
+    assert len(builds) == 2 and len(changed) == 2
+    assert len([entry for entry in os.listdir(ingest_dir) if entry.startswith("cancellations-")]) == 1
+
+
+def test_month_start():
+    dates = ingest.month_start(pd.Series([2020, 2021]), pd.Series([2, 12]))
+    assert dates.tolist() == [pd.Timestamp(2020, 2, 1), pd.Timestamp(2021, 12, 1)]
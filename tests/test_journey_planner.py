@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+
+from utils import journey_planner
+from utils.journey_planner import TRANSFER_MINUTES, JourneyGraph
+
+# Line A runs 1 -> 2 -> 3 and line B 3 -> 4, on Monday 6 January 2020 at 8am
+STOPS = [
+    # train, line, stop, from, to, scheduled, delay
+    ('A1', 'Line A', 0, 1, 1, '08:00', 0.0),
+    ('A1', 'Line A', 1, 1, 2, '08:10', 1.0),
+    ('A1', 'Line A', 2, 2, 3, '08:20', 3.0),
+    ('B1', 'Line B', 0, 3, 3, '08:30', 0.0),
+    ('B1', 'Line B', 1, 3, 4, '08:45', 2.0),
+]
+
+
+@pytest.fixture(scope="module")
+def graph(tmp_path_factory):
+    path = tmp_path_factory.mktemp("data") / "2020_01.csv"
+    pd.DataFrame([{'date': '2020-01-06', 'train_id': train, 'stop_sequence': stop, 'from_id': from_id,
+                   'to_id': to_id, 'scheduled_time': f'2020-01-06 {time}:00', 'delay_minutes': delay,
+                   'line': line} for train, line, stop, from_id, to_id, time, delay in STOPS]).to_csv(path, index=False)
+    return JourneyGraph.build([str(path)], log=lambda message: None)
+
+
+def test_single_line_journey(graph):
+    journey = graph.plan(1, 3, 8, 0)
+    assert journey['transfers'] == 0
+    [leg] = journey['legs']
+    assert (leg['line'], leg['from_id'], leg['to_id'], leg['stops']) == ('Line A', 1, 3, 2)
+    # 10 + 10 scheduled minutes plus the 1 + 2 minutes of delay picked up on the way
+    assert journey['minutes'] == pytest.approx(23)
+    assert journey['delay'] == pytest.approx(3)
+
+
+def test_transfer_between_lines(graph):
+    journey = graph.plan(1, 4, 8, 0)
+    assert journey['transfers'] == 1
+    assert [leg['line'] for leg in journey['legs']] == ['Line A', 'Line B']
+    assert journey['minutes'] == pytest.approx(23 + TRANSFER_MINUTES + 17)
+    assert journey['delay'] == pytest.approx(2)
+    assert graph.plan(1, 4, 8, 0, max_transfers=0) is None
+
+
+def test_unseen_hours_use_the_edge_mean(graph):
+    assert graph.plan(1, 3, 14, 5)['minutes'] == pytest.approx(23)
+
+
+def test_no_journey(graph):
+    assert graph.plan(4, 1, 8, 0) is None  # lines only run one way
+    assert graph.plan(1, 99, 8, 0) is None
+    assert graph.plan(2, 2, 8, 0) is None
+
+
+def test_save_and_load(graph, tmp_path):
+    path = str(tmp_path / "graph.npz")
+    graph.save(path)
+    loaded = journey_planner.load_journey_graph(path)
+    assert loaded is journey_planner.load_journey_graph(path)
+    assert loaded.plan(1, 4, 8, 0) == graph.plan(1, 4, 8, 0)
+    assert loaded.sources == ['2020_01.csv']
+    assert journey_planner.load_journey_graph(str(tmp_path / "missing.npz")) is None
@@ -0,0 +1,72 @@
+import openai
+import pytest
+
+from benchmarks.mock_openai import REPLY, start_server
+from utils import llm_client, metrics
+from utils.llm_client import StreamStats, stream_chat
+
+MESSAGES = [{"role": "user", "content": "How do I buy a ticket?"}]
+
+
+@pytest.fixture
+def mock_api(monkeypatch, tmp_path):
+    """A fast local stand-in, a fresh shared client and empty metrics."""
+    started = []
+
+    def start(**config):
+        server, base_url = start_server(**{"base_ms": 0, "ms_per_chunk": 0, **config})
+        server.handle_error = lambda request, client_address: None  # clients that hang up early
+        started.append(server)
+        monkeypatch.setenv("OPENAI_BASE_URL", base_url)
+        monkeypatch.setenv("OPENAI_API_KEY", "test")
+        monkeypatch.setattr(llm_client, "_client", None)
+        return server
+
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    monkeypatch.setattr(metrics, "_histograms", {})
+    monkeypatch.setattr(metrics, "LOG_PATH", str(tmp_path / "metrics.jsonl"))
+    monkeypatch.setattr(metrics, "_log", None)
+    yield start
+    for server in started:
+        server.shutdown()
+        server.server_close()
+
+
+def _spans():
+    return {span["span"]: span for span in metrics.snapshot()["spans"]}
+
+
+def test_reply_is_streamed_piece_by_piece(mock_api):
+    server = mock_api()
+    stats = StreamStats()
+    pieces = list(stream_chat(MESSAGES, stats=stats))
+    assert len(pieces) == len(REPLY.split(" ")) and "".join(pieces) == REPLY
+    assert stats.completed and stats.text == REPLY
+    assert 0 <= stats.first_token_seconds <= stats.total_seconds
+    assert server.requests == 1
+    spans = _spans()
+    assert spans["openai_stream"]["count"] == 1 and spans["openai_stream"]["errors"] == 0
+    assert spans["openai_first_token"]["count"] == 1
+
+
+def test_sessions_share_one_client(mock_api):
+    mock_api()
+    assert llm_client.get_client() is llm_client.get_client()
+    assert str(llm_client.get_client().base_url).startswith("http://127.0.0.1:")
+
+
+def test_an_abandoned_stream_is_closed_and_not_completed(mock_api):
+    mock_api()
+    stats = StreamStats()
+    stream = stream_chat(MESSAGES, stats=stats)
+    assert next(stream) == REPLY.split(" ")[0]
+    stream.close()
+    assert not stats.completed and stats.total_seconds is not None
+    assert _spans()["openai_stream"]["errors"] == 1
+
+
+def test_slow_responses_time_out(mock_api, monkeypatch):
+    mock_api(base_ms=2000)
+    monkeypatch.setattr(llm_client, "MAX_RETRIES", 0)
+    with pytest.raises(openai.APITimeoutError):
+        list(stream_chat(MESSAGES, timeout=0.2))
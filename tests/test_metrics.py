@@ -0,0 +1,91 @@
+import os
+import urllib.error
+import urllib.request
+
+import pytest
+
+from utils import metrics
+
+
+@pytest.fixture
+def enabled(monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    monkeypatch.setattr(metrics, "_counters", {})
+    monkeypatch.setattr(metrics, "_histograms", {})
+    monkeypatch.setattr(metrics, "_collectors", {})
+    monkeypatch.setattr(metrics, "LOG_PATH", str(tmp_path / "metrics.jsonl"))
+    monkeypatch.setattr(metrics, "_log", None)
+
+
+def test_disabled_metrics_record_nothing(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    monkeypatch.setattr(metrics, "_counters", {})
+    metrics.count("page_runs")
+    assert metrics.span("anything") is metrics._NULL_SPAN
+    assert metrics.snapshot()["counters"] == []
+
+
+def test_counters_and_spans(enabled):
+    metrics.count("page_runs", page="chat")
+    metrics.count("page_runs", 2, page="chat")
+    with metrics.span("load", dataset="rail"):
+        pass
+    with pytest.raises(RuntimeError):
+        with metrics.span("load", dataset="rail"):
+            raise RuntimeError
+
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"] == [{"name": "page_runs", "page": "chat", "value": 3}]
+    [load] = snapshot["spans"]
+    assert (load["span"], load["count"], load["errors"]) == ("load", 2, 1)
+
+    metrics.reset()
+    assert metrics.snapshot()["counters"] == [] and metrics.snapshot()["spans"] == []
+
+
+def test_timed_generators_are_timed_until_exhausted(enabled):
+    @metrics.timed("rows")
+    def rows():
+        yield from range(3)
+
+    assert list(rows()) == [0, 1, 2]
+    assert metrics.snapshot()["spans"][0]["count"] == 1
+
+
+def test_prometheus_text(enabled):
+    metrics.count("answers", source="faq")
+    metrics.record("predict", 0.003, model="delay")
+    metrics.register_collector("batcher", lambda: {"queue_depth": 4, "running": True})
+    text = metrics.prometheus_text()
+    assert 'njt_answers_total{source="faq"} 1' in text
+    assert 'njt_span_seconds_bucket{span="predict",model="delay",le="0.005"} 1' in text
+    assert 'njt_span_seconds_count{span="predict",model="delay"} 1' in text
+    assert "njt_batcher_queue_depth 4" in text
+    assert "running" not in text  # booleans are not exported
+
+
+def test_percentiles_use_nearest_rank():
+    histogram = metrics.Histogram()
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        histogram.observe(seconds)
+    assert histogram.percentile(50) == 0.2
+    assert histogram.percentile(99) == 0.4
+
+
+def test_exporter_binds_localhost_by_default(enabled, monkeypatch):
+    if "NJT_METRICS_HOST" not in os.environ:
+        assert metrics.HOST == "127.0.0.1"
+    monkeypatch.setattr(metrics, "_server", None)
+    server = metrics.start_exporter(port=0)
+    try:
+        host, port = server.server_address
+        assert host == metrics.HOST
+        assert metrics.start_exporter(port=0) is server  # once per process
+        metrics.count("scrapes")
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert "njt_scrapes_total 1" in response.read().decode()
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/other")
+    finally:
+        server.shutdown()
+        server.server_close()
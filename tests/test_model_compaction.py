@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from utils import forest_engine, model_compaction
+from utils.model_compaction import MAX_ABS_DIFF
+
+
+@pytest.fixture(scope="module")
+def model():
+    X = model_compaction.random_journeys(3000, seed=1)
+    rng = np.random.default_rng(1)
+    y = X['hour_of_day'] * 0.4 + X['from_id'] % 11 + rng.normal(0, 2, len(X))
+    return RandomForestRegressor(n_estimators=8, min_samples_leaf=2, random_state=0).fit(X, y)
+
+
+def test_round_trip_keeps_predictions(model, tmp_path):
+    path = model_compaction.save_compact(model_compaction.compact_model(model), str(tmp_path / "compact.joblib"))
+    loaded = model_compaction.load_compact(path)
+    assert isinstance(loaded, forest_engine.CompiledForest)
+    X = model_compaction.random_journeys(5000, seed=2)
+    assert np.abs(loaded.predict(X) - model.predict(X)).max() <= MAX_ABS_DIFF
+    mean, lower, upper = loaded.predict_interval(X)
+    assert np.all(lower <= upper)
+
+
+def test_compact_arrays_are_narrowed_and_mapped(model, tmp_path):
+    path = model_compaction.save_compact(model_compaction.compact_model(model), str(tmp_path / "compact.joblib"))
+    loaded = model_compaction.load_compact(path)
+    assert loaded.value.dtype == np.float32
+    assert loaded.threshold.dtype == np.float32
+    assert loaded.feature.dtype == np.uint8
+    assert loaded.children.dtype in (np.uint16, np.int32)
+    assert isinstance(loaded.value, np.memmap)
+    assert loaded.nbytes < forest_engine.compile_forest(model).nbytes
+
+
+def test_pruning_shrinks_the_forest(model):
+    full = model_compaction.compact_model(model)
+    pruned = model_compaction.compact_model(model, min_leaf_samples=50)
+    assert pruned.n_nodes < full.n_nodes
@@ -0,0 +1,88 @@
+import os
+import stat
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from utils import model_registry
+
+NAME = "delay_prediction_model"
+
+
+def fitted(slope):
+    X = np.arange(10, dtype=float).reshape(-1, 1)
+    return LinearRegression().fit(X, slope * X.ravel())
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_versions_are_content_hashes(tmp_path):
+    models_dir = str(tmp_path)
+    first = model_registry.register_model(NAME, fitted(1.0), models_dir=models_dir)
+    second = model_registry.register_model(NAME, fitted(2.0), metadata={"rmse": 1.5}, models_dir=models_dir)
+    assert first != second
+    assert model_registry.latest_version(NAME, models_dir) == second
+    versions = model_registry.list_versions(NAME, models_dir)
+    assert set(versions) == {first, second}
+    assert versions[second]["rmse"] == 1.5
+    assert versions[first]["sha256"].startswith(first)
+    assert model_registry.load_model(NAME, models_dir=models_dir).coef_[0] == pytest.approx(2.0)
+    assert model_registry.load_model(NAME, first, models_dir=models_dir).coef_[0] == pytest.approx(1.0)
+
+
+def test_register_from_a_compressed_file(tmp_path):
+    path = str(tmp_path / "model.joblib")
+    joblib.dump(fitted(3.0), path, compress=3)
+    version = model_registry.register_model(NAME, path, models_dir=str(tmp_path / "models"))
+    meta = model_registry.list_versions(NAME, str(tmp_path / "models"))[version]
+    assert meta["source"] == path
+    assert model_registry.load_model(NAME, models_dir=str(tmp_path / "models")).coef_[0] == pytest.approx(3.0)
+
+
+def test_tampered_file_fails_the_sha_check(tmp_path):
+    models_dir = str(tmp_path)
+    version = model_registry.register_model(NAME, fitted(1.0), models_dir=models_dir)
+    with open(tmp_path / NAME / f"{version}.joblib", "ab") as f:
+        f.write(b"\0")
+    with pytest.raises(ValueError, match="Integrity check failed"):
+        model_registry.load_model(NAME, version, models_dir=models_dir)
+
+
+def test_unknown_models_and_versions(tmp_path):
+    models_dir = str(tmp_path)
+    with pytest.raises(LookupError):
+        model_registry.load_model(NAME, models_dir=models_dir)
+    model_registry.register_model(NAME, fitted(1.0), models_dir=models_dir)
+    with pytest.raises(LookupError):
+        model_registry.load_model(NAME, "0" * 12, models_dir=models_dir)
+
+
+def test_written_files_are_readable_by_other_users(tmp_path):
+    models_dir = str(tmp_path)
+    version = model_registry.register_model(NAME, fitted(1.0), models_dir=models_dir)
+    model_registry.load_derived(NAME, version, "coef", lambda model: model.coef_, models_dir=models_dir)
+    paths = [tmp_path / model_registry.REGISTRY_FILE, tmp_path / NAME / f"{version}.joblib",
+             tmp_path / NAME / f"{version}.coef.joblib"]
+    for path in paths:
+        assert mode(path) == model_registry._FILE_MODE
+    assert model_registry._FILE_MODE == 0o644 & ~model_registry._read_umask()
+
+
+def test_derived_artifacts_are_built_once(tmp_path):
+    models_dir = str(tmp_path)
+    version = model_registry.register_model(NAME, fitted(4.0), models_dir=models_dir)
+    calls = []
+
+    def build(model):
+        calls.append(model)
+        return model.coef_ * 10
+
+    first = model_registry.load_derived(NAME, version, "scaled", build, models_dir=models_dir)
+    again = model_registry.load_derived(NAME, version, "scaled", build, models_dir=models_dir)
+    assert len(calls) == 1 and again is first
+    assert first[0] == pytest.approx(40.0)
+    assert isinstance(first, np.memmap)
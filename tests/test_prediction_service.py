@@ -0,0 +1,98 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from utils.prediction_service import PredictionBatcher
+
+
+class Recorder:
+    """Predicts ``hour + 10 * day + offset`` and records every batch size."""
+
+    def __init__(self, offset=0.0):
+        self.offset = offset
+        self.batches = []
+
+    def predict(self, X):
+        self.batches.append(len(X))
+        return (X['hour_of_day'] + 10 * X['day_of_week'] + self.offset).to_numpy(np.float64)
+
+
+class IntervalRecorder(Recorder):
+    def predict_interval(self, X):
+        mean = self.predict(X)
+        return mean, mean - 1, mean + 1
+
+
+@pytest.fixture
+def batcher():
+    batchers = []
+
+    def make(predictor, **kwargs):
+        batchers.append(PredictionBatcher(predictor, **kwargs))
+        return batchers[-1]
+    yield make
+    for made in batchers:
+        made.close()
+
+
+def test_each_caller_gets_its_own_row(batcher):
+    service = batcher(Recorder())
+    with ThreadPoolExecutor(16) as pool:
+        results = list(pool.map(lambda i: service.predict(i % 24, i % 7, 105, 107), range(200)))
+    assert results == [i % 24 + 10 * (i % 7) for i in range(200)]
+    assert service.metrics()['requests'] == 200
+
+
+def test_concurrent_requests_share_batches(batcher):
+    predictor = Recorder()
+    service = batcher(predictor, max_wait_ms=50, max_batch=8)
+    futures = [service.submit(8, 1, 105, 107) for _ in range(20)]
+    assert [f.result(5)[0] for f in futures] == [18.0] * 20
+    assert max(predictor.batches) == 8 and len(predictor.batches) < 20
+    metrics = service.metrics()
+    assert metrics['batches'] == len(predictor.batches) and metrics['batch_max'] == 8
+    assert 'latency_p99_ms' in metrics
+
+
+def test_intervals_come_from_predict_interval(batcher):
+    service = batcher(IntervalRecorder())
+    assert service.predict_interval(8, 1, 105, 107) == (18.0, 17.0, 19.0)
+    plain = batcher(Recorder())
+    assert plain.predict_interval(8, 1, 105, 107) == (18.0, None, None)
+
+
+def test_a_failing_batch_does_not_stop_the_worker(batcher):
+    service = batcher(Recorder())
+    with pytest.raises(TypeError):
+        service.predict("eight", 1, 105, 107)
+    assert service.predict(8, 1, 105, 107) == 18.0
+    assert service.metrics()['errors'] == 1
+
+
+def test_set_predictor_swaps_the_model_for_later_batches(batcher):
+    service = batcher(Recorder())
+    assert service.predict(8, 1, 105, 107) == 18.0
+    service.set_predictor(IntervalRecorder(offset=100))
+    assert service.predict_interval(8, 1, 105, 107) == (118.0, 117.0, 119.0)
+    names = [thread.name for thread in threading.enumerate()]
+    assert names.count("prediction-batcher") == 1
+
+
+def test_close_answers_what_is_queued():
+    gate = threading.Event()
+
+    class Slow(Recorder):
+        def predict(self, X):
+            gate.wait(5)
+            return super().predict(X)
+
+    service = PredictionBatcher(Slow(), max_wait_ms=0)
+    futures = [service.submit(8, 1, 105, 107) for _ in range(5)]
+    closer = threading.Thread(target=service.close)
+    closer.start()
+    gate.set()
+    closer.join(5)
+    assert not closer.is_alive()
+    assert [f.result(0)[0] for f in futures] == [18.0] * 5
@@ -0,0 +1,88 @@
+import logging
+import multiprocessing
+import pickle
+import time
+
+from utils import cache as cache_module, shared_cache
+from utils.shared_cache import DiskCache, SharedCache
+
+
+def test_entries_are_shared_between_instances(tmp_path):
+    path = str(tmp_path / "shared.sqlite")
+    DiskCache("figures", path).put("k", {"rows": [1, 2, 3]})
+    other = DiskCache("figures", path)  # e.g. another app process
+    assert other.get("k") == {"rows": [1, 2, 3]}
+    assert "k" in other and len(other) == 1
+    assert DiskCache("models", path).get("k") is None  # caches are namespaced
+
+
+def test_least_recently_read_entries_are_evicted(tmp_path):
+    blob = b"x" * 1000
+    size = len(pickle.dumps(blob, protocol=pickle.HIGHEST_PROTOCOL))
+    cache = DiskCache("c", str(tmp_path / "shared.sqlite"), max_bytes=3 * size)
+    for key in "abc":
+        cache.put(key, blob)
+        time.sleep(0.01)
+    cache.put("d", blob)
+    assert "a" not in cache and all(key in cache for key in "bcd")
+    assert cache.size_bytes() <= 3 * size
+
+
+def test_oversized_values_are_logged_and_not_stored(tmp_path, caplog):
+    cache = DiskCache("c", str(tmp_path / "shared.sqlite"), max_bytes=100)
+    with caplog.at_level(logging.WARNING, logger="utils.shared_cache"):
+        size = cache.put("big", b"x" * 1000)
+    assert size > 100 and "big" not in cache
+    assert "Not sharing c[big]" in caplog.text
+
+
+def _compute_once(path, log_path):
+    def compute():
+        with open(log_path, "a") as f:
+            f.write("computed\n")
+        time.sleep(0.2)
+        return 42
+    assert DiskCache("c", path).get_or_compute_entry("answer", compute)[0] == 42
+
+
+def test_concurrent_misses_compute_once(tmp_path):
+    path, log_path = str(tmp_path / "shared.sqlite"), str(tmp_path / "computed.log")
+    DiskCache("c", path)  # create the schema before the workers race
+    workers = [multiprocessing.Process(target=_compute_once, args=(path, log_path)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert all(worker.exitcode == 0 for worker in workers)
+    with open(log_path) as f:
+        assert f.read() == "computed\n"
+
+
+def test_shared_cache_fills_its_lru_from_disk(tmp_path):
+    path = str(tmp_path / "shared.sqlite")
+    first = SharedCache("c", disk=DiskCache("c", path))
+    assert first.get_or_compute("k", lambda: [1, 2]) == [1, 2]
+    second = SharedCache("c", max_bytes=10_000, disk=DiskCache("c", path))
+    assert second.get_or_compute("k", lambda: 1 / 0) == [1, 2]
+    assert second.disk_hits == 1
+    assert second.get("k") == [1, 2] and second.disk_hits == 1  # now served from memory
+    assert second.max_bytes == 10_000
+
+
+def test_in_process_entries_respect_max_bytes(tmp_path):
+    cache = SharedCache("c", max_entries=10, max_bytes=3000, disk=DiskCache("c", str(tmp_path / "s.sqlite")))
+    for key in "abcd":
+        cache.put(key, b"x" * 1000)
+    assert cache.get("a") == b"x" * 1000  # evicted from memory, back from disk
+    assert cache.disk_hits == 1
+
+
+def test_get_cache_keeps_max_bytes_on_shared_caches(tmp_path, monkeypatch):
+    path = str(tmp_path / "shared.sqlite")
+    monkeypatch.setattr(cache_module, "CACHE_BACKEND", "shared")
+    monkeypatch.setattr(cache_module, "_caches", {})
+    monkeypatch.setattr(shared_cache, "DiskCache", lambda name: DiskCache(name, path))
+    shared = cache_module.get_cache("figures", shared=True, max_bytes=5000)
+    assert isinstance(shared, SharedCache) and shared.max_bytes == 5000
+    shared.put("k", b"x" * 100)
+    assert cache_module.cache_stats()["figures"]["bytes"] > 100
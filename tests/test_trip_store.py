@@ -0,0 +1,82 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import write_trips
+from utils.trip_store import TripStore
+
+
+@pytest.fixture(scope="module")
+def trips(tmp_path_factory):
+    return write_trips(str(tmp_path_factory.mktemp("data")), 3000)
+
+
+@pytest.fixture(scope="module")
+def csv_rows(trips):
+    df = pd.concat([pd.read_csv(path, dtype={'train_id': str}) for path in trips], ignore_index=True)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+@pytest.fixture(scope="module")
+def store(trips, tmp_path_factory):
+    store = TripStore(str(tmp_path_factory.mktemp("store")))
+    for path in trips:
+        store.convert(path, chunk_rows=700)
+    return store
+
+
+def test_one_partition_per_month(store, csv_rows):
+    assert store.partitions() == [(2020, 1), (2020, 2), (2020, 3)]
+    assert sum(store.partition_meta(y, m)["rows"] for y, m in store.partitions()) == len(csv_rows)
+
+
+def test_round_trip_of_every_column(store, csv_rows):
+    df = store.read()
+    assert len(df) == len(csv_rows)
+    expected = csv_rows.sort_values(['date', 'scheduled_time', 'train_id', 'stop_sequence'], ignore_index=True)
+    actual = df.sort_values(['date', 'scheduled_time', 'train_id', 'stop_sequence'], ignore_index=True)
+    assert actual['train_id'].astype(str).tolist() == expected['train_id'].tolist()
+    assert actual['to'].astype(str).tolist() == expected['to'].str.strip().tolist()
+    np.testing.assert_allclose(actual['delay_minutes'], expected['delay_minutes'], equal_nan=True)
+
+
+def test_date_range_reads_only_overlapping_partitions(store, csv_rows):
+    df = store.read(['date', 'delay_minutes'], start='2020-02-01', end='2020-03-01')
+    assert store.last_scan["partitions_read"] == 1
+    assert store.last_scan["columns_read"] == ['date', 'delay_minutes']
+    expected = csv_rows[(csv_rows['date'] >= '2020-02-01') & (csv_rows['date'] < '2020-03-01')]
+    assert len(df) == len(expected)
+
+
+def test_predicates_match_pandas(store, csv_rows):
+    line = csv_rows['line'].iloc[0]
+    station = csv_rows['from'].iloc[0]
+    df = store.read(['train_id', 'from', 'to', 'line'], line=line, station=station)
+    expected = csv_rows[(csv_rows['line'] == line) & ((csv_rows['from'] == station) | (csv_rows['to'] == station))]
+    assert len(df) == len(expected) > 0
+    assert set(df['line'].astype(str)) == {line}
+
+    df = store.read(['from'], from_station=station, start='2020-03-01')
+    assert len(df) == ((csv_rows['from'] == station) & (csv_rows['date'] >= '2020-03-01')).sum()
+
+
+def test_unknown_values_prune_every_partition(store):
+    df = store.read(['train_id'], line='No Such Line')
+    assert df.empty and store.last_scan["partitions_read"] == 0
+
+
+def test_converting_again_is_skipped_unless_forced(store, trips):
+    before = store.read(['train_id'])
+    assert store.convert(trips[0]) == {}
+    assert store.convert(trips[0], force=True) == {(2020, 1): store.partition_meta(2020, 1)["rows"]}
+    assert len(store.read(['train_id'])) == len(before)  # replaced, not appended
+    assert store.sources() == {os.path.basename(path) for path in trips}
+
+
+def test_dictionaries_survive_a_reopen(store):
+    reopened = TripStore(store.root)
+    assert reopened.dictionaries == store.dictionaries
+    assert len(reopened.read(['line'])) == len(store.read(['line']))
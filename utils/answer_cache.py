@@ -0,0 +1,133 @@
+"""Persistent LRU + TTL cache of chatbot answers.
+
+Keys are the normalized question plus a hash of the FAQ file, so editing the
+FAQs retires every answer that was generated from the old version. Only answers
+to the first question of a conversation belong here: later answers depend on
+that session's history, which the key does not cover. The cache is
+saved to a JSON file after each insert and reloaded on start, so it survives
+restarts. Several app processes can share the file: each save merges with what
+is on disk under a file lock, so no process drops another's answers.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from utils.cache import CACHE_DIR
+from utils.faq_index import FAQ_PATH, normalize_question
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are not serialized across processes
+    fcntl = None
+
+ANSWER_CACHE_PATH = os.path.join(CACHE_DIR, "answers.json")
+
+
+def faq_version(file_path=FAQ_PATH):
+    """Short content hash of the FAQ file."""
+    with open(file_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+class AnswerCache:
+    """Answers keyed by ``<faq version>:<normalized question>``."""
+
+    def __init__(self, version, path=ANSWER_CACHE_PATH, max_entries=1000, ttl_seconds=7 * 24 * 3600):
+        self.version = version
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (answer, created_at)
+        self._lock = threading.Lock()
+        self._load()
+
+    def key(self, question):
+        return f"{self.version}:{normalize_question(question)}"
+
+    def _expired(self, created_at, now):
+        return now - created_at > self.ttl_seconds
+
+    def _read_file(self):
+        """Unexpired entries of this FAQ version stored on disk, oldest use first."""
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return OrderedDict()
+        now = time.time()
+        prefix = f"{self.version}:"
+        return OrderedDict((key, (answer, created_at)) for key, answer, created_at in stored
+                           if key.startswith(prefix) and not self._expired(created_at, now))
+
+    def _trim(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self):
+        self._entries = self._read_file()
+        self._trim()
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Exclusive lock on ``<path>.lock`` across processes (no-op where ``fcntl`` is missing)."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + ".lock", "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _save(self):
+        """Merge with the file (the newer answer wins a key) and write it back under the lock."""
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with self._file_lock():
+            now = time.time()
+            on_disk = self._read_file()
+            # Answers only other processes have go first, i.e. are evicted first
+            merged = OrderedDict((key, entry) for key, entry in on_disk.items() if key not in self._entries)
+            for key, entry in self._entries.items():
+                stored = on_disk.get(key)
+                if stored is not None and stored[1] > entry[1]:
+                    entry = stored
+                if not self._expired(entry[1], now):
+                    merged[key] = entry
+            self._entries = merged
+            self._trim()
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump([[key, answer, created_at] for key, (answer, created_at) in self._entries.items()], f)
+            os.replace(tmp_path, self.path)
+
+    def get(self, question):
+        """Return the cached answer for ``question`` or None."""
+        key = self.key(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[1], time.time()):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, question, answer):
+        with self._lock:
+            key = self.key(question)
+            self._entries[key] = (answer, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def __len__(self):
+        return len(self._entries)
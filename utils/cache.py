@@ -0,0 +1,132 @@
+"""Process-wide caches shared by every Streamlit session.
+
+Streamlit re-executes page scripts on each rerun, so anything a page keeps in a
+module-level variable is rebuilt every time. Caches obtained through
+``get_cache`` live in this module instead and survive reruns and sessions.
+``get_cache(name, shared=True)`` also backs the cache with a file every app
+process on the host reads (see ``utils.shared_cache``).
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Root for on-disk caches (ingested columns, precomputed tables, ...)
+CACHE_DIR = os.getenv("NJT_CACHE_DIR", ".cache")
+# "shared": caches requested with shared=True are backed by utils.shared_cache;
+# "memory": every cache stays per process
+CACHE_BACKEND = os.getenv("NJT_CACHE_BACKEND", "shared")
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+class LRUCache:
+    """Thread-safe mapping that evicts the least recently used entry past ``max_entries``.
+
+    With ``max_bytes`` it also evicts until the sizes given to ``put`` fit.
+    """
+
+    def __init__(self, max_entries=8, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, nbytes=0):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self.nbytes += nbytes - self._sizes.get(key, 0)
+            self._sizes[key] = nbytes
+            # The newest entry is kept even when it alone is over max_bytes
+            while len(self._data) > self.max_entries or (
+                    self.max_bytes is not None and self.nbytes > self.max_bytes and len(self._data) > 1):
+                old, _ = self._data.popitem(last=False)
+                self.nbytes -= self._sizes.pop(old)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for ``key``, computing and storing it on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+def get_cache(name, max_entries=8, shared=False, max_bytes=None):
+    """Return the process-wide cache called ``name``, creating it on first use.
+
+    With ``shared=True`` (and the shared backend enabled) values must be
+    picklable; misses fall through to the cache shared by every process.
+    ``max_bytes`` bounds the entries this process keeps by the sizes passed to
+    ``put`` (a shared cache counts pickled sizes where none is given).
+    """
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            if shared and CACHE_BACKEND == "shared":
+                from utils.shared_cache import SharedCache
+                cache = SharedCache(name, max_entries, max_bytes)
+            else:
+                cache = LRUCache(max_entries, max_bytes)
+            _caches[name] = cache
+        return cache
+
+
+def fingerprint(*parts):
+    """Stable content hash of DataFrames, Series and JSON-serialisable values."""
+    import pandas as pd  # not at module level: the support page never needs it
+
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, (pd.DataFrame, pd.Series)):
+            digest.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+            if isinstance(part, pd.DataFrame):
+                digest.update(json.dumps(list(map(str, part.columns))).encode())
+        else:
+            digest.update(json.dumps(part, sort_keys=True, default=str).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def cache_stats():
+    """Entries, hits and misses (plus bytes and shared-file hits where kept) of every cache."""
+    with _caches_lock:
+        caches = dict(_caches)
+    stats = {}
+    for name, cache in caches.items():
+        stats[name] = {"entries": len(cache), "hits": cache.hits, "misses": cache.misses}
+        if cache.max_bytes is not None:
+            stats[name]["bytes"] = cache.nbytes
+        if hasattr(cache, "disk_hits"):
+            stats[name]["disk_hits"] = cache.disk_hits
+    return stats
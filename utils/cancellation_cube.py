@@ -0,0 +1,142 @@
+"""Year x month x category cube of rail cancellations.
+
+``RAIL_CANCELLATIONS_DATA.csv`` has one row per (year, month, cause category)
+with that category's cancellations and the month's total. The cube keeps every
+category as dense arrays::
+
+    counts[year, month, category]        cancellations (0 when a reported month has no row)
+    totals[year, month]                  all cancellations that month (0 = month not reported)
+    percentages[year, month, category]   counts / totals, NaN for months not reported
+
+plus the sums over each axis (``by_year``, ``by_month``, ``by_category`` and the
+matching totals), so a slice, roll-up or heatmap is array indexing rather than a
+groupby or pivot on every render. ``append`` folds in new months in place::
+
+    from utils import cancellation_cube
+    cube = cancellation_cube.get_cube()
+    cube.heatmap('AMTRAK')          # (n_years, 12) percentages
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils import catalog
+
+MONTHS = 12
+
+_cube = None
+_lock = threading.Lock()
+
+
+class CancellationCube:
+    """Dense cancellation counts indexed by (year, month, category)."""
+
+    def __init__(self, years=(), categories=(), counts=None, totals=None):
+        self.years = np.asarray(years, dtype=np.int32)
+        self.categories = list(categories)
+        self.counts = np.zeros((len(self.years), MONTHS, len(self.categories)), np.int64) if counts is None else counts
+        self.totals = np.zeros((len(self.years), MONTHS), np.int64) if totals is None else totals
+        self._summarize()
+
+    @classmethod
+    def from_frame(cls, df):
+        cube = cls()
+        cube.append(df)
+        return cube
+
+    def _summarize(self):
+        self.category_index = {category: i for i, category in enumerate(self.categories)}
+        self.reported = self.totals > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.percentages = np.where(self.reported[:, :, None],
+                                        self.counts * 100.0 / self.totals[:, :, None], np.nan)
+        self.by_year = self.counts.sum(axis=1)  # (year, category)
+        self.by_month = self.counts.sum(axis=0)  # (month, category)
+        self.by_category = self.counts.sum(axis=(0, 1))
+        self.year_totals = self.totals.sum(axis=1)
+        self.month_totals = self.totals.sum(axis=0)
+        self.total = int(self.totals.sum())
+
+    def append(self, df, replace=False):
+        """Add the months in ``df`` (``YEAR``, ``MONTH_NUM``, ``CATEGORY``, ``CANCEL_COUNT``,
+        ``CANCEL_TOTAL``) that the cube does not have yet; returns how many were added.
+
+        With ``replace=True`` months already in the cube are overwritten instead.
+        A (year, month, category) that occurs more than once in ``df`` is another
+        observation of that month (as in ``benchmarks.synthetic``): its counts and
+        its month total are both summed, so percentages stay shares of the total.
+        """
+        names = df['CATEGORY'].astype(str).to_numpy()
+        new_categories = sorted(set(names) - set(self.categories))
+        years = np.union1d(self.years, df['YEAR'].to_numpy(np.int32))
+        if len(years) > len(self.years) or new_categories:
+            counts = np.zeros((len(years), MONTHS, len(self.categories) + len(new_categories)), np.int64)
+            totals = np.zeros((len(years), MONTHS), np.int64)
+            rows = np.searchsorted(years, self.years)
+            counts[rows, :, :len(self.categories)] = self.counts
+            totals[rows] = self.totals
+            self.years, self.counts, self.totals = years, counts, totals
+            self.categories = self.categories + new_categories
+            self.category_index = {category: i for i, category in enumerate(self.categories)}
+
+        y = np.searchsorted(self.years, df['YEAR'].to_numpy(np.int32))
+        m = df['MONTH_NUM'].to_numpy(np.int64) - 1
+        c = np.array([self.category_index[name] for name in names], dtype=np.int64)
+        take = np.ones(len(df), bool) if replace else self.totals[y, m] == 0
+        y, m, c = y[take], m[take], c[take]
+        self.counts[y, m] = 0
+        np.add.at(self.counts, (y, m, c), df['CANCEL_COUNT'].to_numpy(np.int64)[take])
+        # Every row repeats its month's total, so the month total is the sum over
+        # one category's rows (the category observed most often that month)
+        totals = np.zeros_like(self.counts)
+        np.add.at(totals, (y, m, c), df['CANCEL_TOTAL'].to_numpy(np.int64)[take])
+        self.totals[y, m] = totals.max(axis=2)[y, m]
+        self._summarize()
+        return len(set(zip(y.tolist(), m.tolist())))
+
+    def _category(self, category):
+        try:
+            return self.category_index[category]
+        except KeyError:
+            raise KeyError(f"Unknown cancellation category {category!r}; known: {self.categories}") from None
+
+    def heatmap(self, category, values='percentages'):
+        """``(n_years, 12)`` percentages (or ``values='counts'``) of one category."""
+        return getattr(self, values)[:, :, self._category(category)]
+
+    def series(self, category):
+        """Reported months in date order as ``(DATE, CANCEL_COUNT, CANCEL_PERCENTAGE)`` columns."""
+        c = self._category(category)
+        y, m = np.nonzero(self.reported)
+        return pd.DataFrame({
+            'DATE': pd.to_datetime(dict(year=self.years[y], month=m + 1, day=1)),
+            'CANCEL_COUNT': self.counts[y, m, c],
+            'CANCEL_PERCENTAGE': self.percentages[y, m, c],
+        })
+
+    def rollup(self, category, by='year'):
+        """Share (%) of all cancellations caused by ``category`` per year or per calendar month."""
+        c = self._category(category)
+        counts, totals = (self.by_year, self.year_totals) if by == 'year' else (self.by_month, self.month_totals)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(totals > 0, counts[:, c] * 100.0 / totals, np.nan)
+
+    def shares(self, years=None):
+        """Share (%) of every category over all months, or over the ``years`` given."""
+        if years is None:
+            counts, total = self.by_category, self.total
+        else:
+            rows = np.isin(self.years, years)
+            counts, total = self.by_year[rows].sum(axis=0), self.year_totals[rows].sum()
+        return counts * 100.0 / max(total, 1)
+
+
+def get_cube():
+    """The cube over ``rail_cancellations``, built once per process."""
+    global _cube
+    if _cube is None:
+        with _lock:
+            if _cube is None:
+                _cube = CancellationCube.from_frame(catalog.get('rail_cancellations'))
+    return _cube
@@ -0,0 +1,144 @@
+"""Catalog of every dataset under ``data/``, loaded lazily once per process.
+
+Each entry declares where a CSV lives, how to normalize it and the compact
+dtypes it should end up with. Normalization is shared by every dataset:
+
+* header and string cells are stripped (``APRIL          `` -> ``APRIL``),
+* ``OTP_YEAR``/``OTP_MONTH`` style columns are renamed to ``YEAR``/``MONTH``,
+* mixed-case month names become an ordered ``MONTH`` categorical (``JULY``)
+  plus ``MONTH_NUM`` and a first-of-month ``DATE``.
+
+The first ``get(name)`` in a process builds the frame through the ingest column
+cache (so later processes memory-map it instead of parsing the CSV). Every caller
+gets a shallow copy of the same frame whose arrays are read-only: one copy of
+each dataset per process, and no page can mutate another page's data::
+
+    from utils import catalog
+    df = catalog.get('rail_cancellations')
+"""
+import os
+import threading
+
+import pandas as pd
+
+from utils import ingest, metrics
+
+DATA_DIR = os.getenv("NJT_DATA_DIR", "data")
+
+_frames = {}
+_lock = threading.RLock()
+
+
+class Dataset:
+    """A CSV under ``DATA_DIR`` plus the dtypes its columns are stored with."""
+
+    def __init__(self, name, path, dtypes, rename=None, description=""):
+        self.name = name
+        self.path = path
+        self.dtypes = dtypes
+        self.rename = rename or {}
+        self.description = description
+
+    @property
+    def sources(self):
+        return [os.path.join(DATA_DIR, self.path)]
+
+    def build(self):
+        df = pd.read_csv(self.sources[0], skipinitialspace=True)
+        df.columns = df.columns.str.strip()
+        df = df.rename(columns=self.rename)
+        for column in df.columns:
+            if df[column].dtype == object or pd.api.types.is_string_dtype(df[column].dtype):
+                df[column] = df[column].str.strip()
+        if 'MONTH' in df.columns:
+            df = ingest.normalize_months(df)
+            df['DATE'] = ingest.month_start(df['YEAR'], df['MONTH_NUM'])
+        return df.astype(self.dtypes)
+
+
+class DerivedDataset:
+    """A frame computed from other catalog entries by ``build(*frames)``."""
+
+    def __init__(self, name, inputs, build, description=""):
+        self.name = name
+        self.inputs = inputs
+        self._build = build
+        self.description = description
+
+    @property
+    def sources(self):
+        return [path for name in self.inputs for path in DATASETS[name].sources]
+
+    def build(self):
+        return self._build(*(get(name) for name in self.inputs))
+
+
+def _mechanical(cancellations, rail_monthly):
+    """Mechanical cancellations joined with the monthly train performance data."""
+    mechanical_df = cancellations[cancellations['CATEGORY'] == 'Mechanical']
+    merged_df = pd.merge(
+        mechanical_df.drop(columns='DATE'),
+        rail_monthly[['YEAR', 'MONTH_NUM', 'MEAN_DISTANCE_BEFORE_FAILURE', 'ON_TIME_PERCENTAGE']],
+        on=['YEAR', 'MONTH_NUM'],
+        how='left'
+    )
+    merged_df['DATE'] = ingest.month_start(merged_df['YEAR'], merged_df['MONTH_NUM'])
+    return merged_df
+
+
+DATASETS = {dataset.name: dataset for dataset in [
+    Dataset('rail_cancellations', 'RAIL_CANCELLATIONS_DATA.csv',
+            {'CATEGORY': 'category', 'CANCEL_COUNT': 'int32', 'CANCEL_TOTAL': 'int32'},
+            description="Rail cancellations by year, month and cause category"),
+    Dataset('rail_monthly', 'Combined/cleaned_train_data.csv',
+            {'CANCEL_COUNT': 'int32', 'TRIPS': 'int32', 'LATES': 'int32',
+             'MEAN_DISTANCE_BEFORE_FAILURE': 'int32'},
+            description="Monthly rail trips, lates, on-time % and mean distance before failure"),
+    Dataset('rail_mechanical_counts', 'Combined/mechanical_cancellations.csv',
+            {'CANCEL_COUNT': 'int32'},
+            description="Monthly rail mechanical cancellation counts"),
+    Dataset('rail_mdbf', 'MDBF/RAIL_MDBF_DATA.csv', {'MDBF': 'int32'},
+            description="Rail mean distance between failures"),
+    Dataset('rail_otp', 'OPT/RAIL_OTP_DATA.csv',
+            {'STATUS': 'category', 'COUNT': 'int32', 'TOTAL': 'int32'},
+            description="Rail on-time performance"),
+    Dataset('bus_monthly', 'Combined/bus_combined.csv',
+            {'MDBF': 'int32', 'TOTAL_TRIPS': 'int32'},
+            description="Monthly bus MDBF, on-time %, trips and lates"),
+    Dataset('bus_mdbf', 'MDBF/BUS_MDBF_DATA.csv', {'MDBF': 'int32'},
+            description="Bus mean distance between failures"),
+    Dataset('bus_otp', 'OPT/BUS_OTP_DATA.csv', {'TOTAL_TRIPS': 'int32'},
+            rename={'OTP_YEAR': 'YEAR', 'OTP_MONTH': 'MONTH'},
+            description="Bus on-time performance"),
+    DerivedDataset('mechanical', ['rail_cancellations', 'rail_monthly'], _mechanical,
+                   description="Mechanical cancellations joined with monthly rail performance"),
+]}
+
+
+def get(name):
+    """Return a read-only view of dataset ``name``, loading it on first use."""
+    df = _frames.get(name)
+    if df is None:
+        # Re-entrant: derived datasets load their inputs while holding the lock
+        with _lock:
+            df = _frames.get(name)
+            if df is None:
+                dataset = DATASETS[name]
+                # First load in the process: parses the CSV or maps the ingest cache
+                with metrics.span('dataset_load', dataset=name):
+                    df = _frames[name] = ingest.cached_frame(name, dataset.sources, dataset.build)
+    return df.copy(deep=False)
+
+
+def describe():
+    """Name, description, rows and in-memory size of every dataset."""
+    rows = []
+    for name, dataset in DATASETS.items():
+        df = get(name)
+        rows.append({
+            'name': name,
+            'description': dataset.description,
+            'rows': len(df),
+            'bytes': int(df.memory_usage(deep=True).sum()),
+        })
+    return pd.DataFrame(rows)
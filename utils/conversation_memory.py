@@ -0,0 +1,107 @@
+"""Token-budgeted conversation memory for the support chat.
+
+Each message records an approximate token count when it is added. Prompts are
+built from the newest messages that fit ``history_budget``; messages that fall
+out of that window are folded once, in order, into a short rolling summary that
+rides along in the system prompt. Folding is incremental: a message is
+summarized the first time it leaves the window and never again.
+
+At most ``max_messages`` are kept for display, so a long session cannot grow
+its ``st.session_state`` without bound.
+"""
+import re
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def count_tokens(text):
+    """Approximate token count (~4 characters per token for English text)."""
+    return max(1, (len(text) + 3) // 4)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut ``text`` to roughly ``max_tokens``, keeping its start and end."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    keep = max_tokens * 4
+    head, tail = text[:keep * 3 // 4], text[-(keep // 4):]
+    return f"{head}\n[...]\n{tail}"
+
+
+def _gist(text, max_words=20):
+    first = _SENTENCE_END.split(text.strip(), maxsplit=1)[0]
+    words = first.split()
+    return " ".join(words[:max_words]) + (" ..." if len(words) > max_words else "")
+
+
+class ConversationMemory:
+    """Chat history packed into a fixed token budget with a rolling summary."""
+
+    def __init__(self, history_budget=1000, summary_budget=250, prompt_budget=1000, max_messages=60):
+        self.history_budget = history_budget
+        self.summary_budget = summary_budget
+        self.prompt_budget = prompt_budget
+        self.max_messages = max_messages
+        self.messages = []
+        self.summary_lines = []
+        self._folded = 0  # messages[:_folded] are already in the summary
+
+    def add(self, role, content, **extra):
+        """Append a message; extra keys (timestamp, timings) are kept for display."""
+        self.messages.append({"role": role, "content": content, "tokens": count_tokens(content), **extra})
+        overflow = len(self.messages) - self.max_messages
+        if overflow > 0:
+            self._fold_until(overflow)
+            del self.messages[:overflow]
+            self._folded -= overflow
+
+    def clear(self):
+        self.messages = []
+        self.summary_lines = []
+        self._folded = 0
+
+    @property
+    def has_history(self):
+        """True once any turn was added (answers then depend on the conversation)."""
+        return bool(self.messages or self.summary_lines)
+
+    @property
+    def summary(self):
+        return "\n".join(self.summary_lines)
+
+    def _fold_until(self, end):
+        for message in self.messages[self._folded:end]:
+            speaker = "User" if message["role"] == "user" else "Assistant"
+            self.summary_lines.append(f"{speaker}: {_gist(message['content'])}")
+        self._folded = max(self._folded, end)
+
+        # Oldest summary lines go first once the summary is over budget
+        tokens = sum(count_tokens(line) for line in self.summary_lines)
+        while self.summary_lines and tokens > self.summary_budget:
+            tokens -= count_tokens(self.summary_lines.pop(0))
+
+    def window(self):
+        """Index of the oldest message that still fits the history budget."""
+        used = 0
+        start = len(self.messages)
+        while start > self._folded:
+            tokens = self.messages[start - 1]["tokens"]
+            if used + tokens > self.history_budget:
+                break
+            used += tokens
+            start -= 1
+        return start
+
+    def build_messages(self, system_prompt, prompt):
+        """Chat API messages: system (+ summary), packed history, then ``prompt``."""
+        start = self.window()
+        if start > self._folded:
+            self._fold_until(start)
+
+        system = system_prompt
+        if self.summary_lines:
+            system += "\n\nSummary of the earlier conversation:\n" + self.summary
+        messages = [{"role": "system", "content": system}]
+        messages.extend({"role": m["role"], "content": m["content"]} for m in self.messages[start:])
+        messages.append({"role": "user", "content": truncate_to_tokens(prompt, self.prompt_budget)})
+        return messages
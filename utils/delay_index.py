@@ -0,0 +1,215 @@
+"""Observed delay distributions per (from, to, hour, weekday), for the Train Delay page.
+
+Each cell keeps a count, a sum and a fixed-bin histogram of ``delay_minutes``.
+Histograms with shared bin edges merge by addition, so the index is built in
+one streaming pass over the monthly trip files and new months can be added
+later without re-reading old ones. Quantiles are read off the cumulative
+histogram with linear interpolation inside a bin. Bins are half a minute wide
+below 10 minutes and widen further out, which bounds the quantile error by the
+bin width. p50/p90/p99 are precomputed per cell (once, after the last chunk of
+a build rather than per chunk), so a lookup is a single binary search over the
+sorted keys::
+
+    python -m utils.delay_index data/rail_data/*.csv     # build, or add new months
+"""
+import argparse
+import glob
+import os
+import threading
+
+import numpy as np
+
+from utils import model_registry
+from utils.delay_training import CHUNK_ROWS, pack_cells, read_trip_chunks, unpack_cells
+from utils.stations import DELAY_FEATURES
+
+INDEX_DIR = os.path.join(model_registry.MODELS_DIR, "delay_index")
+BIN_EDGES = np.concatenate([
+    np.arange(0, 10, 0.5),
+    np.arange(10, 30, 1.0),
+    np.arange(30, 60, 2.5),
+    np.arange(60, 180, 10.0),
+    [180.0, 1440.0],
+])
+N_BINS = len(BIN_EDGES) - 1
+QUANTILES = (0.5, 0.9, 0.99)
+MIN_SAMPLES = 30  # fewer observations than this and predict_delay falls back to the model
+
+_indexes = {}  # path -> (mtime, DelayIndex)
+_lock = threading.Lock()
+
+
+def quantiles(histograms, qs=QUANTILES):
+    """Interpolated quantiles ``qs`` of each row of ``histograms`` -> ``(n, len(qs))``."""
+    histograms = np.atleast_2d(histograms)
+    cumulative = np.cumsum(histograms, axis=1)
+    total = cumulative[:, -1:]
+    out = np.empty((len(histograms), len(qs)), dtype=np.float32)
+    for j, q in enumerate(qs):
+        target = q * total
+        b = np.minimum((cumulative < target).sum(axis=1), N_BINS - 1)
+        rows = np.arange(len(histograms))
+        below = np.where(b > 0, cumulative[rows, b - 1], 0)
+        in_bin = np.maximum(histograms[rows, b], 1)
+        fraction = np.clip((target[:, 0] - below) / in_bin, 0, 1)
+        out[:, j] = BIN_EDGES[b] + fraction * (BIN_EDGES[b + 1] - BIN_EDGES[b])
+    return out
+
+
+class DelayIndex:
+    """Per-cell delay histograms over sorted packed keys (see ``pack_cells``)."""
+
+    def __init__(self, keys=None, histograms=None, totals=None, sources=None):
+        self.keys = np.empty(0, np.int64) if keys is None else keys
+        self.histograms = np.empty((0, N_BINS), np.uint32) if histograms is None else histograms
+        self.totals = np.empty(0, np.float64) if totals is None else totals
+        self.sources = dict(sources or {})  # file name -> rows indexed
+        self._summarize()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _summarize(self):
+        self._counts = self.histograms.sum(axis=1, dtype=np.int64)
+        self._percentiles = quantiles(self.histograms) if len(self.keys) else np.empty((0, len(QUANTILES)), np.float32)
+
+    @property
+    def counts(self):
+        if self._counts is None:
+            self._summarize()
+        return self._counts
+
+    @property
+    def percentiles(self):
+        if self._percentiles is None:
+            self._summarize()
+        return self._percentiles
+
+    def add(self, features, delay):
+        """Fold one chunk of rows (``DELAY_FEATURES`` frame + delays) into the index."""
+        keys = pack_cells(*(features[name].to_numpy(np.int64) for name in DELAY_FEATURES))
+        bins = np.clip(np.searchsorted(BIN_EDGES, delay, side='right') - 1, 0, N_BINS - 1)
+        chunk_keys, inverse = np.unique(keys, return_inverse=True)
+        histograms = np.bincount(inverse * N_BINS + bins, minlength=len(chunk_keys) * N_BINS)
+        totals = np.bincount(inverse, delay, len(chunk_keys))
+        self._merge(chunk_keys, histograms.reshape(-1, N_BINS).astype(np.uint32), totals)
+
+    def merge(self, other):
+        self._merge(other.keys, other.histograms, other.totals)
+        self.sources.update(other.sources)
+
+    def _merge(self, keys, histograms, totals):
+        merged = np.union1d(self.keys, keys)
+        out = np.zeros((len(merged), N_BINS), np.uint32)
+        out_totals = np.zeros(len(merged))
+        for k, h, t in ((self.keys, self.histograms, self.totals), (keys, histograms, totals)):
+            rows = np.searchsorted(merged, k)
+            out[rows] += h
+            out_totals[rows] += t
+        self.keys, self.histograms, self.totals = merged, out, out_totals
+        # Summarized on first use, so a build pays for the quantiles once, not per chunk
+        self._counts = self._percentiles = None
+
+    def ingest(self, path, chunk_rows=CHUNK_ROWS):
+        """Stream one trip CSV into the index; returns the number of rows read."""
+        rows = 0
+        for features, delay in read_trip_chunks(path, chunk_rows):
+            self.add(features, delay)
+            rows += len(delay)
+        self.sources[os.path.basename(path)] = rows
+        return rows
+
+    def lookup(self, from_id, to_id, hour_of_day, day_of_week):
+        """``{'samples', 'mean', 'p50', 'p90', 'p99'}`` for one journey, or None if never observed."""
+        key = pack_cells(int(hour_of_day), int(day_of_week), int(from_id), int(to_id))
+        row = np.searchsorted(self.keys, key)
+        if row == len(self.keys) or self.keys[row] != key:
+            return None
+        p50, p90, p99 = (float(v) for v in self.percentiles[row])
+        samples = int(self.counts[row])
+        return {'samples': samples, 'mean': float(self.totals[row] / samples),
+                'p50': p50, 'p90': p90, 'p99': p99}
+
+    def cells(self):
+        """Every cell as a frame: features, samples, mean and percentiles."""
+        df = unpack_cells(self.keys)
+        df['samples'] = self.counts
+        df['mean'] = self.totals / np.maximum(self.counts, 1)
+        for j, q in enumerate(QUANTILES):
+            df[f"p{round(q * 100)}"] = self.percentiles[:, j]
+        return df
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, keys=self.keys, histograms=self.histograms, totals=self.totals,
+                 bin_edges=BIN_EDGES,
+                 source_names=np.array(list(self.sources), dtype=str),
+                 source_rows=np.array(list(self.sources.values()), dtype=np.int64))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if not np.array_equal(data['bin_edges'], BIN_EDGES):
+                raise ValueError(f"{path} was built with different bin edges; rebuild it")
+            return cls(data['keys'], data['histograms'], data['totals'],
+                       zip(data['source_names'].tolist(), data['source_rows'].tolist()))
+
+
+def index_path(index_dir=None):
+    return os.path.join(index_dir or INDEX_DIR, "index.npz")
+
+
+def load_delay_index(path=None):
+    """The index at ``path``, loaded once per process and reloaded when the file changes.
+
+    Returns None when it has not been built.
+    """
+    path = path or index_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _indexes.get(path)
+    if cached is None or cached[0] != mtime:
+        with _lock:
+            cached = _indexes.get(path)
+            if cached is None or cached[0] != mtime:
+                cached = _indexes[path] = (mtime, DelayIndex.load(path))
+    return cached[1]
+
+
+def update_index(paths, path=None, rebuild=False, chunk_rows=CHUNK_ROWS, log=print):
+    """Add the files in ``paths`` not yet indexed and save; returns the index."""
+    path = path or index_path()
+    index = DelayIndex() if rebuild or not os.path.exists(path) else DelayIndex.load(path)
+    for source in paths:
+        name = os.path.basename(source)
+        if name in index.sources:
+            log(f"{name:<20} already indexed, skipped")
+            continue
+        new = DelayIndex()
+        rows = new.ingest(source, chunk_rows)
+        index.merge(new)
+        log(f"{name:<20} {rows:>10,} rows  {len(index):>8,} cells")
+    index.save(path)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or extend the observed delay index")
+    parser.add_argument("paths", nargs="+", help="monthly trip CSVs (globs are expanded)")
+    parser.add_argument("--rebuild", action="store_true", help="start from an empty index")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    paths = sorted({p for pattern in args.paths for p in (glob.glob(pattern) or [pattern])})
+    index = update_index(paths, rebuild=args.rebuild, chunk_rows=args.chunk_rows)
+    served = int((index.counts >= MIN_SAMPLES).sum())
+    print(f"{len(index):,} cells, {int(index.counts.sum()):,} rows; "
+          f"{served:,} cells have at least {MIN_SAMPLES} samples")
+
+
+if __name__ == "__main__":
+    main()
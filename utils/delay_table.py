@@ -0,0 +1,221 @@
+"""Precomputed delay predictions for every (from, to, hour, weekday) combination.
+
+The table is a float32 array of shape ``(n_stations, n_stations, 24, 7)`` indexed
+by dense station index, written as a ``.npy`` file so it can be memory-mapped.
+A JSON sidecar records the station id order and the model version it was scored
+with, so a new model version never serves a stale table. For forests, a
+``<version>.interval.npy`` of shape ``(2, n_stations, n_stations, 24, 7)`` holds
+the lower and upper bounds of each prediction's interval
+(``forest_engine.INTERVAL_COVERAGE`` of the trees' predictions).
+
+Build it for the latest registered delay model with::
+
+    python -m utils.delay_table
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils import forest_engine, model_registry
+from utils.stations import DELAY_FEATURES, STATIONS
+
+TABLE_DIR = os.path.join(model_registry.MODELS_DIR, "delay_table")
+HOURS = 24
+WEEKDAYS = 7
+
+_tables = {}  # path -> DelayTable
+
+
+class DelayTable:
+    """Memory-mapped delay lookup table."""
+
+    def __init__(self, values, station_ids, meta=None, intervals=None):
+        self.values = values
+        self.intervals = intervals
+        self.station_ids = np.asarray(station_ids)
+        self.station_index = {int(sid): i for i, sid in enumerate(self.station_ids)}
+        self.meta = meta or {}
+
+    def lookup(self, from_id, to_id, hour_of_day, day_of_week):
+        """Return the predicted delay in minutes for one journey."""
+        return float(self.values[self.station_index[from_id], self.station_index[to_id],
+                                 hour_of_day, day_of_week])
+
+    def lookup_interval(self, from_id, to_id, hour_of_day, day_of_week):
+        """Return ``(lower, upper)`` for one journey, or None when the table has no intervals."""
+        if self.intervals is None:
+            return None
+        lower, upper = self.intervals[:, self.station_index[from_id], self.station_index[to_id],
+                                      hour_of_day, day_of_week]
+        return float(lower), float(upper)
+
+    def _dense_index(self, ids):
+        """Dense indices of ``ids``; raises KeyError, like ``lookup``, for an unknown station."""
+        ids = np.asarray(ids)
+        idx = np.searchsorted(self.station_ids, ids)  # station ids are sorted
+        found = self.station_ids[np.minimum(idx, len(self.station_ids) - 1)] == ids
+        if not found.all():
+            raise KeyError(ids[~found].flat[0].item())
+        return idx
+
+    def lookup_many(self, from_ids, to_ids, hours, days):
+        """Vectorized ``lookup`` over arrays of journeys."""
+        return np.asarray(self.values[self._dense_index(from_ids), self._dense_index(to_ids),
+                                      np.asarray(hours), np.asarray(days)])
+
+    def network(self, hour_of_day, day_of_week):
+        """Return the full ``(from, to)`` delay matrix for one hour and weekday."""
+        return np.asarray(self.values[:, :, hour_of_day, day_of_week])
+
+
+def table_path(model_version, table_dir=None):
+    return os.path.join(table_dir or TABLE_DIR, f"{model_version}.npy")
+
+
+def interval_path(path):
+    return os.path.splitext(path)[0] + ".interval.npy"
+
+
+def meta_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+def build_delay_table(model, out_path, station_ids=None, chunk_stations=8, model_version=None):
+    """Score every station pair, hour and weekday and write the table to ``out_path``.
+
+    Rows are scored ``chunk_stations`` origin stations at a time so memory stays
+    bounded while each ``model.predict`` call still sees a large batch. Forests
+    also get their prediction intervals, from the same per-tree predictions.
+    """
+    station_ids = np.array(sorted(station_ids or STATIONS.values()), dtype=np.int64)
+    n = len(station_ids)
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    tmp_path = out_path + ".tmp.npy"
+    values = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32,
+                                       shape=(n, n, HOURS, WEEKDAYS))
+    if isinstance(model, forest_engine.CompiledForest):  # e.g. a compacted model
+        predict_interval = model.predict_interval
+    elif hasattr(model, "estimators_") and forest_engine.is_supported(model):
+        predict_interval = lambda features: forest_engine.forest_interval(model, features)
+    else:
+        predict_interval = None
+    with_intervals = predict_interval is not None
+    if with_intervals:
+        tmp_interval_path = interval_path(out_path) + ".tmp.npy"
+        intervals = np.lib.format.open_memmap(tmp_interval_path, mode="w+", dtype=np.float32,
+                                              shape=(2, n, n, HOURS, WEEKDAYS))
+
+    # Feature grid for one origin station, in table order (to, hour, weekday)
+    to_grid, hour_grid, day_grid = (g.ravel() for g in np.meshgrid(
+        station_ids, np.arange(HOURS), np.arange(WEEKDAYS), indexing="ij"))
+    block = len(to_grid)
+
+    start = time.perf_counter()
+    for lo in range(0, n, chunk_stations):
+        origins = station_ids[lo:lo + chunk_stations]
+        features = pd.DataFrame({
+            'hour_of_day': np.tile(hour_grid, len(origins)),
+            'day_of_week': np.tile(day_grid, len(origins)),
+            'from_id': np.repeat(origins, block),
+            'to_id': np.tile(to_grid, len(origins)),
+        })[DELAY_FEATURES]
+        shape = (len(origins), n, HOURS, WEEKDAYS)
+        if with_intervals:
+            predictions, lower, upper = predict_interval(features)
+            intervals[0, lo:lo + len(origins)] = lower.reshape(shape)
+            intervals[1, lo:lo + len(origins)] = upper.reshape(shape)
+        else:
+            predictions = model.predict(features)
+        values[lo:lo + len(origins)] = predictions.astype(np.float32).reshape(shape)
+    values.flush()
+    del values
+    if with_intervals:
+        intervals.flush()
+        del intervals
+        os.replace(tmp_interval_path, interval_path(out_path))
+    os.replace(tmp_path, out_path)
+
+    meta = {
+        "model_version": model_version,
+        "station_ids": station_ids.tolist(),
+        "shape": [n, n, HOURS, WEEKDAYS],
+        "interval_coverage": forest_engine.INTERVAL_COVERAGE if with_intervals else None,
+        "build_seconds": round(time.perf_counter() - start, 2),
+    }
+    _write_meta(meta, out_path)
+    return meta
+
+
+def _write_meta(meta, path):
+    tmp_meta_path = meta_path(path) + ".tmp"
+    with open(tmp_meta_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta_path, meta_path(path))
+
+
+def copy_table(from_version, to_version, table_dir=None, **extra_meta):
+    """Serve ``to_version`` from the table built for ``from_version``.
+
+    Only for a model that predicts the same delays, e.g. a lossless compaction.
+    The arrays are hard-linked when the filesystem allows it, so they take no
+    extra disk. Returns the new meta, or None when ``from_version`` has no table.
+    """
+    src, dst = table_path(from_version, table_dir), table_path(to_version, table_dir)
+    if not (os.path.exists(src) and os.path.exists(meta_path(src))):
+        return None
+    with open(meta_path(src)) as f:
+        meta = {**json.load(f), **extra_meta, "model_version": to_version}
+    pairs = [(src, dst)]
+    if meta.get("interval_coverage"):
+        pairs.append((interval_path(src), interval_path(dst)))
+    for source, target in pairs:
+        tmp_path = target + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            os.link(source, tmp_path)
+        except OSError:  # e.g. a filesystem without hard links
+            shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, target)
+    _write_meta(meta, dst)
+    return meta
+
+
+def load_delay_table(path):
+    """Memory-map a table built by ``build_delay_table``, once per process.
+
+    Returns None when the table has not been built.
+    """
+    table = _tables.get(path)
+    if table is None:
+        if not (os.path.exists(path) and os.path.exists(meta_path(path))):
+            return None
+        with open(meta_path(path)) as f:
+            meta = json.load(f)
+        intervals = np.load(interval_path(path), mmap_mode="r") if meta.get("interval_coverage") else None
+        table = DelayTable(np.load(path, mmap_mode="r"), meta["station_ids"], meta, intervals)
+        _tables[path] = table
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the delay lookup table")
+    parser.add_argument("--model-name", default="delay_prediction_model")
+    parser.add_argument("--version", help="registry version (defaults to latest)")
+    parser.add_argument("--chunk-stations", type=int, default=8)
+    args = parser.parse_args()
+
+    version = args.version or model_registry.latest_version(args.model_name)
+    model = model_registry.load_model(args.model_name, version)
+    out_path = table_path(version)
+    meta = build_delay_table(model, out_path, chunk_stations=args.chunk_stations, model_version=version)
+    print(f"Wrote {out_path} {tuple(meta['shape'])} in {meta['build_seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""Out-of-core training of the trip-level delay model.
+
+The notebooks concatenate every monthly trip CSV into one frame before fitting,
+which stops working once several years of ``rail_data`` files are involved.
+Here each file is streamed in chunks of ``CHUNK_ROWS`` rows. ``hour_of_day`` and
+``day_of_week`` are derived per chunk, and the rows are folded into
+``TripAggregates``: count, sum and sum of squares of ``delay_minutes`` per
+(hour, weekday, from, to) cell.
+
+The model's four features are all discrete, so the cells are the binned
+training set. A squared-error ``HistGradientBoostingRegressor`` fitted on
+per-cell means, weighted by cell counts, sees the same gradients as one fitted
+on every row. Memory therefore grows with the number of distinct cells, not the
+number of trips. Station ids are encoded as dense categorical codes.
+
+The result is a ``DelayModel`` with the same ``predict(DataFrame)`` interface as
+the forest in ``delay_prediction_model.joblib``, registered under that name::
+
+    python -m utils.delay_training data/rail_data/2019_*.csv data/rail_data/2020_*.csv
+
+When a new month lands, ``--refresh`` reads only that file. It merges the new
+cells into the saved aggregates and adds boosting iterations to the latest
+registered model, then publishes the result as a new registry version::
+
+    python -m utils.delay_training --refresh data/rail_data/2020_06.csv
+"""
+import argparse
+import copy
+import glob
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils import model_registry
+from utils.stations import DELAY_FEATURES
+
+MODEL_NAME = "delay_prediction_model"
+TRAINING_DIR = os.path.join(model_registry.MODELS_DIR, "delay_training")
+CHUNK_ROWS = 500_000
+TRIP_COLUMNS = ['scheduled_time', 'from_id', 'to_id', 'delay_minutes']
+MAX_CATEGORIES = 254  # HistGradientBoosting categorical limit (max_bins - 1)
+MODEL_PARAMS = {
+    'max_iter': 200,
+    'learning_rate': 0.1,
+    'max_leaf_nodes': 63,
+    'min_samples_leaf': 5,
+    'l2_regularization': 1.0,
+    'early_stopping': False,
+    'random_state': 42,
+}
+
+
+def read_trip_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Yield ``(features, delay)`` per chunk of a monthly trip CSV.
+
+    Same preparation as the notebooks: missing delays count as 0 and rows without
+    a parseable time or station ids are dropped.
+    """
+    for chunk in pd.read_csv(path, usecols=TRIP_COLUMNS, chunksize=chunk_rows):
+        scheduled = pd.to_datetime(chunk['scheduled_time'], format='ISO8601', errors='coerce')
+        valid = scheduled.notna() & chunk['from_id'].notna() & chunk['to_id'].notna()
+        scheduled = scheduled[valid]
+        features = pd.DataFrame({
+            'hour_of_day': scheduled.dt.hour.to_numpy(np.int64),
+            'day_of_week': scheduled.dt.dayofweek.to_numpy(np.int64),
+            'from_id': chunk['from_id'][valid].to_numpy(np.int64),
+            'to_id': chunk['to_id'][valid].to_numpy(np.int64),
+        })[DELAY_FEATURES]
+        delay = chunk['delay_minutes'][valid].fillna(0).to_numpy(np.float64)
+        yield features, delay
+
+
+def pack_cells(hour, day, from_id, to_id):
+    """One sortable int64 key per (hour, weekday, from, to) cell."""
+    return (from_id << 32) | (to_id << 8) | (hour << 3) | day
+
+
+def unpack_cells(keys):
+    """``DELAY_FEATURES`` frame for keys made by ``pack_cells``."""
+    return pd.DataFrame({
+        'hour_of_day': (keys >> 3) & 0x1F,
+        'day_of_week': keys & 0x7,
+        'from_id': keys >> 32,
+        'to_id': (keys >> 8) & 0xFFFFFF,
+    })[DELAY_FEATURES]
+
+
+class TripAggregates:
+    """Count, sum and sum of squares of delay per (hour, weekday, from, to) cell.
+
+    Cells are kept as sorted packed int64 keys, so merging a chunk is one
+    ``np.unique`` over the existing cells plus the chunk's cells.
+    """
+
+    def __init__(self, keys=None, count=None, total=None, total_sq=None, sources=None):
+        self.keys = np.empty(0, np.int64) if keys is None else keys
+        self.count = np.empty(0, np.float64) if count is None else count
+        self.total = np.empty(0, np.float64) if total is None else total
+        self.total_sq = np.empty(0, np.float64) if total_sq is None else total_sq
+        self.sources = dict(sources or {})  # file name -> rows ingested
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def rows(self):
+        return int(self.count.sum())
+
+    def add(self, features, delay):
+        """Fold one chunk of rows into the cells."""
+        keys = pack_cells(*(features[name].to_numpy(np.int64) for name in DELAY_FEATURES))
+        self._merge(keys, np.ones(len(keys)), delay, delay ** 2)
+
+    def merge(self, other):
+        self._merge(other.keys, other.count, other.total, other.total_sq)
+        self.sources.update(other.sources)
+
+    def _merge(self, keys, count, total, total_sq):
+        keys, inverse = np.unique(np.concatenate([self.keys, keys]), return_inverse=True)
+        self.count = np.bincount(inverse, np.concatenate([self.count, count]), len(keys))
+        self.total = np.bincount(inverse, np.concatenate([self.total, total]), len(keys))
+        self.total_sq = np.bincount(inverse, np.concatenate([self.total_sq, total_sq]), len(keys))
+        self.keys = keys
+
+    def ingest(self, path, chunk_rows=CHUNK_ROWS):
+        """Stream one trip CSV into the cells; returns the number of rows read."""
+        rows = 0
+        for features, delay in read_trip_chunks(path, chunk_rows):
+            self.add(features, delay)
+            rows += len(delay)
+        self.sources[os.path.basename(path)] = rows
+        return rows
+
+    def features(self):
+        return unpack_cells(self.keys)
+
+    def mean(self):
+        return self.total / self.count
+
+    def station_ids(self):
+        return np.union1d(self.keys >> 32, (self.keys >> 8) & 0xFFFFFF)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, keys=self.keys, count=self.count, total=self.total, total_sq=self.total_sq,
+                 source_names=np.array(list(self.sources), dtype=str),
+                 source_rows=np.array(list(self.sources.values()), dtype=np.int64))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['keys'], data['count'], data['total'], data['total_sq'],
+                       zip(data['source_names'].tolist(), data['source_rows'].tolist()))
+
+
+class StationEncoder:
+    """Station ids -> dense codes ``0..n-1``; stations unseen in training become NaN.
+
+    Codes follow insertion order and never change, so an encoder extended with
+    new stations still matches trees fitted on the old codes.
+    """
+
+    def __init__(self, station_ids):
+        self.station_ids = pd.unique(np.asarray(station_ids, dtype=np.int64))
+        self._order = np.argsort(self.station_ids, kind='stable')
+
+    def __len__(self):
+        return len(self.station_ids)
+
+    def extend(self, station_ids):
+        """Encoder with ``station_ids`` not seen before appended after the existing codes."""
+        new = np.setdiff1d(np.asarray(station_ids, dtype=np.int64), self.station_ids)
+        return StationEncoder(np.concatenate([self.station_ids, new]))
+
+    def encode(self, ids):
+        ids = np.asarray(ids, dtype=np.float64)
+        sorted_ids = self.station_ids[self._order]
+        pos = np.searchsorted(sorted_ids, ids).clip(0, max(len(sorted_ids) - 1, 0))
+        known = sorted_ids[pos] == ids
+        return np.where(known, self._order[pos], np.nan)
+
+    def transform(self, X):
+        """``DELAY_FEATURES`` frame (or array in that order) -> float array of codes."""
+        values = np.asarray(X[DELAY_FEATURES] if hasattr(X, 'columns') else X, dtype=np.float64)
+        encoded = values.copy()
+        encoded[:, 2] = self.encode(values[:, 2])
+        encoded[:, 3] = self.encode(values[:, 3])
+        return encoded
+
+
+class DelayModel:
+    """Station-encoded features into a histogram gradient boosting regressor.
+
+    Exposes ``predict(X)`` and ``feature_names_in_`` like the forest it replaces,
+    so ``predict_delay`` and the lookup table builder use it unchanged.
+    """
+
+    def __init__(self, encoder, regressor):
+        self.encoder = encoder
+        self.regressor = regressor
+
+    @property
+    def feature_names_in_(self):
+        return np.array(DELAY_FEATURES, dtype=object)
+
+    @property
+    def n_features_in_(self):
+        return len(DELAY_FEATURES)
+
+    def predict(self, X):
+        return self.regressor.predict(self.encoder.transform(X))
+
+
+def fit_delay_model(aggregates, **params):
+    """Fit a ``DelayModel`` on the per-cell mean delays, weighted by cell counts."""
+    from sklearn.ensemble import HistGradientBoostingRegressor
+
+    encoder = StationEncoder(aggregates.station_ids())
+    categorical = len(encoder) <= MAX_CATEGORIES
+    regressor = HistGradientBoostingRegressor(
+        categorical_features=[False, False, categorical, categorical],
+        **{**MODEL_PARAMS, **params},
+    )
+    regressor.fit(encoder.transform(aggregates.features()), aggregates.mean(),
+                  sample_weight=aggregates.count)
+    return DelayModel(encoder, regressor)
+
+
+def evaluate(model, aggregates):
+    """Row-level RMSE of ``model`` over the aggregated rows, plus the noise floor.
+
+    The noise floor is the RMSE of predicting each cell's own mean: no model on
+    these four features can do better.
+    """
+    n = aggregates.count.sum()
+    within = np.maximum(aggregates.total_sq - aggregates.total ** 2 / aggregates.count, 0).sum()
+    predictions = model.predict(aggregates.features())
+    between = (aggregates.count * (aggregates.mean() - predictions) ** 2).sum()
+    return {
+        'rmse': float(np.sqrt((within + between) / n)),
+        'noise_floor_rmse': float(np.sqrt(within / n)),
+    }
+
+
+def aggregates_path(training_dir=None):
+    return os.path.join(training_dir or TRAINING_DIR, "aggregates.npz")
+
+
+def train(paths, chunk_rows=CHUNK_ROWS, log=print, **params):
+    """Stream ``paths`` into aggregates and fit; returns ``(model, aggregates, report)``."""
+    start = time.perf_counter()
+    aggregates = TripAggregates()
+    for path in paths:
+        rows = aggregates.ingest(path, chunk_rows)
+        log(f"{os.path.basename(path):<20} {rows:>10,} rows  {len(aggregates):>8,} cells")
+    ingest_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model = fit_delay_model(aggregates, **params)
+    report = {
+        'rows': aggregates.rows,
+        'cells': len(aggregates),
+        'stations': len(model.encoder),
+        'files': len(aggregates.sources),
+        'ingest_seconds': round(ingest_seconds, 2),
+        'fit_seconds': round(time.perf_counter() - start, 2),
+        **evaluate(model, aggregates),
+    }
+    return model, aggregates, report
+
+
+def refresh(paths, extra_iter=50, max_total_iter=600, chunk_rows=CHUNK_ROWS, log=print):
+    """Fold new monthly files into the saved aggregates and add trees to the latest model.
+
+    Only ``paths`` are read, and files already in the aggregates are skipped. The
+    registered model is warm-started with ``extra_iter`` more boosting
+    iterations fitted on all cells. It is refitted from the cells instead when
+    it is not a ``DelayModel``, when it would exceed ``max_total_iter``, or when
+    new stations no longer fit the categorical encoding. Either way the cost
+    depends on the new files and the number of cells, not on how many months
+    came before. If the saved aggregates are not the files the latest version
+    was trained on (its ``aggregate_sources`` metadata), the model is refitted
+    too, since adding trees to it would mix two training sets. Returns
+    ``(model, aggregates, report)``; ``model`` is None when there was nothing new.
+    """
+    aggregates = TripAggregates.load(aggregates_path())
+    saved_sources = set(aggregates.sources)
+    start = time.perf_counter()
+    new = TripAggregates()
+    for path in paths:
+        name = os.path.basename(path)
+        if name in aggregates.sources:
+            log(f"{name:<20} already ingested, skipped")
+            continue
+        rows = new.ingest(path, chunk_rows)
+        log(f"{name:<20} {rows:>10,} rows  {len(new):>8,} cells")
+    if not new.sources:
+        return None, aggregates, None
+    aggregates.merge(new)
+    ingest_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    try:
+        # Deep copy: the registry's instance is shared by the whole process and memory-mapped
+        base = copy.deepcopy(model_registry.load_model(MODEL_NAME))
+    except LookupError:
+        base = None
+    latest = model_registry.list_versions(MODEL_NAME).get(model_registry.latest_version(MODEL_NAME), {})
+    trained_on = latest.get("aggregate_sources")  # absent for versions registered before it was recorded
+    if trained_on is not None and set(trained_on) != saved_sources:
+        log("Saved aggregates do not match the files the latest model was trained on, refitting")
+        base = None
+    mode = "refit"
+    if isinstance(base, DelayModel):
+        encoder = base.encoder.extend(new.station_ids())
+        regressor = base.regressor
+        categorical = bool(np.any(regressor.is_categorical_))
+        if regressor.n_iter_ + extra_iter <= max_total_iter and not (categorical and len(encoder) > MAX_CATEGORIES):
+            regressor.set_params(warm_start=True, max_iter=regressor.n_iter_ + extra_iter)
+            regressor.fit(encoder.transform(aggregates.features()), aggregates.mean(),
+                          sample_weight=aggregates.count)
+            regressor.set_params(warm_start=False)
+            model = DelayModel(encoder, regressor)
+            mode = "warm_start"
+    if mode == "refit":
+        model = fit_delay_model(aggregates)
+
+    report = {
+        'mode': mode,
+        'new_files': sorted(new.sources),
+        'new_rows': new.rows,
+        'rows': aggregates.rows,
+        'cells': len(aggregates),
+        'iterations': int(model.regressor.n_iter_),
+        'ingest_seconds': round(ingest_seconds, 2),
+        'fit_seconds': round(time.perf_counter() - start, 2),
+        **evaluate(model, aggregates),
+    }
+    return model, aggregates, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the delay model from monthly trip CSVs")
+    parser.add_argument("paths", nargs="+", help="monthly trip CSVs (globs are expanded)")
+    parser.add_argument("--refresh", action="store_true",
+                        help="only ingest new files and add trees to the latest model")
+    parser.add_argument("--extra-iter", type=int, default=50, help="iterations added by --refresh")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--max-iter", type=int, default=MODEL_PARAMS['max_iter'])
+    parser.add_argument("--output", help="also write the model to this joblib file")
+    parser.add_argument("--no-register", action="store_true", help="don't register the model")
+    parser.add_argument("--build-table", action="store_true", help="precompute the lookup table for the new version")
+    args = parser.parse_args()
+
+    paths = sorted({p for pattern in args.paths for p in (glob.glob(pattern) or [pattern])})
+    if args.refresh:
+        previous = model_registry.latest_version(MODEL_NAME)
+        model, aggregates, report = refresh(paths, args.extra_iter, chunk_rows=args.chunk_rows)
+        if model is None:
+            print("Nothing new to ingest")
+            return
+        report['refresh_of'] = previous
+    else:
+        model, aggregates, report = train(paths, args.chunk_rows, max_iter=args.max_iter)
+    print(", ".join(f"{k} {v}" for k, v in report.items()))
+
+    if args.output:
+        import joblib
+        joblib.dump(model, args.output)
+        print(f"Wrote {args.output}")
+    if not args.no_register:
+        # Running servers pick the new version up on their next rerun (the registry is re-read on change)
+        version = model_registry.register_model(
+            MODEL_NAME, model,
+            metadata={"trainer": "delay_training", "aggregate_sources": sorted(aggregates.sources), **report})
+        print(f"Registered {MODEL_NAME} version {version}")
+        if args.build_table:
+            from utils import delay_table
+            out_path = delay_table.table_path(version)
+            meta = delay_table.build_delay_table(model, out_path, model_version=version)
+            print(f"Wrote {out_path} in {meta['build_seconds']}s")
+        # Saved last and only with a registered model, so the aggregates always
+        # match the latest version that --refresh builds on
+        aggregates.save(aggregates_path())
+
+
+if __name__ == "__main__":
+    # Run from the importable module so pickled models reference
+    # utils.delay_training.DelayModel rather than __main__.DelayModel
+    from utils.delay_training import main
+    main()
@@ -0,0 +1,121 @@
+"""FAQ loading, prompt building and a BM25 retrieval index over the FAQ entries.
+
+Instead of pasting the whole FAQ file into every system prompt, the support page
+retrieves the few entries relevant to the user's question and builds the prompt
+from those. The index is a plain inverted file (term -> doc ids, BM25 weights)
+built once; a query only touches the postings of its own terms.
+"""
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+import numpy as np
+
+FAQ_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'FAQs_-_01042022.json')
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i if in is it its me my of on or
+so that the this to was what when where which who why will with you your
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def read_faqs(file_path=FAQ_PATH, platform='iOSfaqs'):
+    """Return the FAQ entries as ``{'section', 'question', 'answer'}`` dicts."""
+    with open(file_path, 'r') as file:
+        data = json.load(file)
+
+    faqs = []
+    for section in data[platform]['sections']:
+        section_name = section['sec_name']
+        for qa in section['sec_data']:
+            faqs.append({
+                'section': section_name,
+                'question': qa['q'],
+                'answer': qa['a']
+            })
+    return faqs
+
+
+def create_context_from_faqs(faqs):
+    context = "You are an NJ Transit support assistant. Here are the official FAQs you should base your answers on:\n\n"
+    for faq in faqs:
+        context += f"Section: {faq['section']}\n"
+        context += f"Q: {faq['question']}\n"
+        context += f"A: {faq['answer']}\n\n"
+    context += "\nPlease use this information to answer questions. If a question isn't covered in the FAQs, you can provide general help but mention that the information is not from the official FAQs."
+    return context
+
+
+def tokenize(text):
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def normalize_question(text):
+    """Lowercase words only, so casing, punctuation and spacing don't matter."""
+    return " ".join(_TOKEN_RE.findall(text.lower()))
+
+
+class FAQIndex:
+    """Okapi BM25 over question + answer text, with the question counted twice."""
+
+    def __init__(self, faqs, k1=1.5, b=0.75, question_weight=2):
+        self.faqs = list(faqs)
+        docs = [tokenize(faq['question']) * question_weight + tokenize(faq['answer'])
+                for faq in self.faqs]
+        n_docs = len(docs)
+        avg_len = sum(map(len, docs)) / n_docs if n_docs else 0.0
+
+        postings = defaultdict(list)
+        for doc_id, tokens in enumerate(docs):
+            norm = k1 * (1 - b + b * len(tokens) / avg_len) if avg_len else k1
+            for term, tf in Counter(tokens).items():
+                postings[term].append((doc_id, tf * (k1 + 1) / (tf + norm)))
+
+        self.postings = {}
+        for term, entries in postings.items():
+            idf = math.log(1 + (n_docs - len(entries) + 0.5) / (len(entries) + 0.5))
+            doc_ids = np.array([doc_id for doc_id, _ in entries], dtype=np.int32)
+            weights = np.array([weight for _, weight in entries]) * idf
+            self.postings[term] = (doc_ids, weights)
+
+    def __len__(self):
+        return len(self.faqs)
+
+    def scores(self, query):
+        """BM25 score of every FAQ entry for ``query``."""
+        scores = np.zeros(len(self.faqs))
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                np.add.at(scores, posting[0], posting[1])
+        return scores
+
+    def search(self, query, k=5):
+        """Return up to ``k`` ``(faq, score)`` pairs with a positive score, best first."""
+        scores = self.scores(query)
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.faqs[i], float(scores[i])) for i in top if scores[i] > 0]
+
+    def match_question(self, query, min_similarity=0.95, candidates=3):
+        """Return the FAQ entry whose question is (nearly) the same as ``query``, else None.
+
+        Only the top BM25 candidates are compared, by character similarity of the
+        normalized questions. The default threshold keeps "refund a rail ticket"
+        apart from "refund a light rail ticket".
+        """
+        normalized = normalize_question(query)
+        best, best_similarity = None, min_similarity
+        for faq, _ in self.search(query, k=candidates):
+            similarity = SequenceMatcher(None, normalized, normalize_question(faq['question'])).ratio()
+            if similarity >= best_similarity:
+                best, best_similarity = faq, similarity
+        return best
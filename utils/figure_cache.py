@@ -0,0 +1,40 @@
+"""Plotly figures built once per distinct input and reused across reruns and sessions.
+
+Building a chart is most of a page rerun: ``px.scatter(..., trendline="lowess")``
+fits statsmodels LOWESS on every call, and the heatmap and box plot re-validate
+every trace. ``cached_figure`` keys a figure by a name plus the fingerprint of
+whatever it is drawn from, so a rerun that changes nothing else draws it again
+without building it::
+
+    fig = figure_cache.cached_figure('trend', lambda: px.scatter(df, ...), df, params)
+
+The cache holds the figure objects, since ``st.plotly_chart`` re-validates a
+plain JSON spec on every call but serializes a ``Figure`` directly. Each entry
+is sized by its serialized JSON, and the cache evicts the least recently drawn
+figures past ``NJT_FIGURE_CACHE_MB``. Cached figures are shared by every session,
+so callers must not modify them.
+"""
+import os
+
+from utils.cache import fingerprint, get_cache
+
+MAX_BYTES = int(float(os.getenv("NJT_FIGURE_CACHE_MB", "64")) * 2 ** 20)
+
+figures = get_cache("figures", max_entries=256, max_bytes=MAX_BYTES)
+
+
+def figure_key(name, *parts):
+    """Cache key of figure ``name`` drawn from ``parts`` (DataFrames and JSON-serialisable values)."""
+    return f"{name}:{fingerprint(*parts)}"
+
+
+def cached_figure(name, build, *parts):
+    """The figure ``build()`` returns for these ``parts``, built once per distinct input."""
+    key = figure_key(name, *parts)
+    fig = figures.get(key)
+    if fig is None:
+        import plotly.io as pio
+
+        fig = build()
+        figures.put(key, fig, len(pio.to_json(fig, validate=False)))
+    return fig
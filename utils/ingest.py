@@ -0,0 +1,106 @@
+"""Column cache that lets normalized datasets be parsed once and memory-mapped after.
+
+Each ingested frame is written to ``<CACHE_DIR>/ingest/<name>-<hash>/`` with one
+uncompressed ``.npy`` file per column (categoricals as codes + categories in
+``meta.json``). The hash covers the source files' contents, so editing a CSV
+invalidates the cache, and reads memory-map the arrays instead of re-parsing.
+"""
+import calendar
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import CACHE_DIR
+
+INGEST_DIR = os.path.join(CACHE_DIR, "ingest")
+INGEST_VERSION = 2  # bump when normalization (here or in utils.catalog) changes
+
+MONTHS = [name.upper() for name in calendar.month_name[1:]]
+MONTH_DTYPE = pd.CategoricalDtype(MONTHS, ordered=True)
+
+_lock = threading.RLock()
+
+
+def _sources_hash(paths):
+    digest = hashlib.sha256(str(INGEST_VERSION).encode())
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()[:16]
+
+
+def write_columns(df, directory):
+    """Write ``df`` as one ``.npy`` per column plus a ``meta.json`` schema."""
+    os.makedirs(directory, exist_ok=True)
+    columns = []
+    for i, name in enumerate(df.columns):
+        column = df[name]
+        entry = {"name": name, "file": f"{i}.npy"}
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            values = column.cat.codes.to_numpy()
+            entry["categories"] = column.cat.categories.tolist()
+            entry["ordered"] = bool(column.cat.ordered)
+        else:
+            values = column.to_numpy()
+        np.save(os.path.join(directory, entry["file"]), values, allow_pickle=False)
+        columns.append(entry)
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump({"columns": columns, "rows": len(df)}, f)
+
+
+def read_columns(directory):
+    """Rebuild a frame written by ``write_columns`` on top of memory-mapped arrays."""
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    data = {}
+    for entry in meta["columns"]:
+        values = np.load(os.path.join(directory, entry["file"]), mmap_mode="r")
+        if "categories" in entry:
+            dtype = pd.CategoricalDtype(entry["categories"], ordered=entry["ordered"])
+            values = pd.Categorical.from_codes(values, dtype=dtype, validate=False)
+        data[entry["name"]] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def cached_frame(name, sources, build):
+    """Return ``build()``'s frame, cached on disk until any file in ``sources`` changes."""
+    directory = os.path.join(INGEST_DIR, f"{name}-{_sources_hash(sources)}")
+    if os.path.exists(os.path.join(directory, "meta.json")):
+        return read_columns(directory)
+
+    with _lock:
+        if not os.path.exists(os.path.join(directory, "meta.json")):
+            os.makedirs(INGEST_DIR, exist_ok=True)
+            tmp_dir = tempfile.mkdtemp(dir=INGEST_DIR, prefix=f".{name}-")
+            try:
+                write_columns(build(), tmp_dir)
+                os.rename(tmp_dir, directory)
+            except OSError:
+                # Another process published the same version first
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                if not os.path.exists(directory):
+                    raise
+            # Drop caches built from older versions of the sources
+            for entry in os.listdir(INGEST_DIR):
+                if entry.startswith(f"{name}-") and entry != os.path.basename(directory):
+                    shutil.rmtree(os.path.join(INGEST_DIR, entry), ignore_errors=True)
+    return read_columns(directory)
+
+
+def normalize_months(df):
+    """Add typed MONTH (categorical) and MONTH_NUM columns from padded month names."""
+    df['MONTH'] = df['MONTH'].str.strip().str.upper().astype(MONTH_DTYPE)
+    df['MONTH_NUM'] = (df['MONTH'].cat.codes + 1).astype(np.int8)
+    df['YEAR'] = df['YEAR'].astype(np.int16)
+    return df
+
+
+def month_start(year, month_num):
+    """Vectorized first-of-month ``datetime64`` column from year and month numbers."""
+    return pd.to_datetime(pd.DataFrame({'year': year, 'month': month_num, 'day': 1}))
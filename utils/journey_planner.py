@@ -0,0 +1,258 @@
+"""Multi-leg journey planning over the station/line graph seen in the trip history.
+
+Consecutive stops of the same train become directed edges between
+``(station, line)`` nodes. For every edge, hour and weekday the graph keeps the
+mean scheduled run time and the mean delay the train picks up on that edge
+(delay at ``to`` minus delay at ``from``), so the expected minutes of a ride
+are the sum over its edges and the expected lateness on arrival is the sum of
+the picked-up delay. Changing line at a station costs ``TRANSFER_MINUTES``.
+
+``plan`` runs a time-dependent Dijkstra search: each edge is costed at the hour
+and weekday the rider is expected to reach it. Everything is stored as flat
+arrays (CSR adjacency plus ``(n_edges, 24, 7)`` tables) in one ``.npz`` under
+the cache directory, loaded once per process::
+
+    python -m utils.journey_planner data/rail_data/*.csv
+"""
+import argparse
+import glob
+import heapq
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import CACHE_DIR
+from utils.delay_table import HOURS, WEEKDAYS
+
+GRAPH_DIR = os.path.join(CACHE_DIR, "journey_graph")
+TRANSFER_MINUTES = 8.0  # expected wait when changing trains
+MAX_RUN_MINUTES = 180  # longer gaps between consecutive stops are data errors
+TRIP_COLUMNS = ['date', 'train_id', 'stop_sequence', 'from_id', 'to_id',
+                'scheduled_time', 'delay_minutes', 'line']
+EDGE_KEYS = ['from_id', 'to_id', 'line']
+
+_graphs = {}  # path -> (mtime, JourneyGraph)
+_lock = threading.Lock()
+
+
+def read_edges(path):
+    """Per (from_id, to_id, line, hour, weekday) sums of run minutes and picked-up delay."""
+    df = pd.read_csv(path, usecols=TRIP_COLUMNS, parse_dates=['scheduled_time'])
+    df = df.dropna(subset=['from_id', 'to_id', 'line', 'scheduled_time', 'delay_minutes'])
+    df = df.sort_values(['date', 'train_id', 'stop_sequence'], kind='stable')
+
+    # Run time and delay picked up since the previous stop of the same train
+    previous = df.shift()
+    same_train = (df['date'] == previous['date']) & (df['train_id'] == previous['train_id'])
+    run = (df['scheduled_time'] - previous['scheduled_time']).dt.total_seconds() / 60
+    run = run.where(same_train & (run > 0) & (run <= MAX_RUN_MINUTES))
+    added = df['delay_minutes'] - previous['delay_minutes'].where(same_train, 0)
+
+    legs = pd.DataFrame({
+        'from_id': df['from_id'].astype(np.int64),
+        'to_id': df['to_id'].astype(np.int64),
+        'line': df['line'],
+        'hour': df['scheduled_time'].dt.hour,
+        'day': df['scheduled_time'].dt.dayofweek,
+        'run_sum': run.fillna(0),
+        'run_count': run.notna().astype(np.int64),
+        'added_sum': added,
+        'count': 1,
+    })
+    return legs.groupby(EDGE_KEYS + ['hour', 'day'], sort=False).sum()
+
+
+class JourneyGraph:
+    """CSR adjacency over ``(station, line)`` nodes with per-edge hour x weekday tables."""
+
+    def __init__(self, node_stations, node_lines, lines, indptr, targets, run, added, samples,
+                 sources=()):
+        self.node_stations = node_stations
+        self.node_lines = node_lines
+        self.lines = lines
+        self.indptr = indptr
+        self.targets = targets
+        self.run = run
+        self.added = added
+        self.samples = samples
+        self.sources = list(sources)
+        # Nodes at each station, for transfers and for the start/end of a search
+        self.station_nodes = {}
+        for node, station in enumerate(node_stations.tolist()):
+            self.station_nodes.setdefault(station, []).append(node)
+
+    def __len__(self):
+        return len(self.node_stations)
+
+    @classmethod
+    def build(cls, paths, log=print):
+        parts = []
+        for path in paths:
+            parts.append(read_edges(path))
+            log(f"{os.path.basename(path):<20} {int(parts[-1]['count'].sum()):>10,} stops")
+        sums = pd.concat(parts).groupby(level=list(range(5))).sum().reset_index()
+
+        # Nodes are the (station, line) pairs at either end of an edge
+        lines = np.array(sorted(sums['line'].unique()), dtype=str)
+        sums['line_code'] = np.searchsorted(lines, sums['line'].to_numpy(str))
+        ends = pd.concat([
+            sums[['from_id', 'line_code']].set_axis(['station', 'line_code'], axis=1),
+            sums[['to_id', 'line_code']].set_axis(['station', 'line_code'], axis=1),
+        ]).drop_duplicates().sort_values(['station', 'line_code'], ignore_index=True)
+        node_of = pd.Series(np.arange(len(ends)), index=pd.MultiIndex.from_frame(ends))
+        sums['source'] = node_of.reindex(pd.MultiIndex.from_arrays([sums['from_id'], sums['line_code']])).to_numpy()
+        sums['target'] = node_of.reindex(pd.MultiIndex.from_arrays([sums['to_id'], sums['line_code']])).to_numpy()
+
+        edges = sums[['source', 'target']].drop_duplicates().sort_values(['source', 'target'], ignore_index=True)
+        edge_of = pd.Series(np.arange(len(edges)), index=pd.MultiIndex.from_frame(edges))
+        edge = edge_of.reindex(pd.MultiIndex.from_frame(sums[['source', 'target']])).to_numpy()
+
+        shape = (len(edges), HOURS, WEEKDAYS)
+        cell = np.ravel_multi_index((edge, sums['hour'].to_numpy(), sums['day'].to_numpy()), shape)
+        size = int(np.prod(shape))
+        totals = {name: np.bincount(cell, sums[name].to_numpy(np.float64), size).reshape(shape)
+                  for name in ('run_sum', 'run_count', 'added_sum', 'count')}
+
+        # Hours an edge was never seen at fall back to the edge's overall mean, and
+        # edges with no measured run time (first stops) to the network median
+        edge_run = totals['run_sum'].sum(axis=(1, 2)) / np.maximum(totals['run_count'].sum(axis=(1, 2)), 1)
+        measured = totals['run_count'].sum(axis=(1, 2)) > 0
+        edge_run[~measured] = np.median(edge_run[measured]) if measured.any() else 0.0
+        edge_added = totals['added_sum'].sum(axis=(1, 2)) / np.maximum(totals['count'].sum(axis=(1, 2)), 1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            run = np.where(totals['run_count'] > 0, totals['run_sum'] / totals['run_count'],
+                           edge_run[:, None, None])
+            added = np.where(totals['count'] > 0, totals['added_sum'] / totals['count'],
+                             edge_added[:, None, None])
+
+        indptr = np.searchsorted(edges['source'].to_numpy(), np.arange(len(ends) + 1)).astype(np.int32)
+        return cls(ends['station'].to_numpy(np.int64), ends['line_code'].to_numpy(np.int16), lines,
+                   indptr, edges['target'].to_numpy(np.int32), run.astype(np.float32),
+                   added.astype(np.float32), totals['count'].sum(axis=(1, 2)).astype(np.int64),
+                   [os.path.basename(p) for p in paths])
+
+    def plan(self, from_id, to_id, hour_of_day, day_of_week, max_transfers=3):
+        """Fastest expected journey from ``from_id`` to ``to_id`` leaving at ``hour_of_day``.
+
+        Returns None when no path exists, otherwise ``{'minutes', 'delay', 'transfers',
+        'legs'}`` where each leg is ``{'line', 'from_id', 'to_id', 'stops', 'minutes',
+        'delay'}``; ``delay`` is the expected lateness on arriving at the leg's end.
+        """
+        starts = self.station_nodes.get(int(from_id), [])
+        goals = set(self.station_nodes.get(int(to_id), []))
+        if not starts or not goals or int(from_id) == int(to_id):
+            return None
+
+        # State: (node, transfers used). Each edge is costed at the hour the rider reaches it.
+        start_minute = int(hour_of_day) * 60 + int(day_of_week) * 24 * 60
+        best = {}
+        previous = {}
+        heap = [(0.0, node, 0) for node in starts]
+        for _, node, _ in heap:
+            best[(node, 0)] = 0.0
+        indptr, targets, run, added = self.indptr, self.targets, self.run, self.added
+        while heap:
+            cost, node, transfers = heapq.heappop(heap)
+            state = (node, transfers)
+            if cost > best.get(state, np.inf):
+                continue
+            if node in goals:
+                return self._journey(state, previous)
+            minute = start_minute + int(cost)
+            hour, day = minute // 60 % HOURS, minute // (24 * 60) % WEEKDAYS
+            candidates = [(int(targets[e]), transfers, max(float(run[e, hour, day] + added[e, hour, day]), 0.1), e)
+                          for e in range(indptr[node], indptr[node + 1])]
+            station = int(self.node_stations[node])
+            if transfers < max_transfers and station != int(from_id):  # any line is boarded free at the origin
+                candidates += [(other, transfers + 1, TRANSFER_MINUTES, -1)
+                               for other in self.station_nodes[station] if other != node]
+            for target, used, step, e in candidates:
+                new_state = (target, used)
+                new_cost = cost + step
+                if new_cost < best.get(new_state, np.inf):
+                    best[new_state] = new_cost
+                    previous[new_state] = (state, e, hour, day)
+                    heapq.heappush(heap, (new_cost, target, used))
+        return None
+
+    def _journey(self, state, previous):
+        """Group the edges on the path to ``state`` into one leg per train ride."""
+        edges = []
+        while state in previous:
+            state, e, hour, day = previous[state]
+            if e >= 0:
+                edges.append((e, hour, day, state[0]))
+        legs = []
+        for e, hour, day, source in reversed(edges):
+            line = str(self.lines[self.node_lines[source]])
+            to_id = int(self.node_stations[self.targets[e]])
+            minutes = float(self.run[e, hour, day] + self.added[e, hour, day])
+            if legs and legs[-1]['line'] == line:
+                leg = legs[-1]
+                leg.update(to_id=to_id, stops=leg['stops'] + 1)
+            else:
+                leg = {'line': line, 'from_id': int(self.node_stations[source]), 'to_id': to_id,
+                       'stops': 1, 'minutes': 0.0, 'delay': 0.0}
+                legs.append(leg)
+            leg['minutes'] += max(minutes, 0.1)
+            leg['delay'] += float(self.added[e, hour, day])
+        transfers = len(legs) - 1
+        return {'minutes': sum(leg['minutes'] for leg in legs) + transfers * TRANSFER_MINUTES,
+                'delay': legs[-1]['delay'], 'transfers': transfers, 'legs': legs}
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, node_stations=self.node_stations, node_lines=self.node_lines,
+                 lines=self.lines, indptr=self.indptr, targets=self.targets, run=self.run,
+                 added=self.added, samples=self.samples, sources=np.array(self.sources, dtype=str))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['node_stations'], data['node_lines'], data['lines'], data['indptr'],
+                       data['targets'], data['run'], data['added'], data['samples'],
+                       data['sources'].tolist())
+
+
+def graph_path(graph_dir=None):
+    return os.path.join(graph_dir or GRAPH_DIR, "graph.npz")
+
+
+def load_journey_graph(path=None):
+    """The graph at ``path``, loaded once per process and reloaded when the file changes.
+
+    Returns None when it has not been built.
+    """
+    path = path or graph_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _graphs.get(path)
+    if cached is None or cached[0] != mtime:
+        with _lock:
+            cached = _graphs.get(path)
+            if cached is None or cached[0] != mtime:
+                cached = _graphs[path] = (mtime, JourneyGraph.load(path))
+    return cached[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the journey planner graph from trip CSVs")
+    parser.add_argument("paths", nargs="+", help="monthly trip CSVs (globs are expanded)")
+    parser.add_argument("--output", default=None, help="graph file (default .cache/journey_graph/graph.npz)")
+    args = parser.parse_args()
+
+    paths = sorted({p for pattern in args.paths for p in (glob.glob(pattern) or [pattern])})
+    graph = JourneyGraph.build(paths)
+    graph.save(args.output or graph_path())
+    print(f"{len(graph):,} nodes ({len(graph.station_nodes):,} stations, {len(graph.lines)} lines), "
+          f"{len(graph.targets):,} edges")
+
+
+if __name__ == "__main__":
+    main()
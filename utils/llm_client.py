@@ -0,0 +1,82 @@
+"""Shared OpenAI client and streamed chat completions.
+
+One client (and so one HTTP connection pool) is created lazily on first use and
+shared by every session in the process, instead of building ``OpenAI(...)`` when
+a page is imported. Point ``OPENAI_BASE_URL`` at ``benchmarks.mock_openai`` to run
+against a local stand-in.
+"""
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from utils import metrics
+
+CHAT_MODEL = "gpt-3.5-turbo"
+REQUEST_TIMEOUT = float(os.getenv("NJT_OPENAI_TIMEOUT", "20"))
+MAX_RETRIES = int(os.getenv("NJT_OPENAI_MAX_RETRIES", "1"))
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide OpenAI client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+
+                load_dotenv()
+                _client = OpenAI(
+                    api_key=os.getenv('OPENAI_API_KEY'),
+                    timeout=REQUEST_TIMEOUT,
+                    max_retries=MAX_RETRIES,
+                )
+    return _client
+
+
+class StreamStats:
+    """Timing of one streamed completion, filled in while it is consumed."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_seconds = None
+        self.total_seconds = None
+        self.text = ""
+        self.completed = False
+
+
+def stream_chat(messages, stats=None, timeout=REQUEST_TIMEOUT, **params):
+    """Yield the assistant's reply piece by piece as the API streams it.
+
+    ``stats`` (a ``StreamStats``) records time to first token, total latency and
+    the full text; ``stats.completed`` is only set when the stream finished.
+    """
+    stats = stats if stats is not None else StreamStats()
+    stream = get_client().chat.completions.create(
+        model=params.pop("model", CHAT_MODEL),
+        messages=messages,
+        stream=True,
+        timeout=timeout,
+        **params,
+    )
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if stats.first_token_seconds is None:
+                    stats.first_token_seconds = time.perf_counter() - stats.started
+                stats.text += delta
+                yield delta
+        stats.completed = True
+    finally:
+        stats.total_seconds = time.perf_counter() - stats.started
+        stream.close()
+        if stats.first_token_seconds is not None:
+            metrics.record('openai_first_token', stats.first_token_seconds)
+        metrics.record('openai_stream', stats.total_seconds, error=not stats.completed)
@@ -0,0 +1,349 @@
+"""Timing spans, counters and histograms for the app's hot paths.
+
+Off unless ``NJT_METRICS=1``. When it is off, ``timed`` returns the function it
+decorates unchanged, ``span`` returns a shared no-op context and ``count`` and
+``record`` return on their first line, so leaving the instrumentation in place
+costs nothing measurable. When it is on:
+
+* ``span(name)`` / ``@timed()`` time a block or function into the span
+  histogram (errors are counted per span); generator functions are timed until
+  they are exhausted,
+* ``count(name, **labels)`` adds to a counter,
+* every span is also appended to a rotating JSONL file (``NJT_METRICS_LOG``)
+  by a background thread, so the request path never waits on the disk,
+* ``prometheus_text()`` renders everything in the Prometheus text format, served
+  on ``http://NJT_METRICS_HOST:NJT_METRICS_PORT/metrics`` (0 disables the
+  endpoint). The host defaults to ``127.0.0.1``; set it to ``0.0.0.0`` only
+  when a scraper on another machine needs it and the port is firewalled.
+
+Cache hit and miss counts (``utils.cache.cache_stats``), deferred import times
+and any registered collector (e.g. the prediction batcher's ``metrics()``) are
+exported too, and read when they are exported rather than counted again.
+Numbers are per process; ``pages/4_📈 Metrics.py`` shows them for the process
+serving the page, and offers to reset them only when ``NJT_METRICS_ADMIN=1``::
+
+    from utils import metrics
+
+    @metrics.timed()
+    def load_data(): ...
+
+    with metrics.span('dataset_build', dataset=name):
+        ...
+"""
+import contextlib
+import functools
+import inspect
+import json
+import logging
+import logging.handlers
+import math
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+from utils import startup
+from utils.cache import CACHE_DIR, cache_stats
+
+ENABLED = os.getenv("NJT_METRICS", "0").lower() not in ("", "0", "false", "no")
+HOST = os.getenv("NJT_METRICS_HOST", "127.0.0.1")
+PORT = int(os.getenv("NJT_METRICS_PORT", "9464"))
+ADMIN = os.getenv("NJT_METRICS_ADMIN", "0").lower() not in ("", "0", "false", "no")
+LOG_PATH = os.getenv("NJT_METRICS_LOG", os.path.join(CACHE_DIR, "metrics", "metrics.jsonl"))
+LOG_MAX_BYTES = int(float(os.getenv("NJT_METRICS_LOG_MB", "10")) * 2 ** 20)
+LOG_BACKUPS = 3
+
+# Upper bounds (seconds) of the span histogram buckets exported to Prometheus
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+WINDOW = 10_000  # most recent durations per span kept for the percentiles
+
+_NULL_SPAN = contextlib.nullcontext()
+
+_lock = threading.Lock()
+_counters = {}  # (name, labels) -> value
+_histograms = {}  # (name, labels) -> Histogram
+_collectors = {}  # name -> callable returning {metric: number}
+_log = None
+_log_lock = threading.Lock()
+_server = None
+
+
+class Histogram:
+    """Bucketed durations (for Prometheus) plus a window of recent ones (for percentiles)."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.errors = 0
+        self.recent = deque(maxlen=WINDOW)
+
+    def observe(self, seconds, error=False):
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        self.buckets[i] += 1
+        self.count += 1
+        self.sum += seconds
+        self.errors += bool(error)
+        self.recent.append(seconds)
+
+    def percentile(self, q):
+        """``q``-th percentile (0-100) of the recent durations, in seconds; None when empty."""
+        values = sorted(self.recent)
+        if not values:
+            return None
+        return values[max(0, math.ceil(q / 100 * len(values)) - 1)]  # nearest rank
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def count(name, n=1, **labels):
+    """Add ``n`` to counter ``name`` (exported as ``njt_<name>_total``)."""
+    if not ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + n
+
+
+def record(name, seconds, error=False, **labels):
+    """Add one duration to the histogram of span ``name``."""
+    if not ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds, error)
+    _write_log({"ts": time.time(), "span": name, "seconds": round(seconds, 6), "error": error, **labels})
+
+
+@contextlib.contextmanager
+def _span(name, labels):
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record(name, time.perf_counter() - start, error, **labels)
+
+
+def span(name, **labels):
+    """Context manager timing its block as span ``name``."""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _span(name, labels)
+
+
+def timed(name=None, **labels):
+    """Decorator timing every call as span ``name`` (default: the function's name).
+
+    Decided when the function is defined: with metrics off it is returned as is.
+    """
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        span_name = name or fn.__name__
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator(*args, **kwargs):
+                with _span(span_name, labels):
+                    return (yield from fn(*args, **kwargs))
+            return generator
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _span(span_name, labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def register_collector(name, collect):
+    """Export ``collect()``'s ``{metric: number}`` as gauges ``njt_<name>_<metric>``."""
+    with _lock:
+        _collectors[name] = collect
+
+
+def reset():
+    """Forget every counter and span recorded so far in this process."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def snapshot():
+    """Everything recorded in this process, as plain dicts (percentiles in milliseconds)."""
+    with _lock:
+        counters = [{"name": name, **dict(labels), "value": value}
+                    for (name, labels), value in sorted(_counters.items())]
+        spans = []
+        for (name, labels), h in sorted(_histograms.items()):
+            spans.append({
+                "span": name,
+                **dict(labels),
+                "count": h.count,
+                "errors": h.errors,
+                "mean_ms": h.sum / h.count * 1000,
+                **{f"p{q}_ms": h.percentile(q) * 1000 for q in (50, 95, 99)},
+            })
+        collectors = dict(_collectors)
+    collected = {}
+    for name, collect in collectors.items():
+        try:
+            collected[name] = collect()
+        except Exception:  # a collector must never break the metrics surface
+            continue
+    return {
+        "enabled": ENABLED,
+        "spans": spans,
+        "counters": counters,
+        "caches": cache_stats(),
+        "imports": startup.import_times(),
+        "collectors": collected,
+    }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _metric_name(*parts):
+    return "_".join("".join(c if c.isalnum() else "_" for c in str(part)) for part in parts)
+
+
+def prometheus_text():
+    """Every metric of this process in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = [(key, list(h.buckets), h.count, h.sum, h.errors) for key, h in sorted(_histograms.items())]
+        collectors = dict(_collectors)
+
+    if histograms:
+        lines += ["# TYPE njt_span_seconds histogram"]
+        for (name, labels), buckets, total, seconds, _ in histograms:
+            labels = (("span", name),) + labels
+            cumulative = 0
+            for bound, n in zip(BUCKETS + (float("inf"),), buckets):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"njt_span_seconds_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"njt_span_seconds_sum{_format_labels(labels)} {seconds}")
+            lines.append(f"njt_span_seconds_count{_format_labels(labels)} {total}")
+        lines += ["# TYPE njt_span_errors_total counter"]
+        lines += [f"njt_span_errors_total{_format_labels((('span', name),) + labels)} {errors}"
+                  for (name, labels), _, _, _, errors in histograms]
+
+    typed = set()
+    for (name, labels), value in counters:
+        metric = _metric_name("njt", name, "total")
+        if metric not in typed:
+            typed.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+    caches = cache_stats()
+    for field, kind in (("hits", "counter"), ("misses", "counter"), ("disk_hits", "counter"),
+                        ("entries", "gauge"), ("bytes", "gauge")):
+        metric = f"njt_cache_{field}_total" if kind == "counter" else f"njt_cache_{field}"
+        values = [(name, stats[field]) for name, stats in caches.items() if field in stats]
+        if values:
+            lines.append(f"# TYPE {metric} {kind}")
+            lines += [f'{metric}{_format_labels((("cache", name),))} {value}' for name, value in values]
+
+    imports = startup.import_times()
+    if imports:
+        lines.append("# TYPE njt_import_seconds gauge")
+        lines += [f'njt_import_seconds{_format_labels((("module", module),))} {seconds}'
+                  for module, seconds in imports.items()]
+
+    for name, collect in collectors.items():
+        try:
+            values = collect()
+        except Exception:
+            continue
+        for key, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                metric = _metric_name("njt", name, key)
+                lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+def _write_log(entry):
+    """Queue one JSON line for the rotating log; a background thread does the writing."""
+    global _log
+    if _log is None:
+        with _log_lock:
+            if _log is None:
+                _log = _start_log()
+    _log.info(json.dumps(entry, default=str))
+
+
+def _start_log():
+    os.makedirs(os.path.dirname(LOG_PATH) or ".", exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(LOG_PATH, maxBytes=LOG_MAX_BYTES,
+                                                   backupCount=LOG_BACKUPS, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    records = queue.SimpleQueue()
+    logging.handlers.QueueListener(records, handler).start()  # daemon thread, lives with the process
+    logger = logging.getLogger("njt.metrics")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    return logger
+
+
+def start_exporter(port=PORT, host=HOST):
+    """Serve ``prometheus_text()`` on ``/metrics`` from a daemon thread, once per process.
+
+    Returns the server, or None when the port is taken (e.g. by another app process).
+    """
+    global _server
+    with _lock:
+        if _server is not None:
+            return _server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # no access log on stderr
+                pass
+
+        try:
+            _server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            logging.getLogger(__name__).warning("Metrics endpoint not started on %s:%s: %s", host, port, e)
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-exporter", daemon=True).start()
+        return _server
+
+
+if ENABLED and PORT:
+    start_exporter()
@@ -0,0 +1,203 @@
+"""Compact, memory-mappable copy of the delay forest for publishing and serving.
+
+``delay_prediction_model.joblib`` is a full sklearn forest: float64 thresholds
+and values, int64 node arrays, per-node impurity and sample counts the app
+never reads, and unpickling it imports sklearn. ``compact_model`` turns it
+into a ``forest_engine.CompiledForest`` that
+
+* keeps only what the walk reads, with float32 thresholds and values, and uint8
+  features and uint16/int32 node indices (the splits are unchanged, so it only
+  differs from the original by float32 rounding of the leaf values),
+* optionally (``--min-leaf-samples``) prunes leaves trained on fewer samples
+  into their parent (the parent's value is the mean over both),
+* is dumped uncompressed, so ``joblib.load(..., mmap_mode="r")`` (what the
+  registry does) maps every array from disk and replicas share the pages.
+
+The compact model has the same ``predict`` / ``predict_interval`` interface,
+so the Train Delay page serves it as it is. Build it, compare it with the
+original and register it as the latest version with::
+
+    python -m utils.model_compaction --register
+    python -m utils.model_compaction --min-leaf-samples 10 --out delay_prediction_model.compact.joblib
+
+``--register`` refuses a compact model whose predictions differ from the
+original's by more than ``MAX_ABS_DIFF`` minutes on any compared journey (as
+pruning can), unless ``--force`` is given. The page looks the delay table up by
+model version, so a lossless compaction (no pruning) carries the original's
+table over to the new version; otherwise it prints a reminder to rebuild it
+with ``python -m utils.delay_table``.
+
+The report covers file size, cold load time and RSS in a fresh interpreter,
+agreement with the original on random journeys, and the row-level RMSE of both
+when the training aggregates (``utils.delay_training``) are available.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from utils import delay_table, delay_training, forest_engine, model_registry
+from utils.stations import DELAY_FEATURES, STATIONS
+
+MODEL_NAME = "delay_prediction_model"
+MIN_LEAF_SAMPLES = 0  # lossless by default; pruning is opt-in
+MAX_ABS_DIFF = 0.01  # minutes; --register refuses a compact model further from the original
+COMPACT_FILENAME = f"{MODEL_NAME}.compact.joblib"  # name of the published compact file
+
+# Runs in a fresh interpreter; prints one JSON line of timings and memory
+LOAD_CHILD = """
+import json, time
+start = time.perf_counter()
+import joblib
+import pandas as pd
+model = joblib.load({path!r}, mmap_mode="r")
+loaded = time.perf_counter()
+model.predict(pd.DataFrame([[8, 1, 105, 107]], columns={features!r}))
+predicted = time.perf_counter()
+memory = {{}}
+try:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS", "RssAnon", "RssFile")):
+                name, kb = line.split()[:2]
+                memory[name.rstrip(":")] = int(kb) * 1024
+except OSError:  # not Linux
+    pass
+print(json.dumps({{"load_seconds": loaded - start, "first_predict_seconds": predicted - loaded, **memory}}))
+"""
+
+
+def compact_model(model, min_leaf_samples=MIN_LEAF_SAMPLES):
+    """Pruned, narrow-dtype ``CompiledForest`` of a fitted sklearn regression forest."""
+    return forest_engine.compile_forest(model, min_leaf_samples).compacted()
+
+
+def save_compact(forest, path):
+    """Dump uncompressed so every array can be memory-mapped on load."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    joblib.dump(forest, path)
+    return path
+
+
+def load_compact(path):
+    return joblib.load(path, mmap_mode="r")
+
+
+def cold_load(path):
+    """Load time, first prediction and memory of ``path`` in a new interpreter."""
+    code = LOAD_CHILD.format(path=os.path.abspath(path), features=DELAY_FEATURES)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def random_journeys(n, seed=0):
+    rng = np.random.default_rng(seed)
+    station_ids = np.array(list(STATIONS.values()))
+    return pd.DataFrame({
+        'hour_of_day': rng.integers(0, 24, n),
+        'day_of_week': rng.integers(0, 7, n),
+        'from_id': rng.choice(station_ids, n),
+        'to_id': rng.choice(station_ids, n),
+    })[DELAY_FEATURES]
+
+
+def compare(model, compact, model_path, compact_path, rows=100_000, aggregates=None):
+    """Size, cold-load and accuracy of the compact model against the original."""
+    report = {"original": {"file_bytes": os.path.getsize(model_path), **cold_load(model_path)},
+              "compact": {"file_bytes": os.path.getsize(compact_path), **cold_load(compact_path)}}
+    report["compact"]["nodes"] = compact.n_nodes
+    report["original"]["nodes"] = sum(e.tree_.node_count for e in getattr(model, "estimators_", [model]))
+
+    X = random_journeys(rows)
+    diff = np.abs(model.predict(X) - compact.predict(X))
+    report["agreement"] = {"rows": rows, "max_abs_diff": float(diff.max()), "mean_abs_diff": float(diff.mean())}
+    if aggregates is not None:
+        report["original"].update(delay_training.evaluate(model, aggregates))
+        report["compact"].update(delay_training.evaluate(compact, aggregates))
+    return report
+
+
+def print_report(report):
+    original, compact = report["original"], report["compact"]
+    rows = [("file size (MB)", "file_bytes", 2 ** -20), ("nodes", "nodes", 1),
+            ("cold load (ms)", "load_seconds", 1000), ("first predict (ms)", "first_predict_seconds", 1000),
+            ("RSS (MB)", "VmRSS", 2 ** -20), ("private RSS (MB)", "RssAnon", 2 ** -20),
+            ("row RMSE (min)", "rmse", 1)]
+    print(f"{'':<20} {'original':>12} {'compact':>12} {'change':>9}")
+    for label, key, scale in rows:
+        if key in original and key in compact:
+            before, after = original[key] * scale, compact[key] * scale
+            change = f"{(after - before) / before:+.1%}" if before else ""
+            print(f"{label:<20} {before:>12,.2f} {after:>12,.2f} {change:>9}")
+    agreement = report["agreement"]
+    print(f"vs original on {agreement['rows']:,} random journeys: mean abs diff "
+          f"{agreement['mean_abs_diff']:.4f} min, max {agreement['max_abs_diff']:.4f} min")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact the delay forest and compare it with the original")
+    parser.add_argument("--model-name", default=MODEL_NAME)
+    parser.add_argument("--version", help="registry version to compact (defaults to latest)")
+    parser.add_argument("--min-leaf-samples", type=int, default=MIN_LEAF_SAMPLES,
+                        help="prune leaves trained on fewer samples (0 keeps every leaf)")
+    parser.add_argument("--out", help="also write the compact model here (e.g. for the hub)")
+    parser.add_argument("--rows", type=int, default=100_000, help="random journeys compared")
+    parser.add_argument("--register", action="store_true", help="register it as the latest version")
+    parser.add_argument("--max-abs-diff", type=float, default=MAX_ABS_DIFF,
+                        help="largest difference from the original (minutes) --register accepts")
+    parser.add_argument("--force", action="store_true", help="register even above --max-abs-diff")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    version = args.version or model_registry.latest_version(args.model_name)
+    model = model_registry.load_model(args.model_name, version)
+    if not forest_engine.is_supported(model):
+        parser.error(f"{args.model_name} {version} is a {type(model).__name__}, not a sklearn forest")
+    model_path = os.path.join(model_registry.MODELS_DIR,
+                              model_registry.list_versions(args.model_name)[version]["file"])
+
+    compact = compact_model(model, args.min_leaf_samples)
+    with tempfile.TemporaryDirectory() as tmp:
+        compact_path = save_compact(compact, args.out or os.path.join(tmp, COMPACT_FILENAME))
+        aggregates_file = delay_training.aggregates_path()
+        aggregates = (delay_training.TripAggregates.load(aggregates_file)
+                      if os.path.exists(aggregates_file) else None)
+        report = compare(model, compact, model_path, compact_path, args.rows, aggregates)
+    report.update(model_version=version, min_leaf_samples=args.min_leaf_samples)
+    print_report(report)
+
+    max_abs_diff = report["agreement"]["max_abs_diff"]
+    refused = args.register and max_abs_diff > args.max_abs_diff and not args.force
+    if refused:
+        report["registration_refused"] = True
+    elif args.register:
+        new_version = model_registry.register_model(
+            args.model_name, compact,
+            metadata={"compacted_from": version, "min_leaf_samples": args.min_leaf_samples,
+                      "max_abs_diff": max_abs_diff})
+        report["registered_version"] = new_version
+        print(f"Registered {args.model_name} {new_version} (compacted from {version})")
+        lossless = args.min_leaf_samples == 0 and max_abs_diff <= args.max_abs_diff
+        table_meta = lossless and delay_table.copy_table(version, new_version, compacted_from=version)
+        report["delay_table_carried_over"] = bool(table_meta)
+        if table_meta:
+            print(f"Carried the delay table of {version} over to {new_version}")
+        else:
+            print(f"Warning: {new_version} has no delay table, so the Train Delay page scores every journey "
+                  f"with the model. Rebuild it with: python -m utils.delay_table --version {new_version}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if refused:
+        parser.error(f"not registering: predictions differ from {version} by up to {max_abs_diff:.4f} min "
+                     f"(tolerance {args.max_abs_diff} min); use --force to register anyway")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Versioned on-disk registry for the app's trained models.
+
+Layout under MODELS_DIR (``models/`` by default)::
+
+    registry.json                      # name -> latest version + per-version metadata
+    <name>/<version>.joblib            # uncompressed joblib dump, version = sha256 prefix
+    <name>/<version>.<kind>.joblib     # artifacts derived from a version (see load_derived)
+
+Models are stored uncompressed so ``joblib.load(..., mmap_mode="r")`` can map the
+forest arrays straight from disk; several server processes then share the same
+pages instead of each holding a private copy. Every model is loaded at most once
+per process and its integrity is checked against the recorded sha256 on that load.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import joblib
+
+from utils import metrics
+
+MODELS_DIR = os.getenv("NJT_MODELS_DIR", "models")
+REGISTRY_FILE = "registry.json"
+
+_lock = threading.Lock()
+_loaded = {}  # (name, version) -> model
+_registry_cache = {"mtime": None, "data": None}
+
+
+def _read_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Read once at import: os.umask can only be read by setting it, which is not thread-safe
+_FILE_MODE = 0o644 & ~_read_umask()
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Return the hex sha256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _dump(value, path):
+    """Uncompressed joblib dump to ``path`` through a temp file in the same directory."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        joblib.dump(value, tmp_path)
+        os.chmod(tmp_path, _FILE_MODE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _registry_path(models_dir=None):
+    return os.path.join(models_dir or MODELS_DIR, REGISTRY_FILE)
+
+
+def _atomic_write_json(path, data):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.chmod(tmp_path, _FILE_MODE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_registry(models_dir=None):
+    """Return the registry contents, re-reading the file only when it changed."""
+    path = _registry_path(models_dir)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {"models": {}}
+    if models_dir is None and _registry_cache["mtime"] == mtime:
+        return _registry_cache["data"]
+    with open(path) as f:
+        data = json.load(f)
+    if models_dir is None:
+        _registry_cache.update(mtime=mtime, data=data)
+    return data
+
+
+def _update_registry(update, models_dir=None):
+    with _lock:
+        data = read_registry(models_dir)
+        data = json.loads(json.dumps(data))  # never mutate the cached copy
+        update(data)
+        _atomic_write_json(_registry_path(models_dir), data)
+    return data
+
+
+def latest_version(name, models_dir=None):
+    """Return the latest registered version of ``name`` or None."""
+    entry = read_registry(models_dir)["models"].get(name)
+    return entry["latest"] if entry else None
+
+
+def list_versions(name, models_dir=None):
+    """Return ``{version: metadata}`` for every registered version of ``name``."""
+    entry = read_registry(models_dir)["models"].get(name)
+    return dict(entry["versions"]) if entry else {}
+
+
+def register_model(name, source, metadata=None, models_dir=None):
+    """Register a model file or in-memory estimator and make it the latest version.
+
+    ``source`` is either a path to a joblib file (possibly compressed) or a fitted
+    estimator. It is re-dumped uncompressed so later loads can be memory-mapped.
+    Returns the new version id.
+    """
+    models_dir = models_dir or MODELS_DIR
+    model = joblib.load(source) if isinstance(source, (str, os.PathLike)) else source
+
+    model_dir = os.path.join(models_dir, name)
+    os.makedirs(model_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=model_dir, suffix=".tmp")
+    os.close(fd)
+    try:
+        joblib.dump(model, tmp_path)
+        sha256 = file_sha256(tmp_path)
+        version = sha256[:12]
+        filename = f"{version}.joblib"
+        os.chmod(tmp_path, _FILE_MODE)  # mkstemp creates 0600; other users' app processes read models
+        os.replace(tmp_path, os.path.join(model_dir, filename))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    def update(data):
+        entry = data["models"].setdefault(name, {"latest": None, "versions": {}})
+        entry["versions"][version] = {
+            "file": f"{name}/{filename}",
+            "sha256": sha256,
+            "size_bytes": os.path.getsize(os.path.join(model_dir, filename)),
+            "source": str(source) if isinstance(source, (str, os.PathLike)) else type(source).__name__,
+            "registered_at": datetime.now(timezone.utc).isoformat(),
+            **(metadata or {}),
+        }
+        entry["latest"] = version
+
+    _update_registry(update, models_dir)
+    return version
+
+
+def load_model(name, version=None, mmap_mode="r", models_dir=None):
+    """Load a registered model, at most once per process.
+
+    Raises LookupError when the model or version is not registered and ValueError
+    when the file on disk does not match its recorded sha256.
+    """
+    version = version or latest_version(name, models_dir)
+    if version is None:
+        raise LookupError(f"No registered versions of model '{name}'")
+
+    key = (models_dir or MODELS_DIR, name, version)
+    model = _loaded.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _loaded.get(key)
+        if model is not None:
+            return model
+
+        meta = list_versions(name, models_dir).get(version)
+        if meta is None:
+            raise LookupError(f"Model '{name}' has no version '{version}'")
+        path = os.path.join(models_dir or MODELS_DIR, meta["file"])
+        if file_sha256(path) != meta["sha256"]:
+            raise ValueError(f"Integrity check failed for {path}: sha256 does not match registry")
+
+        start = time.perf_counter()
+        model = joblib.load(path, mmap_mode=mmap_mode)
+        load_seconds = time.perf_counter() - start
+        metrics.record('model_file_load', load_seconds, model=name)
+        _loaded[key] = model
+
+    def update(data):
+        data["models"][name]["versions"][version]["load_seconds"] = round(load_seconds, 4)
+
+    _update_registry(update, models_dir)
+    return model
+
+
+def load_derived(name, version, kind, build, models_dir=None):
+    """Load an artifact derived from a registered version, building it on first use.
+
+    ``build(model)`` turns the loaded model into the artifact (e.g. its compiled
+    forest). The result is written next to the version as
+    ``<name>/<version>.<kind>.joblib``, uncompressed, so it is built once per
+    host and every process maps the same pages instead of holding a private
+    copy. Loaded at most once per process, like ``load_model``.
+    """
+    models_dir = models_dir or MODELS_DIR
+    key = (models_dir, name, version, kind)
+    value = _loaded.get(key)
+    if value is not None:
+        return value
+
+    path = os.path.join(models_dir, name, f"{version}.{kind}.joblib")
+    if not os.path.exists(path):
+        # Two processes may both build it; each replace is atomic and the content the same
+        _dump(build(load_model(name, version, models_dir=models_dir)), path)
+    with _lock:
+        value = _loaded.get(key)
+        if value is None:
+            value = _loaded[key] = joblib.load(path, mmap_mode="r")
+    return value
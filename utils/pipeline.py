@@ -0,0 +1,268 @@
+"""Run the scenario declared in ``configuration/config.toml`` without taipy.
+
+The TOML file is read as taipy writes it (``"40:int"``, ``"x:SECTION"``,
+``"module.func:function"``, ...). Tasks run as soon as their inputs exist, in a
+process pool, so the independent baseline and ML branches run concurrently.
+
+Every data node value is pickled into ``<CACHE_DIR>/pipeline/nodes/<sha256>.pkl``
+and a manifest maps node ids to those hashes. A task's fingerprint is the hash
+of its module's source, the source of every in-repo module that module imports
+(transitively, e.g. ``utils.ingest`` for ``algorithms.algorithms``) and its input
+hashes; a ``skippable`` task whose fingerprint matches the last run (and whose
+outputs still exist) is skipped, so a weekly rerun only recomputes what changed::
+
+    python -m utils.pipeline                # run the scenario
+    python -m utils.pipeline --force        # ignore previous results
+"""
+import argparse
+import ast
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import pickle
+import sys
+import tempfile
+import time
+import tomllib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import pandas as pd
+
+from utils.cache import CACHE_DIR
+
+CONFIG_PATH = os.path.join("configuration", "config.toml")
+PIPELINE_DIR = os.path.join(CACHE_DIR, "pipeline")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _parse_value(value):
+    """Decode taipy's ``"<value>:<type>"`` TOML strings."""
+    if isinstance(value, list):
+        return [_parse_value(v) for v in value]
+    if not isinstance(value, str) or ":" not in value:
+        return value
+    raw, kind = value.rsplit(":", 1)
+    if kind == "int":
+        return int(raw)
+    if kind == "float":
+        return float(raw)
+    if kind == "bool":
+        return raw == "True"
+    if kind == "datetime":
+        return datetime.fromisoformat(raw)
+    if kind in ("SECTION", "function", "SCOPE", "FREQUENCY"):
+        return raw
+    return value
+
+
+def load_config(path=CONFIG_PATH):
+    """Return ``(data_nodes, tasks, scenario)`` dicts from a taipy TOML config."""
+    with open(path, "rb") as f:
+        config = tomllib.load(f)
+    data_nodes = {node_id: {k: _parse_value(v) for k, v in spec.items()}
+                  for node_id, spec in config.get("DATA_NODE", {}).items()}
+    tasks = {task_id: {k: _parse_value(v) for k, v in spec.items()}
+             for task_id, spec in config.get("TASK", {}).items()}
+    scenario = {k: _parse_value(v) for k, v in next(iter(config["SCENARIO"].values())).items()
+                if not isinstance(v, dict)}
+    return data_nodes, tasks, scenario
+
+
+def _resolve(function_path):
+    module, name = function_path.rsplit(".", 1)
+    return getattr(importlib.import_module(module), name)
+
+
+def _in_repo(module):
+    path = getattr(module, "__file__", None)
+    return (path is not None and os.path.abspath(path).startswith(REPO_ROOT + os.sep)
+            and "site-packages" not in path)
+
+
+def _imported_modules(module, source):
+    """Already-imported modules named by the import statements in ``source``."""
+    names = set()
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ""
+            if node.level:
+                base = importlib.util.resolve_name("." * node.level + base, module.__package__)
+            names.add(base)
+            names.update(f"{base}.{alias.name}" for alias in node.names)  # from package import module
+    return [sys.modules[name] for name in names if name in sys.modules]
+
+
+def _module_sources(module_name):
+    """``{module name: source}`` for a module and the in-repo modules it imports, transitively."""
+    sources = {}
+    stack = [importlib.import_module(module_name)]
+    while stack:
+        module = stack.pop()
+        if module.__name__ in sources or not _in_repo(module):
+            continue
+        source = inspect.getsource(module)
+        sources[module.__name__] = source
+        stack.extend(_imported_modules(module, source))
+    return sources
+
+
+def _function_hash(function_path):
+    """Hash of the code a task runs: its function name plus the sources from ``_module_sources``."""
+    module_name, name = function_path.rsplit(".", 1)
+    _resolve(function_path)
+    digest = hashlib.sha256(name.encode())
+    for module, source in sorted(_module_sources(module_name).items()):
+        digest.update(f"\0{module}\0{source}".encode())
+    return digest.hexdigest()
+
+
+class NodeStore:
+    """Content-addressed pickles of data node values plus the run manifest."""
+
+    def __init__(self, root=PIPELINE_DIR):
+        self.root = root
+        self.nodes_dir = os.path.join(root, "nodes")
+        self.manifest_path = os.path.join(root, "manifest.json")
+        os.makedirs(self.nodes_dir, exist_ok=True)
+
+    def path(self, digest):
+        return os.path.join(self.nodes_dir, f"{digest}.pkl")
+
+    def write(self, value):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        digest = hashlib.sha256(payload).hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            fd, tmp_path = tempfile.mkstemp(dir=self.nodes_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        return digest
+
+    def read(self, digest):
+        with open(self.path(digest), "rb") as f:
+            return pickle.load(f)
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"nodes": {}, "tasks": {}}
+
+    def save_manifest(self, manifest):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def _run_task(function_path, input_digests, store_root):
+    """Process-pool worker: load inputs from the store, run, store the outputs."""
+    store = NodeStore(store_root)
+    start = time.perf_counter()
+    result = _resolve(function_path)(*(store.read(d) for d in input_digests))
+    return store.write(result), time.perf_counter() - start
+
+
+def _input_node(node_id, spec, store):
+    """Store a scenario input (CSV file or default value) and return its hash."""
+    if spec.get("storage_type") == "csv":
+        return store.write(pd.read_csv(spec["path"]))
+    return store.write(spec.get("default_data"))
+
+
+def run_scenario(config_path=CONFIG_PATH, store_root=PIPELINE_DIR, max_workers=None, force=False, log=print):
+    """Run every task of the scenario; returns ``{task_id: "ran" | "skipped"}``."""
+    data_nodes, tasks, scenario = load_config(config_path)
+    task_ids = scenario["tasks"]
+    store = NodeStore(store_root)
+    manifest = store.load_manifest()
+    previous_tasks = manifest["tasks"]
+
+    produced = {node for task_id in task_ids for node in tasks[task_id]["outputs"]}
+    digests = {}
+    for task_id in task_ids:
+        for node_id in tasks[task_id]["inputs"]:
+            if node_id not in produced and node_id not in digests:
+                digests[node_id] = _input_node(node_id, data_nodes.get(node_id, {}), store)
+
+    status = {}
+    pending = list(task_ids)
+    running = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            ready = [t for t in pending if all(i in digests for i in tasks[t]["inputs"])]
+            for task_id in ready:
+                pending.remove(task_id)
+                task = tasks[task_id]
+                input_digests = [digests[i] for i in task["inputs"]]
+                fingerprint = hashlib.sha256(json.dumps(
+                    [_function_hash(task["function"]), input_digests]).encode()).hexdigest()
+
+                last = previous_tasks.get(task_id, {})
+                if (task.get("skippable") and not force and last.get("fingerprint") == fingerprint
+                        and all(store.exists(d) for d in last["outputs"].values())):
+                    digests.update(last["outputs"])
+                    status[task_id] = "skipped"
+                    log(f"{task_id:<24} skipped (inputs unchanged)")
+                    continue
+                future = pool.submit(_run_task, task["function"], input_digests, store_root)
+                running[future] = (task_id, fingerprint)
+            if ready and any(status.get(t) == "skipped" for t in ready):
+                continue  # skipped tasks may have unblocked others
+
+            if not running:
+                if pending:
+                    raise RuntimeError(f"Tasks with unresolvable inputs: {pending}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task_id, fingerprint = running.pop(future)
+                digest, seconds = future.result()
+                output_id = tasks[task_id]["outputs"][0]
+                digests[output_id] = digest
+                previous_tasks[task_id] = {"fingerprint": fingerprint, "outputs": {output_id: digest}}
+                status[task_id] = "ran"
+                log(f"{task_id:<24} ran in {seconds:.2f}s")
+
+    manifest["nodes"] = digests
+    manifest["tasks"] = previous_tasks
+    store.save_manifest(manifest)
+    return status
+
+
+def read_node(node_id, store_root=PIPELINE_DIR):
+    """Value of a data node from the last scenario run."""
+    store = NodeStore(store_root)
+    return store.read(store.load_manifest()["nodes"][node_id])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the configured scenario")
+    parser.add_argument("--config", default=CONFIG_PATH)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="rerun skippable tasks too")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    status = run_scenario(args.config, max_workers=args.workers, force=args.force)
+    ran = sum(s == "ran" for s in status.values())
+    print(f"{ran} ran, {len(status) - ran} skipped in {time.perf_counter() - start:.2f}s")
+    for node_id in ("metrics_baseline", "metrics_ml"):
+        try:
+            print(f"{node_id}: {read_node(node_id)}")
+        except KeyError:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Micro-batching front end for the delay model.
+
+Every Streamlit session runs on its own thread and ``predict_delay`` scores one
+row at a time, so under load the model pays its per-call overhead (building a
+frame, validating features, walking the trees) once per request.
+``PredictionBatcher`` queues those rows instead: a worker thread takes whatever
+arrives within ``max_wait_ms`` of the first request (up to ``max_batch`` rows),
+scores them with one vectorized ``predict`` and hands each caller its value
+through a ``Future``. Predictors with a ``predict_interval`` (the compiled
+forest) score the batch with it instead, so every answer comes with its
+prediction interval at no extra pass. ``metrics()`` reports queue depth, batch
+sizes and request latency. Compare with the per-request path with::
+
+    python -m benchmarks.load_test --threads 32
+"""
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+from utils.stations import DELAY_FEATURES
+
+MAX_BATCH = 256
+MAX_WAIT_MS = 2.0
+TIMEOUT_SECONDS = 10.0  # a caller gives up on a batch that has not been scored by then
+METRICS_WINDOW = 10_000  # requests/batches kept for the latency and size percentiles
+
+_STOP = object()
+
+
+class PredictionBatcher:
+    """Collects concurrent single-row predictions and scores them together."""
+
+    def __init__(self, predictor, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS,
+                 feature_names=DELAY_FEATURES):
+        self.predictor = predictor
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.feature_names = list(feature_names)
+        self.intervals = hasattr(predictor, "predict_interval")
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=METRICS_WINDOW)
+        self._batch_sizes = deque(maxlen=METRICS_WINDOW)
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self._worker = threading.Thread(target=self._run, name="prediction-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, hour_of_day, day_of_week, from_id, to_id):
+        """Queue one journey (in ``DELAY_FEATURES`` order).
+
+        Returns a Future of ``(delay, lower, upper)``; the bounds are None when the
+        predictor has no ``predict_interval``.
+        """
+        future = Future()
+        self._queue.put(((hour_of_day, day_of_week, from_id, to_id), future, time.perf_counter()))
+        return future
+
+    def predict(self, hour_of_day, day_of_week, from_id, to_id, timeout=TIMEOUT_SECONDS):
+        """Predicted delay in minutes for one journey; blocks until its batch is scored."""
+        return self.submit(hour_of_day, day_of_week, from_id, to_id).result(timeout)[0]
+
+    def predict_interval(self, hour_of_day, day_of_week, from_id, to_id, timeout=TIMEOUT_SECONDS):
+        """``(delay, lower, upper)`` in minutes for one journey; blocks until its batch is scored.
+
+        Raises ``TimeoutError`` after ``timeout`` seconds (None waits forever).
+        """
+        return self.submit(hour_of_day, day_of_week, from_id, to_id).result(timeout)
+
+    def set_predictor(self, predictor):
+        """Score the batches collected from now on with ``predictor`` (e.g. a new model version).
+
+        Keeps one worker per process across model updates; rows already queued
+        are not lost.
+        """
+        with self._lock:
+            if predictor is not self.predictor:
+                self.predictor = predictor
+                self.intervals = hasattr(predictor, "predict_interval")
+
+    def close(self):
+        """Score what is already queued, then stop the worker."""
+        self._queue.put(_STOP)
+        self._worker.join()
+
+    def _collect(self):
+        """Block for one request, then take more until the window closes or the batch is full."""
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)  # stop once this batch is answered
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            with self._lock:
+                predictor, intervals = self.predictor, self.intervals
+            try:
+                # A bad row must fail its batch, not the worker that serves every session
+                X = pd.DataFrame([row for row, _, _ in batch], columns=self.feature_names)
+                if intervals:
+                    values = list(zip(*(v.tolist() for v in predictor.predict_interval(X))))
+                else:
+                    values = [(float(v), None, None) for v in predictor.predict(X)]
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                with self._lock:
+                    self.errors += len(batch)
+                continue
+            for (_, future, _), value in zip(batch, values):
+                future.set_result(value)
+            done = time.perf_counter()
+            with self._lock:
+                self.requests += len(batch)
+                self.batches += 1
+                self._batch_sizes.append(len(batch))
+                self._latencies.extend(done - submitted for _, _, submitted in batch)
+
+    def metrics(self):
+        """Counters plus batch-size and latency summaries over the recent window."""
+        with self._lock:
+            sizes = np.array(self._batch_sizes)
+            latencies_ms = np.array(self._latencies) * 1000
+            out = {
+                'queue_depth': self._queue.qsize(),
+                'requests': self.requests,
+                'batches': self.batches,
+                'errors': self.errors,
+            }
+        if len(sizes):
+            out.update(batch_mean=float(sizes.mean()), batch_p50=float(np.percentile(sizes, 50)),
+                       batch_max=int(sizes.max()))
+        if len(latencies_ms):
+            out.update({f"latency_p{q}_ms": float(np.percentile(latencies_ms, q)) for q in (50, 90, 99)})
+        return out
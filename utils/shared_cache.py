@@ -0,0 +1,211 @@
+"""Disk-backed cache shared by every app process on the host.
+
+When several Streamlit servers run behind a load balancer, each keeps its own
+``get_cache`` entries, so every worker re-fits the same forests. A
+``SharedCache`` puts a SQLite file under the cache directory behind the
+in-process LRU. The first worker to compute a value stores it, and the others
+load it from disk instead of recomputing.
+
+* Writes are single SQLite transactions (WAL mode), so readers never see a
+  partial entry and a crashed writer leaves nothing behind.
+* Keys are content hashes (``utils.cache.fingerprint``) chosen by the caller;
+  values are pickled.
+* The file is bounded by ``NJT_SHARED_CACHE_MB``; inserts evict the least
+  recently read entries of any cache until it fits. A value larger than the
+  whole bound is not stored (and a warning is logged); it stays per process.
+* ``get_or_compute`` holds a per-key file lock while computing, so concurrent
+  workers that miss the same key wait for one computation instead of racing.
+
+Set ``NJT_CACHE_BACKEND=memory`` to keep every cache per process.
+"""
+import contextlib
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from utils.cache import CACHE_DIR, LRUCache
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process compute lock
+    fcntl = None
+
+SHARED_CACHE_PATH = os.path.join(CACHE_DIR, "shared_cache.sqlite")
+MAX_BYTES = int(float(os.getenv("NJT_SHARED_CACHE_MB", "512")) * 2 ** 20)
+TOUCH_SECONDS = 60  # reads refresh an entry's recency at most this often
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    cache TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (cache, key)
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+"""
+
+
+class DiskCache:
+    """Pickled values in one SQLite file, namespaced by cache name."""
+
+    def __init__(self, name, path=SHARED_CACHE_PATH, max_bytes=MAX_BYTES):
+        self.name = name
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock_dir = path + ".locks"
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db().executescript(SCHEMA)
+
+    def _db(self):
+        # sqlite3 connections must stay on the thread that opened them; autocommit
+        # mode, with explicit transactions where several statements go together
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def get(self, key, default=None):
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def get_entry(self, key):
+        """``(value, pickled size)`` for ``key``, or None on a miss."""
+        now = time.time()
+        db = self._db()
+        row = db.execute("SELECT value, accessed FROM entries WHERE cache = ? AND key = ?",
+                         (self.name, key)).fetchone()
+        if row is None:
+            return None
+        if now - row[1] > TOUCH_SECONDS:
+            db.execute("UPDATE entries SET accessed = ? WHERE cache = ? AND key = ?", (now, self.name, key))
+        return pickle.loads(row[0]), len(row[0])
+
+    def put(self, key, value):
+        """Store ``value``; returns its pickled size."""
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            logger.warning("Not sharing %s[%s]: %.1f MB pickled is over the %.1f MB shared cache",
+                           self.name, key, len(blob) / 2 ** 20, self.max_bytes / 2 ** 20)
+            return len(blob)
+        now = time.time()
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                       (self.name, key, blob, len(blob), now, now))
+            self._evict(db)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return len(blob)
+
+    def _evict(self, db):
+        """Drop least recently read entries until the file's entries fit ``max_bytes``."""
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for cache, key, size in db.execute("SELECT cache, key, size FROM entries ORDER BY accessed"):
+            victims.append((cache, key))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        db.executemany("DELETE FROM entries WHERE cache = ? AND key = ?", victims)
+
+    @contextlib.contextmanager
+    def compute_lock(self, key):
+        """Exclusive per-key lock across processes (no-op where ``fcntl`` is missing)."""
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.lock_dir, exist_ok=True)
+        name = hashlib.sha256(f"{self.name}\0{key}".encode()).hexdigest()[:32]
+        with open(os.path.join(self.lock_dir, name), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def get_or_compute(self, key, compute):
+        return self.get_or_compute_entry(key, compute)[0]
+
+    def get_or_compute_entry(self, key, compute):
+        """``(value, pickled size)``, computing and storing the value on a miss."""
+        entry = self.get_entry(key)
+        if entry is None:
+            with self.compute_lock(key):
+                entry = self.get_entry(key)  # another process may have finished it meanwhile
+                if entry is None:
+                    value = compute()
+                    entry = value, self.put(key, value)
+        return entry
+
+    def clear(self):
+        self._db().execute("DELETE FROM entries WHERE cache = ?", (self.name,))
+
+    def __contains__(self, key):
+        return self._db().execute("SELECT 1 FROM entries WHERE cache = ? AND key = ?",
+                                  (self.name, key)).fetchone() is not None
+
+    def __len__(self):
+        return self._db().execute("SELECT COUNT(*) FROM entries WHERE cache = ?",
+                                  (self.name,)).fetchone()[0]
+
+    def size_bytes(self):
+        return self._db().execute("SELECT COALESCE(SUM(size), 0) FROM entries WHERE cache = ?",
+                                  (self.name,)).fetchone()[0]
+
+
+class SharedCache(LRUCache):
+    """In-process LRU in front of a ``DiskCache`` shared with the other workers.
+
+    ``max_bytes`` bounds the in-process entries like ``LRUCache`` does; entries
+    that came from disk, or whose size the caller did not give, count their
+    pickled size.
+    """
+
+    def __init__(self, name, max_entries=8, max_bytes=None, disk=None):
+        super().__init__(max_entries, max_bytes)
+        self.disk = disk if disk is not None else DiskCache(name)
+        self.disk_hits = 0
+
+    def get(self, key, default=None):
+        value = super().get(key)
+        if value is None:
+            entry = self.disk.get_entry(key)
+            if entry is None:
+                return default
+            value, nbytes = entry
+            with self._lock:
+                self.disk_hits += 1
+            super().put(key, value, nbytes)
+        return value
+
+    def put(self, key, value, nbytes=None):
+        size = self.disk.put(key, value)
+        super().put(key, value, size if nbytes is None else nbytes)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value, nbytes = self.disk.get_or_compute_entry(key, compute)
+            super().put(key, value, nbytes)
+        return value
+
+    def clear(self):
+        super().clear()
+        self.disk.clear()
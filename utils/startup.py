@@ -0,0 +1,80 @@
+"""Cold-start helpers: deferred imports and image assets prepared once per process.
+
+``lazy_import("plotly.express")`` returns a stand-in that imports the real
+module on first attribute access, so a page pays for plotly, sklearn or the
+hub client only on the run that actually draws a chart or fits a model. How
+long each deferred import took is kept in ``import_times()``.
+
+``load_image`` returns an asset as PNG bytes no wider than Streamlit renders
+it. Handing ``st.image`` a PIL image (or a wider file) makes Streamlit resize
+and re-encode it on every rerun; the prepared bytes are passed through as they
+are. Profile the pages with ``python -m benchmarks.cold_start``.
+"""
+import importlib
+import io
+import os
+import threading
+import time
+
+IMAGE_WIDTH = 1460  # Streamlit's maximum content width; wider images are resized per render
+
+_import_times = {}  # module name -> seconds spent importing it on first use
+_images = {}  # (path, width) -> (mtime, PNG bytes)
+_lock = threading.Lock()
+
+
+class LazyModule:
+    """Module stand-in that imports ``name`` on first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(self._name)
+            _import_times.setdefault(self._name, time.perf_counter() - start)
+            self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name):
+    """``import name`` deferred until the module is first used."""
+    return LazyModule(name)
+
+
+def import_times():
+    """Seconds each lazily imported module took, in the order they were first used."""
+    return dict(_import_times)
+
+
+def load_image(path, width=IMAGE_WIDTH):
+    """PNG bytes of the image at ``path``, scaled down to ``width``; decoded once per process."""
+    mtime = os.stat(path).st_mtime_ns
+    key = (path, width)
+    cached = _images.get(key)
+    if cached is None or cached[0] != mtime:
+        with _lock:
+            cached = _images.get(key)
+            if cached is None or cached[0] != mtime:
+                cached = _images[key] = (mtime, _prepare_image(path, width))
+    return cached[1]
+
+
+def _prepare_image(path, width):
+    from PIL import Image
+
+    with Image.open(path) as image:
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.BILINEAR)
+        out = io.BytesIO()
+        image.save(out, format="PNG")
+    return out.getvalue()
@@ -0,0 +1,371 @@
+"""Partitioned columnar store for the trip-level rail data.
+
+Monthly trip CSVs are converted once into ``<root>/year=YYYY/month=MM/`` with
+one uncompressed ``.npy`` file per column, like ``utils.ingest``:
+
+* ``from``/``to`` (stations), ``line``, ``status``, ``type``, ``train_id`` and
+  ``source`` (the CSV a row came from) are dictionary-encoded. The dictionaries
+  are shared by every partition and live in ``<root>/dictionaries.json``. Codes
+  only ever get appended, so old partitions stay valid;
+* ``scheduled_time``/``actual_time`` are int64 seconds since the epoch and
+  ``date`` is int32 days (missing values are the int minimum, i.e. NaT);
+* rows are sorted by ``date`` then ``scheduled_time``.
+
+Each partition's ``meta.json`` records its row count, min/max of every numeric
+column and the distinct codes of every dictionary column. ``TripStore.read``
+uses those statistics to skip whole partitions, and memory-maps only the
+columns it needs::
+
+    python -m utils.trip_store data/rail_data/*.csv      # convert (already-converted files are skipped)
+
+    store = TripStore()
+    df = store.read(['date', 'train_id', 'to', 'delay_minutes'],
+                    start='2020-01-01', end='2021-01-01',
+                    line='Northeast Corrdr', from_station='Newark Penn Station')
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import CACHE_DIR
+
+STORE_DIR = os.path.join(CACHE_DIR, "trip_store")
+CHUNK_ROWS = 500_000
+
+# column -> storage kind; dictionary columns name the dictionary they share
+SCHEMA = {
+    'date': 'date',
+    'train_id': 'dict:train_id',
+    'stop_sequence': 'int16',
+    'from': 'dict:station',
+    'from_id': 'int32',
+    'to': 'dict:station',
+    'to_id': 'int32',
+    'scheduled_time': 'time',
+    'actual_time': 'time',
+    'delay_minutes': 'float32',
+    'status': 'dict:status',
+    'line': 'dict:line',
+    'type': 'dict:type',
+    'source': 'dict:source',  # file the row was converted from
+}
+MISSING_TIME = np.iinfo(np.int64).min  # NaT as int64
+MISSING_DATE = np.iinfo(np.int32).min
+
+_lock = threading.Lock()
+
+
+def _dictionary(kind):
+    return kind.split(':', 1)[1] if kind.startswith('dict:') else None
+
+
+def _to_seconds(values):
+    times = pd.to_datetime(values, format='ISO8601', errors='coerce')
+    return times.to_numpy('datetime64[s]').view(np.int64)
+
+
+def _to_days(values):
+    days = pd.to_datetime(values, format='ISO8601', errors='coerce').to_numpy('datetime64[D]')
+    out = days.view(np.int64)
+    return np.where(np.isnat(days), MISSING_DATE, out).astype(np.int32)
+
+
+class TripStore:
+    """Reader and writer for a partitioned trip store rooted at ``root``."""
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self.dictionaries = self._load_dictionaries()
+        self.last_scan = {}
+
+    # -- writing -----------------------------------------------------------
+
+    def _load_dictionaries(self):
+        try:
+            with open(os.path.join(self.root, "dictionaries.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_dictionaries(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.dictionaries, f)
+        os.replace(tmp_path, os.path.join(self.root, "dictionaries.json"))
+
+    def _encode_dict(self, name, values):
+        """Codes of ``values`` in dictionary ``name`` (-1 for missing), growing it as needed."""
+        words = self.dictionaries.setdefault(name, [])
+        index = {word: code for code, word in enumerate(words)}
+        codes, uniques = pd.factorize(pd.Series(values).astype("string").str.strip())
+        mapping = np.empty(len(uniques) + 1, dtype=np.int32)
+        mapping[-1] = -1
+        for i, word in enumerate(uniques):
+            if word not in index:
+                index[word] = len(words)
+                words.append(word)
+            mapping[i] = index[word]
+        return mapping[codes]
+
+    def _encode(self, chunk):
+        columns = {}
+        for name, kind in SCHEMA.items():
+            values = chunk[name] if name in chunk else pd.Series(None, index=chunk.index, dtype=object)
+            dictionary = _dictionary(kind)
+            if dictionary:
+                columns[name] = self._encode_dict(dictionary, values)
+            elif kind == 'time':
+                columns[name] = _to_seconds(values)
+            elif kind == 'date':
+                columns[name] = _to_days(values)
+            else:
+                numeric = pd.to_numeric(values, errors='coerce')
+                if kind.startswith('int'):
+                    numeric = numeric.fillna(-1)
+                columns[name] = numeric.to_numpy().astype(kind)
+        return columns
+
+    def partitions(self):
+        """``(year, month)`` of every partition, sorted."""
+        found = []
+        for path in glob.glob(os.path.join(self.root, "year=*", "month=*", "meta.json")):
+            month_dir = os.path.dirname(path)
+            found.append((int(os.path.basename(os.path.dirname(month_dir))[5:]),
+                          int(os.path.basename(month_dir)[6:])))
+        return sorted(found)
+
+    def partition_dir(self, year, month):
+        return os.path.join(self.root, f"year={year:04d}", f"month={month:02d}")
+
+    def partition_meta(self, year, month):
+        with open(os.path.join(self.partition_dir(year, month), "meta.json")) as f:
+            return json.load(f)
+
+    def sources(self):
+        """Names of every source file already converted."""
+        return {source for year, month in self.partitions()
+                for source in self.partition_meta(year, month)["sources"]}
+
+    def convert(self, path, chunk_rows=CHUNK_ROWS, force=False):
+        """Convert one trip CSV into the store; returns ``{(year, month): rows}``.
+
+        Files whose name is already recorded in a partition are skipped unless
+        ``force``. Memory is bounded by the encoded size of one file.
+        """
+        name = os.path.basename(path)
+        with _lock:
+            os.makedirs(self.root, exist_ok=True)
+            if not force and name in self.sources():
+                return {}
+
+            parts = {}
+            for chunk in pd.read_csv(path, chunksize=chunk_rows, dtype={'train_id': str}):
+                columns = self._encode(chunk.assign(source=name))
+                days = columns['date'].astype('datetime64[D]')
+                keep = columns['date'] != MISSING_DATE
+                month_key = days.astype('datetime64[M]').astype(np.int64)
+                for key in np.unique(month_key[keep]):
+                    mask = keep & (month_key == key)
+                    parts.setdefault(int(key), []).append({c: v[mask] for c, v in columns.items()})
+
+            # Dictionaries first: codes are append-only, so partitions never
+            # reference a code the saved dictionaries don't have
+            self._save_dictionaries()
+            written = {}
+            for key, pieces in sorted(parts.items()):
+                year, month = 1970 + key // 12, key % 12 + 1
+                columns = {c: np.concatenate([p[c] for p in pieces]) for c in SCHEMA}
+                written[(year, month)] = self._write_partition(year, month, columns, name)
+            return written
+
+    def _write_partition(self, year, month, columns, source):
+        directory = self.partition_dir(year, month)
+        sources = [source]
+        if os.path.exists(os.path.join(directory, "meta.json")):
+            # Merge with what is already there (a month can span two source files);
+            # rows from an earlier conversion of the same file are replaced
+            sources = [s for s in self.partition_meta(year, month)["sources"] if s != source] + sources
+            existing = self._read_partition(year, month, list(SCHEMA), None)
+            keep = existing['source'] != self.dictionaries['source'].index(source)
+            columns = {c: np.concatenate([existing[c][keep], columns[c]]) for c in SCHEMA}
+
+        order = np.lexsort((columns['scheduled_time'], columns['date']))
+        columns = {c: v[order] for c, v in columns.items()}
+
+        os.makedirs(os.path.dirname(directory), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(directory), prefix=".tmp-")
+        stats = {}
+        for name, values in columns.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), values, allow_pickle=False)
+            if _dictionary(SCHEMA[name]):
+                stats[name] = {"values": np.unique(values[values >= 0]).tolist()}
+                continue
+            present = values[_present(values, SCHEMA[name])]
+            if len(present):
+                stats[name] = {"min": present.min().item(), "max": present.max().item()}
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump({"rows": len(order), "sources": sources, "stats": stats}, f)
+
+        if os.path.exists(directory):
+            old_dir = tempfile.mkdtemp(dir=os.path.dirname(directory), prefix=".old-")
+            os.replace(directory, os.path.join(old_dir, "data"))
+            os.replace(tmp_dir, directory)
+            shutil.rmtree(old_dir)
+        else:
+            os.replace(tmp_dir, directory)
+        return len(order)
+
+    # -- reading -----------------------------------------------------------
+
+    def _codes(self, dictionary, values):
+        if values is None:
+            return None
+        values = [values] if isinstance(values, str) else values
+        words = self.dictionaries.get(dictionary, [])
+        return np.array([words.index(v) for v in values if v in words], dtype=np.int32)
+
+    def _read_partition(self, year, month, columns, rows):
+        directory = self.partition_dir(year, month)
+        data = {}
+        for name in columns:
+            values = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+            data[name] = np.asarray(values if rows is None else values[rows])
+        return data
+
+    def read(self, columns=None, start=None, end=None, line=None, station=None,
+             from_station=None, to_station=None, decode=True):
+        """Rows matching every given filter, with only ``columns``.
+
+        ``start``/``end`` bound ``date`` (``start <= date < end``); ``line`` and the
+        station filters take a name or a list of names. ``station`` matches
+        either end of a segment. ``last_scan`` afterwards records how many
+        partitions and columns were touched.
+        """
+        columns = list(columns or SCHEMA)
+        start_day = None if start is None else int(np.datetime64(pd.Timestamp(start).date(), 'D').astype(np.int64))
+        end_day = None if end is None else int(np.datetime64(pd.Timestamp(end).date(), 'D').astype(np.int64))
+        line_codes = self._codes('line', line)
+        station_codes = self._codes('station', station)
+        from_codes = self._codes('station', from_station)
+        to_codes = self._codes('station', to_station)
+
+        partitions = self.partitions()
+        frames = []
+        touched = set()
+        read = 0
+        for year, month in partitions:
+            stats = self.partition_meta(year, month)["stats"]
+            # Partition pruning on min/max dates and the distinct dictionary codes
+            if 'date' not in stats:
+                continue
+            if start_day is not None and stats['date']['max'] < start_day:
+                continue
+            if end_day is not None and stats['date']['min'] >= end_day:
+                continue
+            if not _may_contain(stats, 'line', line_codes):
+                continue
+            if from_codes is not None and not _may_contain(stats, 'from', from_codes):
+                continue
+            if to_codes is not None and not _may_contain(stats, 'to', to_codes):
+                continue
+            if station_codes is not None and not (_may_contain(stats, 'from', station_codes)
+                                                  or _may_contain(stats, 'to', station_codes)):
+                continue
+            read += 1
+
+            # Rows are sorted by date, so the date range is a contiguous slice
+            rows = slice(None)
+            if start_day is not None or end_day is not None:
+                dates = np.load(os.path.join(self.partition_dir(year, month), "date.npy"), mmap_mode="r")
+                lo = 0 if start_day is None else np.searchsorted(dates, start_day, 'left')
+                hi = len(dates) if end_day is None else np.searchsorted(dates, end_day, 'left')
+                rows = slice(lo, hi)
+                touched.add('date')
+
+            mask = None
+            for name, codes in (('line', line_codes), ('from', from_codes), ('to', to_codes)):
+                if codes is not None:
+                    hit = np.isin(self._read_partition(year, month, [name], rows)[name], codes)
+                    mask = hit if mask is None else mask & hit
+                    touched.add(name)
+            if station_codes is not None:
+                ends = self._read_partition(year, month, ['from', 'to'], rows)
+                hit = np.isin(ends['from'], station_codes) | np.isin(ends['to'], station_codes)
+                mask = hit if mask is None else mask & hit
+                touched.update(['from', 'to'])
+
+            selection = rows if mask is None else np.arange(rows.start or 0, (rows.start or 0) + len(mask))[mask]
+            frames.append(self._read_partition(year, month, columns, selection))
+            touched.update(columns)
+
+        self.last_scan = {"partitions": len(partitions), "partitions_read": read, "columns_read": sorted(touched)}
+        data = {c: np.concatenate([f[c] for f in frames]) if frames else
+                np.empty(0, dtype=_storage_dtype(SCHEMA[c])) for c in columns}
+        return self._decode(data) if decode else pd.DataFrame(data, copy=False)
+
+    def _decode(self, data):
+        out = {}
+        for name, values in data.items():
+            kind = SCHEMA[name]
+            dictionary = _dictionary(kind)
+            if dictionary:
+                out[name] = pd.Categorical.from_codes(values, categories=self.dictionaries.get(dictionary, []),
+                                                      validate=False)
+            elif kind == 'time':
+                out[name] = values.view('datetime64[s]')
+            elif kind == 'date':
+                out[name] = np.where(values == MISSING_DATE, np.iinfo(np.int64).min,
+                                     values.astype(np.int64)).view('datetime64[D]')
+            else:
+                out[name] = values
+        return pd.DataFrame(out, copy=False)
+
+
+def _present(values, kind):
+    if kind == 'time':
+        return values != MISSING_TIME
+    if kind == 'date':
+        return values != MISSING_DATE
+    if values.dtype.kind == 'f':
+        return ~np.isnan(values)
+    return np.ones(len(values), dtype=bool)
+
+
+def _may_contain(stats, column, codes):
+    if codes is None:
+        return True
+    return column in stats and bool(np.isin(codes, stats[column]["values"]).any())
+
+
+def _storage_dtype(kind):
+    if kind.startswith('dict:'):
+        return np.int32
+    return {'time': np.int64, 'date': np.int32}.get(kind, kind)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert monthly trip CSVs into the partitioned store")
+    parser.add_argument("paths", nargs="*", help="trip CSVs (globs are expanded)")
+    parser.add_argument("--root", default=STORE_DIR)
+    parser.add_argument("--force", action="store_true", help="re-convert files already in the store")
+    args = parser.parse_args()
+
+    store = TripStore(args.root)
+    for path in sorted({p for pattern in args.paths for p in (glob.glob(pattern) or [pattern])}):
+        written = store.convert(path, force=args.force)
+        summary = ", ".join(f"{y:04d}-{m:02d}: {rows:,}" for (y, m), rows in written.items())
+        print(f"{os.path.basename(path):<20} {summary or 'already converted'}")
+    for year, month in store.partitions():
+        meta = store.partition_meta(year, month)
+        print(f"year={year:04d}/month={month:02d} {meta['rows']:>10,} rows  from {', '.join(meta['sources'])}")
+
+
+if __name__ == "__main__":
+    main()